@@ -6,7 +6,18 @@ Reflects python's deque and dict objects in mongodb asynchronously in background
 :license: MIT, see LICENSE for more details.
 """
 import logging
+from .base import RetryPolicy, SyncCoroExecutor
 from .deque_reflection import MongoDequeReflection
 from .dict_reflection import MongoDictReflection
+from .docs_deque_reflection import MongoDocsDequeReflection
+from .bucket_reflection import MongoBucketDequeReflection, MongoBucketDictReflection
+from .counter_reflection import MongoCounterReflection
+from .set_reflection import MongoSetReflection
+from .sorted_reflection import MongoSortedListReflection
+from .collection_reflection import MongoCollectionReflection
+from .sync_reflection import SyncMongoDequeReflection, SyncMongoDictReflection
+from .snapshot import DequeSnapshot, DictSnapshot, SetSnapshot
+from .cache import ReflectionCache
+from .workload import WorkloadRecorder, WorkloadReplayer
 
 logging.getLogger(__name__).addHandler(logging.NullHandler())
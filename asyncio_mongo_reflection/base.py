@@ -1,13 +1,23 @@
 import asyncio
+import random
+from hashlib import sha256
 import weakref
 import functools
 import logging
-from threading import Thread
-from concurrent.futures import Executor
+from collections import deque
+from itertools import chain, count
+from threading import Thread, Lock
+from concurrent.futures import Executor, Future
 from time import perf_counter
 from abc import ABCMeta
 
-from pymongo.collection import UpdateResult
+from pymongo import UpdateOne, WriteConcern
+from pymongo.collection import UpdateResult, BulkWriteResult
+from pymongo.errors import PyMongoError, ConnectionFailure, ServerSelectionTimeoutError, NotMasterError
+
+from .journal import ReflectionJournal
+from .warm_start import ReflectionWarmStart
+from .snapshot import _CopyOnWrite, DequeSnapshot, DictSnapshot, SetSnapshot
 
 
 log = logging.getLogger(__name__)
@@ -22,25 +32,77 @@ class SyncCoroExecutor(Executor):
     Allows to wait for a given coroutine execution synchronously from a main thread.
     Replaces loop.run_until_complete.
     Solves issue "loop.run_until_complete already inside loop.run_until_complete" and some others.
+    Runs a pool of 'loops' shadow loops, each in its own thread. Coroutines submitted with the same 'key'
+    always run in the same loop, so a stalled coroutine blocks only keys hashed to its loop.
+    Loops are started with the first submitted coroutine.
     """
-    def __init__(self):
-        self._loop = asyncio.new_event_loop()
-        self._thread = Thread(daemon=True,
-                              target=self._start_shadow_loop,
-                              name='sync coroutine executor')
-        self._thread.start()
+    def __init__(self, loops=4):
+        self._size = loops
+        self._loops = None
+        self._threads = None
+        self._lock = Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._loops is not None:
+                return
+            loops = [asyncio.new_event_loop() for _ in range(self._size)]
+            self._threads = [Thread(daemon=True,
+                                    target=self._start_shadow_loop,
+                                    args=(loop,),
+                                    name=f'sync coroutine executor {ix}') for ix, loop in enumerate(loops)]
+            for thread in self._threads:
+                thread.start()
+            self._loops = loops
 
-    def _start_shadow_loop(self):
-        asyncio.set_event_loop(self._loop)
-        self._loop.run_forever()
+    @staticmethod
+    def _start_shadow_loop(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
 
-    def submit(self, coro):
-        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+    def submit(self, coro, key=None):
+        if self._loops is None:
+            self._start()
+        loop = self._loops[hash(key) % len(self._loops)]
+        return asyncio.run_coroutine_threadsafe(coro, loop)
 
     def shutdown(self, wait=True):
-        self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._loops is None:
+            return
+        for loop in self._loops:
+            loop.call_soon_threadsafe(loop.stop)
         if wait:
-            self._thread.join()
+            for thread in self._threads:
+                thread.join()
+
+
+class RetryPolicy:
+    """
+    Retry policy for dispatcher tasks failed with connection errors (i.e. during replica set failover).
+    Task is retried with exponential backoff and full jitter while the queue waits, so order of ops is kept.
+    Ops which aren't idempotent (like '$push') are retried only if error guarantees that op wasn't applied
+    (no server was selected or it wasn't primary) unless 'retry_ambiguous' is set.
+    'retries=None' means that ops are retried until server is available.
+    """
+    __slots__ = ('retries', 'base_delay', 'max_delay', 'retry_ambiguous')
+
+    def __init__(self, retries=None, base_delay=0.05, max_delay=5.0, retry_ambiguous=False):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_ambiguous = retry_ambiguous
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @staticmethod
+    def is_retryable(exc):
+        return isinstance(exc, ConnectionFailure) or \
+               isinstance(exc, PyMongoError) and exc.has_error_label('RetryableWriteError')
+
+    @staticmethod
+    def is_not_applied(exc):
+        return isinstance(exc, (ServerSelectionTimeoutError, NotMasterError))
 
 
 class AsyncCoroQueueDispatcher:
@@ -75,10 +137,11 @@ class AsyncCoroQueueDispatcher:
         def __repr__(self):
             return f'Coro - {repr(self.coro)} Priority - {self.priority} Locals - {self.locals}'
 
-    __slots__ = ('loop', 'tasks_queue', 'results_queue',
-                 '_process_next', '_dispatcher_task', '_external_cb')
+    __slots__ = ('loop', 'tasks_queue', 'results_queue', 'retry_policy', 'stats', 'unacknowledged',
+                 'recorder', '_process_next', '_dispatcher_task', '_external_cb', '_ingest', '_drain_scheduled',
+                 '_draining')
 
-    def __init__(self, loop=None, external_cb=None):
+    def __init__(self, loop=None, external_cb=None, retry_policy=None, unacknowledged=False, recorder=None):
         self.loop = loop if loop else asyncio._get_running_loop()
         self.tasks_queue = asyncio.PriorityQueue()
         self.results_queue = asyncio.Queue(maxsize=10)
@@ -87,14 +150,71 @@ class AsyncCoroQueueDispatcher:
         # Pass cb weakref to prevent gc in some cases and let dispatcher finish all tasks.
         # Cb takes 2 positional arguments: task result and task exception.
         self._external_cb = external_cb if callable(external_cb) else None
+        self.retry_policy = retry_policy
+        # with unacknowledged (w=0) writes task is done once it's sent, so next one is started without waiting
+        # for server reply and results aren't collected, so ops made of several writes send them with one ordered
+        # 'bulk_write' to keep their order
+        self.unacknowledged = unacknowledged
+        # optional WorkloadRecorder which logs each task
+        self.recorder = recorder
+        # 'backlog' is number of tasks waiting in queue, 'ambiguous' counts failed tasks that weren't retried
+        # as they could be applied already, 'failed' counts all failed tasks
+        self.stats = {'backlog': 0, 'retries': 0, 'ambiguous': 0, 'failed': 0}
+        # calls made from other threads wait here until loop drains them
+        self._ingest = deque()
+        self._drain_scheduled = False
+        self._draining = False
 
     async def _queue_consumer(self):
         while True:
             self._process_next.clear()
             pending_task = await self.tasks_queue.get()
-            asyncio.ensure_future(pending_task.coro(), loop=self.loop)
-            await self._process_next.wait()
+            self.stats['backlog'] = self.tasks_queue.qsize()
+            if self.unacknowledged:
+                await pending_task.coro()
+            else:
+                asyncio.ensure_future(pending_task.coro(), loop=self.loop)
+                await self._process_next.wait()
             self.tasks_queue.task_done()
+            # done task doesn't keep its reflection alive while consumer waits for the next one
+            del pending_task
+
+    def _drain(self):
+        self._drain_scheduled = False
+        self._draining = True
+        try:
+            while self._ingest:
+                fn, args = self._ingest.popleft()
+                fn(*args)
+        finally:
+            self._draining = False
+
+    def threadsafe(self, fn):
+        """
+        Wraps 'fn' so it's always called in loop's thread. Calls from other threads are appended to
+        lock-free buffer (deque appends are atomic) which loop drains in batches, one wakeup per batch,
+        so calls from each thread keep their order.
+        """
+        @functools.wraps(fn)
+        def inner(*args):
+            if asyncio._get_running_loop() is self.loop:
+                # calls buffered earlier go first
+                if self._ingest and not self._draining:
+                    self._drain()
+                return fn(*args)
+
+            self._ingest.append((fn, args))
+            # drain clears flag before it pops calls, so appended call is either popped by it or by the new one
+            if not self._drain_scheduled:
+                self._drain_scheduled = True
+                self.loop.call_soon_threadsafe(self._drain)
+        return inner
+
+    def start(self):
+        """
+        Starts dispatcher and returns its task, dispatcher finishes queued tasks when it's cancelled.
+        """
+        return self.loop.create_task(self.create())
 
     async def create(self):
         try:
@@ -105,16 +225,63 @@ class AsyncCoroQueueDispatcher:
             await self.tasks_queue.join()
             self._dispatcher_task.cancel()
 
-    def enqueue_coro(self, coro, priority=1):
+    def _should_retry(self, exc, attempt, owner, name):
+        policy = self.retry_policy
+
+        if not policy or not policy.is_retryable(exc):
+            return False
+        elif policy.retries is not None and attempt >= policy.retries:
+            return False
+        elif name not in getattr(owner, '_idempotent_ops', ()) and not policy.is_not_applied(exc) \
+                and not policy.retry_ambiguous:
+            self.stats['ambiguous'] += 1
+            log.warning(f'{name} of {type(owner).__name__} at "{getattr(owner, "key", None)}" failed with {exc!r} '
+                        f'and could be applied already, it is not retried so db object may differ from reflection.')
+            return False
+
+        return True
+
+    async def _retried(self, coro, coro_args):
+        """
+        Awaits coroutine and recreates it from its method and arguments to retry if it fails.
+        """
+        name = coro.cr_code.co_name
+        owner = coro_args.get('self')
+        attempt = 0
+
+        while True:
+            try:
+                return await coro
+            except Exception as e:
+                if owner is None or not self._should_retry(e, attempt, owner, name):
+                    self.stats['failed'] += 1
+                    raise
+
+            await asyncio.sleep(self.retry_policy.delay(attempt))
+            attempt += 1
+            self.stats['retries'] += 1
+            coro = getattr(owner, name)(**{key: val for key, val in coro_args.items() if key != 'self'})
+
+    def enqueue_coro(self, coro, priority=1, done_cb=None):
+        # 'done_cb' takes the same arguments as external cb and is called for this task only
 
         def future_wrapper(coro, future):
+            coro_args = dict(coro.cr_frame.f_locals)
+            record = self.recorder.enqueued(coro, priority) if self.recorder else None
+
             @functools.wraps(coro)
             async def inner():
+                if record:
+                    self.recorder.started(record)
                 try:
-                    res = await coro
+                    res = await self._retried(coro, coro_args)
                 except Exception as e:
+                    if record:
+                        self.recorder.done(record, e)
                     future.set_exception(e)
                 else:
+                    if record:
+                        self.recorder.done(record)
                     future.set_result(res)
                 finally:
                     self._process_next.set()
@@ -129,13 +296,22 @@ class AsyncCoroQueueDispatcher:
             try:
                 res = future.result()
 
+                if self.unacknowledged:
+                    if done_cb:
+                        done_cb(res, None)
+                    return
+
                 if self.results_queue.full():
                     self.results_queue.get_nowait()
                 asyncio.ensure_future(self.results_queue.put(res), loop=self.loop)
 
+                if done_cb:
+                    done_cb(res, None)
                 if external_cb:
                     external_cb(res, None)
             except Exception as e:
+                if done_cb:
+                    done_cb(None, e)
                 if external_cb:
                     external_cb(None, exc=e)
                 else:
@@ -147,11 +323,55 @@ class AsyncCoroQueueDispatcher:
         coro_locals = {key: repr(val) for key, val in coro.cr_frame.f_locals.items()}
         self.tasks_queue.put_nowait(self.Task(future_wrapper(coro, f), priority,
                                               coro_locals, perf_counter()))
+        self.stats['backlog'] = self.tasks_queue.qsize()
+
+
+def _cancel_task(task, loop):
+    # finalizer callback, it must not refer to reflection itself
+    if loop is None or not loop.is_closed():
+        task.cancel()
+
+
+# roots get consecutive keys, so they're spread over executor's loops evenly
+_shadow_keys = count()
+
+
+def _loop_bound(method):
+    """
+    Wraps reflection method so it's run in reflection's loop thread when it's called from another thread
+    (while loop is running), calling thread waits for its result. Reflections without loop run it under
+    their '_mutation_lock' instead.
+    """
+    @functools.wraps(method)
+    def inner(self, *args, **kwargs):
+        if self._off_loop():
+            return self.call_threadsafe(method, self, *args, **kwargs).result()
+        elif self._mutation_lock is not None:
+            with self._mutation_lock:
+                return method(self, *args, **kwargs)
+        return method(self, *args, **kwargs)
+
+    inner._loop_bound = True
+    return inner
+
+
+def _run_sync(coro):
+    """
+    Runs coroutine that never suspends (i.e. it awaits blocking calls only) without event loop.
+    """
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+
+    coro.close()
+    raise MongoReflectionError(f'{coro.__qualname__} was suspended, it can not be run without event loop!')
 
 
 class AsyncInit(type):
     """
     Metaclass to support asynchronous __init__ (replaced with __ainit__)
+    Classes with '_sync_init' set are created synchronously with __ainit__ that never suspends.
     """
     @staticmethod
     async def init(obj, *args, **kwargs):
@@ -183,6 +403,8 @@ class AsyncInit(type):
         super().__init__(name, bases, attrs)
 
     def __call__(cls, *args, **kwargs):
+        if getattr(cls, '_sync_init', False):
+            return _run_sync(AsyncInit.init(cls.__cnew__(cls), *args, **kwargs))
         return super().__call__(*args, **kwargs)
 
 
@@ -190,8 +412,67 @@ class ABCAsyncInit(AsyncInit, ABCMeta):
     pass
 
 
+def _map_chunk(fn, chunk):
+    return [fn(el) for el in chunk]
+
+
 class _SyncObjBase(metaclass=ABCAsyncInit):
+    # shared by all reflections by default, reflection can get its own one with 'sync_executor' argument
     sync_executor = SyncCoroExecutor()
+    retry_policy = RetryPolicy()
+    # names of reflection coroutines that can be safely retried even if they could be applied already
+    _idempotent_ops = frozenset()
+    # executor for dumps/loads of loaded or pushed data with at least 'codec_threshold' elements
+    codec_executor = None
+    codec_threshold = 1000
+    # reflections backed by blocking collection are created without event loop
+    _sync_init = False
+    # generation of the last snapshot node was changed after and node contents copies kept for snapshots
+    _frozen_gen = 0
+    _frozen = ()
+    # local indexes of deque's elements and (indexes, element) of element's nodes
+    _indexes = None
+    _indexed_by = None
+    # reflection is stored at 'key' of one document, so it can be queried in db
+    _remote_queries = True
+    # public methods that change reflection (or its local state), they're bound to loop's thread
+    _mutators = frozenset()
+    # lock shared by reflection tree and its dispatcher if they don't run in one loop
+    _mutation_lock = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls._mutators:
+            method = cls.__dict__.get(name)
+            if method is not None and not getattr(method, '_loop_bound', False):
+                setattr(cls, name, _loop_bound(method))
+
+    def _init_codec(self, dumps, loads):
+        if not hasattr(self, '_dumps'):
+            self._dumps = lambda arg: dumps(arg) if callable(dumps) else arg
+            self._dumps_fn = dumps
+        if not hasattr(self, '_loads'):
+            self._loads = lambda arg: loads(arg) if callable(loads) else arg
+            self._loads_fn = loads
+
+    def _init_col(self, kwargs, write_concern):
+        """
+        Takes 'col', 'obj_ref' and 'key' from init 'kwargs' (nested reflections have them already),
+        checks 'col' is instance of '_collection_cls' and applies 'write_concern' to it.
+        """
+        for name in ('col', 'obj_ref', 'key'):
+            if name in kwargs:
+                setattr(self, name, kwargs.pop(name))
+
+        if not hasattr(self, 'col') or not hasattr(self, 'obj_ref') or not hasattr(self, 'key'):
+            raise MongoReflectionError('You need to provide "col", "obj_ref" and "key" named arguments!')
+        elif not isinstance(self.col, self._collection_cls):
+            raise TypeError(f'"col" argument must be a {self._collection_cls.__name__} instance!')
+
+        if write_concern is not None:
+            if not isinstance(write_concern, WriteConcern):
+                write_concern = WriteConcern(**write_concern)
+            self.col = self.col.with_options(write_concern=write_concern)
 
     async def __ainit__(self, new_base, loop=None, **kwargs):
         # get event loop from outside if loop is not provided
@@ -207,13 +488,25 @@ class _SyncObjBase(metaclass=ABCAsyncInit):
 
         if not hasattr(self, '_parent'):
             self._tree_depth = 1
+            # whole tree runs its sync coroutines in the same shadow loop
+            self._shadow_key = next(_shadow_keys)
+            self._cow = _CopyOnWrite()
 
-            dispatcher = AsyncCoroQueueDispatcher(self.loop, weakref.ref(self._dispatcher_cb))
+            dispatcher = self._new_dispatcher()
             self._enqueue_coro = dispatcher.enqueue_coro
+            if getattr(self, 'warm_start', None):
+                self._warm_start = ReflectionWarmStart(self.warm_start, self.col, self.obj_ref, self.key)
+                self._enqueue_coro = self._warm_start.invalidating(self._enqueue_coro)
+            if getattr(self, 'journal', None):
+                self._journal = ReflectionJournal(self.journal, self.col, self.obj_ref, self.key, self.loop)
+                self._enqueue_coro = self._journal.journaled(self._enqueue_coro)
+            self._threadsafe = dispatcher.threadsafe
+            self._enqueue_coro = self._threadsafe(self._enqueue_coro)
             self.last_mongo_op_results = dispatcher.results_queue
             self.mongo_pending = dispatcher.tasks_queue
-            self._mongo_dispatcher_task = self.loop.create_task(dispatcher.create())
-            self._finalizer = weakref.finalize(self, self._cancel_dispatcher)
+            self.mongo_stats = dispatcher.stats
+            self._mongo_dispatcher_task = dispatcher.start()
+            self._finalizer = weakref.finalize(self, _cancel_task, self._mongo_dispatcher_task, dispatcher.loop)
         else:
             self._tree_depth = self._parent._tree_depth + 1
 
@@ -225,8 +518,12 @@ class _SyncObjBase(metaclass=ABCAsyncInit):
             cached_base = []
 
         if not hasattr(self, '_parent'):
-            cached_base = await self._reflection_get()
-            if new_base and new_base != cached_base and getattr(self, 'rewrite', True):
+            if hasattr(self, '_journal'):
+                await self._journal.replay(self)
+            cached_base = await self._warm_start.load(self) if hasattr(self, '_warm_start') else None
+            if cached_base is None:
+                cached_base = await self._reflection_get()
+            if new_base and not self._same_base(new_base, cached_base) and getattr(self, 'rewrite', True):
                 cached_base = None
                 await self._reflection_clear()
 
@@ -240,8 +537,238 @@ class _SyncObjBase(metaclass=ABCAsyncInit):
             else:
                 await self._reflection_extend(new_base, maxlen=maxlen)
 
+    def _new_dispatcher(self):
+        return AsyncCoroQueueDispatcher(self.loop, weakref.ref(self._dispatcher_cb), self.retry_policy,
+                                        not self.col.write_concern.acknowledged, getattr(self, 'recorder', None))
+
+    def _subkey(self, key):
+        """
+        Returns mongo path of element placed at 'key' of reflection.
+        """
+        return f'{self.key}.{key}' if self.key else f'{key}'
+
+    @staticmethod
+    def _sentinel():
+        return sha256(str(random.getrandbits(256)).encode('utf-8')).hexdigest()
+
+    async def _reflection_remove_marked(self, el, sentinel):
+        """
+        Removes the first array element equal to (dumped) 'el': it's replaced with 'sentinel' which is pulled then.
+        Sentinel is chosen when op is enqueued, so retried or replayed op that already replaced an element
+        only pulls it instead of replacing another equal one. Both updates are sent with one ordered
+        'bulk_write', so they are applied in order with unacknowledged writes too.
+        """
+        # '$nor' doesn't change position matched by '$'
+        ref = {**self.obj_ref, self.key: el, '$nor': [{self.key: sentinel}]}
+        return await self.col.bulk_write([UpdateOne(ref, {'$set': {f'{self.key}.$': sentinel}}),
+                                          UpdateOne(self.obj_ref, {'$pull': {self.key: sentinel}})], ordered=True)
+
+    @staticmethod
+    def _same_base(new_base, cached_base):
+        return new_base == cached_base
+
+    def _new_nested(self, key, val):
+        """
+        Creates empty nested reflection for list/dict 'val' placed at 'key'.
+        Nested reflection shares parent's settings and dispatcher, its base is filled by caller.
+        """
+        dict_cls = getattr(self, '_dict_cls', type(self))
+        deque_cls = getattr(self, '_deque_cls', type(self))
+        nested_cls = dict_cls if isinstance(val, dict) else deque_cls
+
+        nested = nested_cls.__cnew__(nested_cls)
+        nested.__dict__ = self.__dict__.copy()
+        nested.key = self._subkey(key)
+        nested._parent = weakref.proxy(self)
+        nested._tree_depth = self._tree_depth + 1
+        nested._dict_cls = dict_cls
+        nested._deque_cls = deque_cls
+        nested._frozen_gen = self._cow.gen
+        nested._frozen = ()
+        nested._indexes = None
+        return nested
+
+    def _build_nested(self, key, val, loads=None, dumps=None):
+        """
+        Creates nested reflection for list/dict 'val' placed at 'key' with all its nested ones in one pass.
+        Explicit stack is used instead of recursion, so deep trees don't hit recursion limit.
+        Returns nested reflection and its flat copy with dumped elements (None if 'dumps' isn't provided).
+        """
+        nested = self._new_nested(key, val)
+        maxlen = None if isinstance(self, dict) else getattr(val, 'maxlen', self.maxlen)
+        nested_flat = ({} if isinstance(val, dict) else []) if dumps else None
+
+        stack = [(nested, val, maxlen, nested_flat)]
+        while stack:
+            node, val, maxlen, flat = stack.pop()
+
+            if isinstance(val, dict):
+                base = {}
+                items = val.items()
+            else:
+                base = []
+                if maxlen is not None and len(val) > maxlen:
+                    val = list(val)[-maxlen:]
+                items = enumerate(val)
+
+            for key, el in items:
+                if isinstance(el, (dict, list, deque)):
+                    el_maxlen = None if isinstance(base, dict) else getattr(el, 'maxlen', maxlen)
+                    flat_el = ({} if isinstance(el, dict) else []) if dumps else None
+                    el_node = node._new_nested(key, el)
+                    stack.append((el_node, el, el_maxlen, flat_el))
+                    el = el_node
+                else:
+                    flat_el = dumps(el) if dumps else None
+                    el = loads(el) if loads else el
+
+                if isinstance(base, dict):
+                    base[key] = el
+                    if dumps:
+                        flat[key] = flat_el
+                else:
+                    base.append(el)
+                    if dumps:
+                        flat.append(flat_el)
+
+            super(type(node), node).__init__(base, **({} if isinstance(base, dict) else {'maxlen': maxlen}))
+
+        return nested, nested_flat
+
+    @staticmethod
+    def _leaves(val):
+        """
+        Returns (container, key) pairs of all elements of 'val' and its nested lists/dicts that aren't lists/dicts.
+        """
+        leaves = []
+        stack = [val]
+        while stack:
+            node = stack.pop()
+            for key, el in (node.items() if isinstance(node, dict) else enumerate(node)):
+                if isinstance(el, (dict, list, deque)):
+                    stack.append(el)
+                else:
+                    leaves.append((node, key))
+
+        return leaves
+
+    def _offloads_push(self):
+        """
+        Pushes made by sync methods are processed while loop's thread waits for them, so only pushes awaited
+        in reflection's loop (i.e. initial data) can be dumped in 'codec_executor'.
+        """
+        return self.codec_executor is not None and self.loop is not None and asyncio._get_running_loop() is self.loop
+
+    def _offloads_codec(self, val, fn):
+        """
+        Checks if 'fn' (dumps or loads) should be applied to 'val' in 'codec_executor',
+        that is if executor is set and 'val' has at least 'codec_threshold' elements.
+        """
+        return self.codec_executor is not None and callable(fn) and len(self._leaves(val)) >= self.codec_threshold
+
+    async def _offload_codec(self, val, fn):
+        """
+        Applies 'fn' to all elements of 'val' and its nested lists/dicts (or reflections) in place,
+        in chunks in 'codec_executor' so event loop isn't blocked.
+        With ProcessPoolExecutor 'fn' and elements must be picklable.
+        """
+        leaves = self._leaves(val)
+        size = self.codec_threshold
+        chunks = await self._map_codec(fn, [[node[key] for node, key in leaves[ix:ix + size]]
+                                            for ix in range(0, len(leaves), size)])
+
+        for (node, key), el in zip(leaves, chain.from_iterable(chunks)):
+            # elements of nested reflections are replaced without reflecting
+            base = dict if isinstance(node, dict) else deque if isinstance(node, deque) else list
+            base.__setitem__(node, key, el)
+
+    async def _map_codec(self, fn, chunks):
+        loop = asyncio._get_running_loop()
+        return await asyncio.gather(*[loop.run_in_executor(self.codec_executor, _map_chunk, fn, chunk)
+                                      for chunk in chunks])
+
+    @staticmethod
+    def _flattern(val, dumps=None):
+        """
+        Replaces nested reflections (or any lists/dicts) in given list/dict with their plain copies
+        and dumps all other elements if 'dumps' is provided. Explicit stack is used instead of recursion.
+        """
+        stack = [val]
+        while stack:
+            node = stack.pop()
+            for key, el in (node.items() if isinstance(node, dict) else enumerate(node)):
+                if isinstance(el, dict):
+                    node[key] = dict(el)
+                    stack.append(node[key])
+                elif isinstance(el, (list, deque)):
+                    node[key] = list(el)
+                    stack.append(node[key])
+                elif callable(dumps):
+                    node[key] = dumps(el)
+
+        return val
+
+    async def save_warm_start(self):
+        """
+        Waits for pending ops and saves reflection to local snapshot in 'warm_start' directory,
+        so the next creation of the same reflection doesn't fetch it from db. Call it on flush or clean shutdown.
+        """
+        if not hasattr(self, '_warm_start'):
+            raise MongoReflectionError('Reflection was created without "warm_start" argument!')
+        await self._warm_start.save(self)
+
+    @_loop_bound
+    def snapshot(self):
+        """
+        Returns immutable view of reflection at this moment in O(1). While view is alive nodes changed
+        after it was taken keep shallow copies of their previous contents, unchanged nodes are shared.
+        """
+        generation = self._cow.take()
+        if isinstance(self, dict):
+            return DictSnapshot(self, generation)
+        elif isinstance(self, set):
+            return SetSnapshot(self, generation)
+        return DequeSnapshot(self, generation)
+
+    def _remote_args(self):
+        if not self._remote_queries:
+            raise MongoReflectionError(f'{type(self).__name__} can\'t be queried in db!')
+        return self.col, self.obj_ref, self.key
+
+    def _touch(self):
+        """
+        Called before reflection is changed.
+        """
+        self._cow.freeze(self)
+        if self._indexed_by is not None:
+            indexes, el = self._indexed_by[0](), self._indexed_by[1]()
+            if indexes is not None and el is not None:
+                indexes.touched(el)
+
+    def _off_loop(self):
+        loop = getattr(self, 'loop', None)
+        return loop is not None and loop.is_running() and asyncio._get_running_loop() is not loop
+
+    def call_threadsafe(self, fn, *args, **kwargs):
+        """
+        Calls 'fn' in reflection's loop thread and returns concurrent.futures.Future of its result.
+        Reflection methods called from other threads are run there anyway, use it to run several calls
+        (or other code) at once without waiting for each one.
+        """
+        future = Future()
+
+        def call():
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+
+        self._threadsafe(call)()
+        return future
+
     def _run_now(self, coro):
-        coro_future = self.sync_executor.submit(coro)
+        coro_future = self.sync_executor.submit(coro, self._shadow_key)
         return coro_future.result()
 
     @staticmethod
@@ -251,10 +778,15 @@ class _SyncObjBase(metaclass=ABCAsyncInit):
         else:
             if isinstance(res, UpdateResult):
                 info = f'\nMongo task done with: {res.raw_result}'
+            elif isinstance(res, BulkWriteResult):
+                info = f'\nMongo task done with: {res.bulk_api_result}'
             else:
                 info = '\nDispatcher task done!'
             log.debug(info)
 
     def _cancel_dispatcher(self):
-        if not hasattr(self, '_parent') and not self.loop.is_closed():
-            self._mongo_dispatcher_task.cancel()
+        """
+        Stops dispatcher of root reflection once its queued ops are done.
+        """
+        if not hasattr(self, '_parent'):
+            self._finalizer()
@@ -0,0 +1,238 @@
+"""
+Benchmark of reflections against mongod, prints JSON results which can be diffed between versions.
+
+    python -m asyncio_mongo_reflection.bench --url mongodb://localhost:27017 --ops 10000
+
+Scenarios can be run with other motor compatible client (e.g. one backed by in-memory mock of mongod) with
+'--client module:callable', it's called with url and 'event_listeners' keyword argument.
+
+Each scenario reports ops throughput (from first op till all of them are done in db), percentiles of op
+latency (from enqueue till done), number of mongo commands sent and peak RSS of the process.
+"""
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+import importlib
+import tempfile
+import platform
+from time import perf_counter
+
+from pymongo import monitoring
+
+from .__version__ import __version__
+from .deque_reflection import MongoDequeReflection
+from .dict_reflection import MongoDictReflection
+from .sync_reflection import SyncMongoDequeReflection
+from .workload import WorkloadRecorder
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+
+class _CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def _deque_mixed_op(m, i):
+    op = i % 6
+    if op == 0:
+        m.append(i)
+    elif op == 1:
+        m.appendleft([i, {'n': i}])
+    elif op == 2:
+        m.extend([i, i + 1])
+    elif op == 3:
+        m.pop()
+    elif op == 4:
+        m.rotate(1)
+    else:
+        m.popleft()
+
+
+async def deque_mixed(col, ops, recorder):
+    m = await MongoDequeReflection([], col=col, obj_ref={'bench': 'deque_mixed'}, key='arr', recorder=recorder)
+    for i in range(ops):
+        _deque_mixed_op(m, i)
+        if i % 100 == 99:
+            await asyncio.sleep(0)
+    return m
+
+
+async def sync_deque_mixed(col, ops, recorder):
+    # the same ops with pymongo collection wrapped by motor's one
+    m = SyncMongoDequeReflection([], col=col.delegate, obj_ref={'bench': 'sync_deque_mixed'}, key='arr',
+                                 recorder=recorder)
+    for i in range(ops):
+        _deque_mixed_op(m, i)
+    return m
+
+
+async def dict_churn(col, ops, recorder):
+    m = await MongoDictReflection({}, col=col, obj_ref={'bench': 'dict_churn'}, key='dct', recorder=recorder)
+    for i in range(ops):
+        key = str(i % 64)
+        op = i % 4
+        if op == 0:
+            m[key] = {'val': i, 'nested': {'list': [i]}}
+        elif op == 1 and key in m:
+            m[key]['nested']['list'].append(i)
+        elif op == 2:
+            m.update({key: i, f'{key}_copy': {'val': i}})
+        else:
+            m.pop(key, None)
+        if i % 100 == 99:
+            await asyncio.sleep(0)
+    return m
+
+
+async def large_init(col, ops, recorder):
+    lst = [{'ix': i, 'arr': [i, i + 1]} for i in range(ops)]
+    await MongoDequeReflection(lst, col=col, obj_ref={'bench': 'large_init'}, key='arr', recorder=recorder)
+    # loads reflection created above from db
+    return await MongoDequeReflection(col=col, obj_ref={'bench': 'large_init'}, key='arr', recorder=recorder)
+
+
+async def maxlen_trim(col, ops, recorder):
+    m = await MongoDequeReflection([], col=col, obj_ref={'bench': 'maxlen_trim'}, key='arr', maxlen=100,
+                                   recorder=recorder)
+    for i in range(ops):
+        if i % 2:
+            m.append(i)
+        else:
+            m.extendleft([i, i])
+        if i % 100 == 99:
+            await asyncio.sleep(0)
+    return m
+
+
+async def slice_assign(col, ops, recorder):
+    m = await MongoDequeReflection(list(range(100)), col=col, obj_ref={'bench': 'slice_assign'}, key='arr',
+                                   recorder=recorder)
+    for i in range(ops):
+        start = random.randrange(90)
+        m[start:start + 10] = [i] * 10
+        if i % 100 == 99:
+            await asyncio.sleep(0)
+    return m
+
+
+scenarios = {func.__name__: func for func in (deque_mixed, sync_deque_mixed, dict_churn, large_init, maxlen_trim,
+                                              slice_assign)}
+
+
+def _percentiles(values, percents=(50, 90, 99, 100)):
+    values = sorted(values)
+    if not values:
+        return {}
+    return {f'p{p}': values[min(len(values) - 1, int(len(values) * p / 100))] for p in percents}
+
+
+def _peak_rss():
+    if resource is None:  # pragma: no cover
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on other platforms
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+async def run_scenario(db, name, ops, counter):
+    col = db[f'bench_{name}']
+    await col.drop()
+
+    path = os.path.join(tempfile.mkdtemp(), 'workload')
+    recorder = WorkloadRecorder(path)
+    commands = counter.count
+    start = perf_counter()
+
+    m = await scenarios[name](col, ops, recorder)
+    # sync reflections are waited for blocking the loop
+    joined = m.mongo_pending.join()
+    if joined is not None:
+        await joined
+
+    elapsed = perf_counter() - start
+    recorder.close()
+    records = WorkloadRecorder.records(path)
+    os.remove(path)
+    await col.drop()
+
+    return {'ops': ops,
+            'seconds': elapsed,
+            'ops_per_second': ops / elapsed,
+            'dispatched': len(records),
+            'failed': sum(not record['ok'] for record in records),
+            'latency': _percentiles([record['done'] - record['enqueued'] for record in records]),
+            'round_trips': counter.count - commands,
+            'peak_rss': _peak_rss()}
+
+
+def _client_factory(path):
+    module, _, name = path.partition(':')
+    return getattr(importlib.import_module(module), name)
+
+
+async def main(args):
+    counter = _CommandCounter()
+    client = _client_factory(args.client)(args.url, event_listeners=[counter])
+    db = client[args.db]
+
+    results = {'version': __version__,
+               'python': platform.python_version(),
+               'client': args.client,
+               'scenarios': {}}
+    for name in args.scenarios:
+        random.seed(args.seed)
+        results['scenarios'][name] = await run_scenario(db, name, args.ops, counter)
+
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m asyncio_mongo_reflection.bench', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='mongodb://localhost:27017', help='mongod url')
+    parser.add_argument('--db', default='asyncio_mongo_reflection_bench', help='database for benchmark collections')
+    parser.add_argument('--client', default='motor.motor_asyncio:AsyncIOMotorClient',
+                        help='module:callable creating motor compatible client from url and event_listeners')
+    parser.add_argument('--ops', type=int, default=10000, help='number of ops (elements for large_init)')
+    parser.add_argument('--scenarios', type=lambda arg: arg.split(','), default=list(scenarios),
+                        help=f'comma separated scenarios: {",".join(scenarios)}')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='file to write results to instead of stdout')
+
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(scenarios)
+    if unknown:
+        parser.error(f'unknown scenarios: {",".join(unknown)}')
+    try:
+        _client_factory(args.client)
+    except (ImportError, AttributeError, ValueError) as e:
+        parser.error(f'can\'t import client {args.client}: {e}')
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    loop = asyncio.get_event_loop()
+    results = json.dumps(loop.run_until_complete(main(args)), indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(results)
+    else:
+        print(results)
@@ -0,0 +1,397 @@
+import zlib
+from collections import deque
+from itertools import islice
+
+from pymongo import ASCENDING, InsertOne, UpdateOne, UpdateMany, DeleteOne, DeleteMany
+
+from .base import MongoReflectionError
+from .deque_reflection import MongoDequeReflection, DequeReflection
+from .dict_reflection import MongoDictReflection, DictReflection
+
+
+class MongoBucketDequeReflection(MongoDequeReflection):
+    """
+    Deque reflection that splits its elements across bucket documents
+    {**obj_ref, 'key': key, 'bucket': number, 'arr': [...]} holding up to 'bucket_size' elements each.
+    Bucket numbers follow deque order. Pushes and pops touch only head/tail buckets and other operations
+    rewrite at most one bucket (except reverse and slice assignment), so no document grows without bound.
+    """
+    _remote_queries = False
+
+    async def __ainit__(self, lst=list(), *, bucket_size=1000, **kwargs):
+        if '_id' in kwargs.get('obj_ref', {}):
+            raise MongoReflectionError('"obj_ref" can\'t contain "_id" as it\'s shared by all bucket documents!')
+        if bucket_size < 1:
+            raise ValueError('"bucket_size" must be positive!')
+
+        self._bucket_size = bucket_size
+        # [number, elements count] pairs of buckets in deque order
+        self._buckets = deque()
+        self._maxlen = kwargs.get('maxlen', None)
+        self._deque_cls = MongoDequeReflection
+        await super().__ainit__(lst, **kwargs)
+        self._move_nested_ixs(self)
+
+    def _reflection_ref(self, **query):
+        ref = dict(self.obj_ref, key=self.key)
+        ref.update(query)
+        return ref
+
+    def _bucket_ref(self, no):
+        return self._reflection_ref(bucket=no)
+
+    def _bucket_doc(self, no, arr):
+        return self._reflection_ref(bucket=no, arr=arr)
+
+    def _new_nested(self, ix, val):
+        nested = super()._new_nested(ix, val)
+        # bucket ref is set by '_move_nested_ixs' once buckets are updated,
+        # the ref dict is shared with the whole nested subtree
+        nested.obj_ref = self._bucket_ref(None)
+        nested.key = f'arr.{ix}'
+        nested._upsert = False
+        return nested
+
+    @classmethod
+    def _move_nested_ixs(cls, self):
+        """
+        Keeps up right bucket refs and keys for nested reflections after elements were moved.
+        """
+        elements = iter(self)
+        for no, count in self._buckets:
+            for offset, el in enumerate(islice(elements, count)):
+                if isinstance(el, DequeReflection) or isinstance(el, DictReflection):
+                    exp_key = f'arr.{offset}'
+                    if el.obj_ref['bucket'] != no or el.key != exp_key:
+                        el.obj_ref['bucket'] = no
+                        el.key = exp_key
+                        type(el)._move_nested_ixs(el)
+        self._reindex()
+
+    def _size(self):
+        return sum(count for _, count in self._buckets)
+
+    def _locate(self, ix):
+        """
+        Returns position of the bucket holding ix-th element, index of its first element and element offset.
+        """
+        start = 0
+        for pos, (_, count) in enumerate(self._buckets):
+            if ix < start + count:
+                return pos, start, ix - start
+            start += count
+
+        return len(self._buckets) - 1, start - self._buckets[-1][1], self._buckets[-1][1]
+
+    def _flat(self, start, stop):
+        return self._flattern(list(islice(self, start, stop)), self._dumps)
+
+    def remove(self, el):
+        del self[self.index(el)]
+
+    async def _bulk_write(self, ops):
+        if ops:
+            return await self.col.bulk_write(ops, ordered=True)
+
+    def _push_right(self, arr):
+        ops = []
+        tail = self._buckets[-1] if self._buckets else None
+
+        if arr and tail and tail[1] < self._bucket_size:
+            chunk = arr[:self._bucket_size - tail[1]]
+            ops.append(UpdateOne(self._bucket_ref(tail[0]), {'$push': {'arr': {'$each': chunk}}}))
+            tail[1] += len(chunk)
+            arr = arr[len(chunk):]
+
+        no = tail[0] if tail else 0
+        for i in range(0, len(arr), self._bucket_size):
+            no += 1
+            chunk = arr[i:i + self._bucket_size]
+            ops.append(InsertOne(self._bucket_doc(no, chunk)))
+            self._buckets.append([no, len(chunk)])
+
+        return ops
+
+    def _push_left(self, arr):
+        ops = []
+        head = self._buckets[0] if self._buckets else None
+
+        if arr and head and head[1] < self._bucket_size:
+            chunk = arr[-(self._bucket_size - head[1]):]
+            ops.append(UpdateOne(self._bucket_ref(head[0]), {'$push': {'arr': {'$each': chunk, '$position': 0}}}))
+            head[1] += len(chunk)
+            arr = arr[:-len(chunk)]
+
+        no = head[0] if head else 1
+        for i in range(len(arr), 0, -self._bucket_size):
+            no -= 1
+            chunk = arr[max(i - self._bucket_size, 0):i]
+            ops.append(InsertOne(self._bucket_doc(no, chunk)))
+            self._buckets.appendleft([no, len(chunk)])
+
+        return ops
+
+    def _trim_left(self, num):
+        ops = []
+        dropped_no = None
+
+        while num and self._buckets:
+            no, count = self._buckets[0]
+            if count <= num:
+                dropped_no = no
+                self._buckets.popleft()
+                num -= count
+            else:
+                ops.append(UpdateOne(self._bucket_ref(no), {'$push': {'arr': {'$each': [], '$slice': num - count}}}))
+                self._buckets[0][1] -= num
+                num = 0
+
+        if dropped_no is not None:
+            ops.insert(0, DeleteMany(self._reflection_ref(bucket={'$lte': dropped_no})))
+
+        return ops
+
+    def _trim_right(self, num):
+        ops = []
+        dropped_no = None
+
+        while num and self._buckets:
+            no, count = self._buckets[-1]
+            if count <= num:
+                dropped_no = no
+                self._buckets.pop()
+                num -= count
+            else:
+                ops.append(UpdateOne(self._bucket_ref(no), {'$push': {'arr': {'$each': [], '$slice': count - num}}}))
+                self._buckets[-1][1] -= num
+                num = 0
+
+        if dropped_no is not None:
+            ops.insert(0, DeleteMany(self._reflection_ref(bucket={'$gte': dropped_no})))
+
+        return ops
+
+    def _split_bucket(self, pos, start):
+        """
+        Moves the second half of overfilled bucket to a new bucket placed right after it.
+        """
+        no, count = self._buckets[pos]
+        half = count // 2
+        ops = [UpdateOne(self._bucket_ref(no), {'$push': {'arr': {'$each': [], '$slice': half}}})]
+
+        if pos + 1 < len(self._buckets) and self._buckets[pos + 1][0] == no + 1:
+            ops.append(UpdateMany(self._reflection_ref(bucket={'$gt': no}), {'$inc': {'bucket': 1}}))
+            for bucket in islice(self._buckets, pos + 1, None):
+                bucket[0] += 1
+
+        ops.append(InsertOne(self._bucket_doc(no + 1, self._flat(start + half, start + count))))
+        self._buckets[pos][1] = half
+        self._buckets.insert(pos + 1, [no + 1, count - half])
+        return ops
+
+    def _rewrite(self):
+        self._buckets.clear()
+        ops = [DeleteMany(self._reflection_ref())] + self._push_right(self._flat(0, len(self)))
+        self._move_nested_ixs(self)
+        return self._bulk_write(ops)
+
+    async def _reflection_get(self):
+        await self.col.create_index([(key, ASCENDING) for key in self.obj_ref] +
+                                    [('key', ASCENDING), ('bucket', ASCENDING)])
+
+        docs = await self.col.find(self._reflection_ref(), projection={'bucket': 1, 'arr': 1}) \
+                             .sort('bucket', ASCENDING).to_list(None)
+
+        self._buckets = deque([doc['bucket'], len(doc['arr'])] for doc in docs if doc['arr'])
+        arr = [el for doc in docs for el in doc['arr']]
+
+        ops = [DeleteMany(self._reflection_ref(arr=[]))] if len(self._buckets) != len(docs) else []
+        if self._maxlen and len(arr) > self._maxlen:
+            ops.extend(self._trim_left(len(arr) - self._maxlen))
+            arr = arr[-self._maxlen:]
+        await self._bulk_write(ops)
+
+        return await self._proc_loaded(self, arr, self._loads)
+
+    # Methods below are called synchronously right after local deque is changed,
+    # so buckets are updated from actual local state and only db operations are deferred.
+
+    def _reflection_append(self, arr):
+        return self._reflection_extend(arr)
+
+    def _reflection_appendleft(self, arr):
+        return self._reflection_extendleft(arr)
+
+    def _reflection_clear(self):
+        self._buckets.clear()
+        return self._bulk_write([DeleteMany(self._reflection_ref())])
+
+    def _reflection_extend(self, arr, **kwargs):
+        ops = self._push_right(arr[max(len(arr) - len(self), 0):])
+        ops.extend(self._trim_left(self._size() - len(self)))
+        return self._bulk_write(ops)
+
+    def _reflection_extendleft(self, arr):
+        ops = self._push_left(arr[:len(self)])
+        ops.extend(self._trim_right(self._size() - len(self)))
+        return self._bulk_write(ops)
+
+    def _reflection_insert(self, ix, arr):
+        ix = len(self) - 1 + ix if ix < 0 else ix
+        ix = min(max(ix, 0), len(self) - 1)
+
+        if ix == len(self) - 1:
+            return self._bulk_write(self._push_right(arr))
+        elif ix == 0:
+            return self._bulk_write(self._push_left(arr))
+
+        pos, start, offset = self._locate(ix)
+        no = self._buckets[pos][0]
+        ops = [UpdateOne(self._bucket_ref(no), {'$push': {'arr': {'$each': arr, '$position': offset}}})]
+        self._buckets[pos][1] += 1
+        if self._buckets[pos][1] > self._bucket_size:
+            ops.extend(self._split_bucket(pos, start))
+
+        return self._bulk_write(ops)
+
+    def _reflection_pop(self):
+        return self._bulk_write(self._trim_right(1))
+
+    def _reflection_popleft(self):
+        return self._bulk_write(self._trim_left(1))
+
+    async def _reflection_remove(self, el):  # pragma: no cover
+        # remove is reflected as __delitem__
+        raise NotImplementedError
+
+    def _reflection_reverse(self):
+        return self._rewrite()
+
+    def _reflection_rotate(self, num):
+        length = len(self)
+        num = num % length if length else 0
+        if not num:
+            return self._bulk_write([])
+
+        # move the smaller part of elements to the other side
+        if num <= length - num:
+            ops = self._trim_right(num) + self._push_left(self._flat(0, num))
+        else:
+            ops = self._trim_left(length - num) + self._push_right(self._flat(num, length))
+
+        return self._bulk_write(ops)
+
+    def _reflection_setitem(self, ix, el):
+        pos, _, offset = self._locate(ix)
+        self._move_nested_ixs(self)
+        return self._bulk_write([UpdateOne(self._bucket_ref(self._buckets[pos][0]),
+                                           {'$set': {f'arr.{offset}': el[0]}})])
+
+    def _reflection_setslice(self, set_arr, ins_arr, position):
+        return self._rewrite()
+
+    def _reflection_delitem(self, ix, sentinel):
+        # bucket holding element is rewritten or deleted, sentinel isn't needed
+        ix = len(self) + 1 + ix if ix < 0 else ix
+        pos, start, _ = self._locate(ix)
+        no, count = self._buckets[pos]
+
+        if count == 1:
+            del self._buckets[pos]
+            ops = [DeleteOne(self._bucket_ref(no))]
+        else:
+            self._buckets[pos][1] -= 1
+            ops = [UpdateOne(self._bucket_ref(no), {'$set': {'arr': self._flat(start, start + count - 1)}})]
+
+        self._move_nested_ixs(self)
+        return self._bulk_write(ops)
+
+
+class MongoBucketDictReflection(MongoDictReflection):
+    """
+    Dict reflection that spreads its keys across 'shards' documents
+    {**obj_ref, 'key': key, 'shard': number, 'dict': {...}} by stable key hash,
+    so no single document grows without bound.
+    """
+    _remote_queries = False
+
+    async def __ainit__(self, d=None, *, shards=16, **kwargs):
+        if '_id' in kwargs.get('obj_ref', {}):
+            raise MongoReflectionError('"obj_ref" can\'t contain "_id" as it\'s shared by all shard documents!')
+        if shards < 1:
+            raise ValueError('"shards" must be positive!')
+
+        self._shards = shards
+        self._dict_cls = MongoDictReflection
+        await super().__ainit__(d, **kwargs)
+
+    def _reflection_ref(self, **query):
+        ref = dict(self.obj_ref, key=self.key)
+        ref.update(query)
+        return ref
+
+    def _shard(self, key):
+        # python's hash() of str is salted per process, so crc32 is used to keep shards stable
+        return zlib.crc32(str(key).encode()) % self._shards
+
+    def _shard_ref(self, key):
+        return self._reflection_ref(shard=self._shard(key))
+
+    def _new_nested(self, key, val):
+        nested = super()._new_nested(key, val)
+        nested.obj_ref = self._shard_ref(key)
+        nested.key = f'dict.{key}'
+        nested._upsert = False
+        return nested
+
+    @classmethod
+    def _move_nested_ixs(cls, self):
+        # dict keys are never moved
+        pass
+
+    async def _reflection_get(self):
+        await self.col.create_index([(key, ASCENDING) for key in self.obj_ref] +
+                                    [('key', ASCENDING), ('shard', ASCENDING)])
+
+        docs = await self.col.find(self._reflection_ref(), projection={'shard': 1, 'dict': 1}).to_list(None)
+
+        dct = {}
+        moved = {}
+        for doc in docs:
+            shard_dict = doc.get('dict', {})
+            dct.update(shard_dict)
+            # keys are moved to their shards if shards number was changed
+            for key, val in shard_dict.items():
+                if self._shard(key) != doc['shard']:
+                    moved.setdefault(doc['shard'], {})[key] = val
+
+        if moved:
+            ops = [UpdateOne(self._reflection_ref(shard=shard), {'$unset': {f'dict.{key}': '' for key in keys}})
+                   for shard, keys in moved.items()]
+            ops.extend(self._update_ops({key: val for keys in moved.values() for key, val in keys.items()}))
+            await self.col.bulk_write(ops, ordered=True)
+
+        if not dct:
+            return {}
+
+        return await self._proc_loaded(self, dct, self._loads)
+
+    def _update_ops(self, upd_dict):
+        shard_sets = {}
+        for key, val in upd_dict.items():
+            shard_sets.setdefault(self._shard(key), {})[f'dict.{key}'] = val
+
+        return [UpdateOne(self._reflection_ref(shard=shard), {'$set': shard_set}, upsert=True)
+                for shard, shard_set in shard_sets.items()]
+
+    async def _reflection_clear(self):
+        return await self.col.delete_many(self._reflection_ref())
+
+    async def _reflection_pop(self, pop_key, default=None):
+        return await self.col.update_one(self._shard_ref(pop_key), {'$unset': {f'dict.{pop_key}': ''}})
+
+    async def _reflection_update(self, upd_dict):
+        # keys come as '<self.key>.<dict key>' paths
+        upd_dict = {path[len(self.key) + 1:]: val for path, val in upd_dict.items()}
+        if upd_dict:
+            return await self.col.bulk_write(self._update_ops(upd_dict), ordered=False)
@@ -0,0 +1,107 @@
+import asyncio
+import weakref
+from collections import OrderedDict
+
+from bson import BSON
+
+
+class ReflectionCache:
+    """
+    LRU registry of reflections of 'cls' type stored at 'key' of documents in 'col', one per 'obj_ref'.
+    Reflections are created lazily from their db state, concurrent requests of the same 'obj_ref'
+    share one creation. When cache grows over 'maxsize' least recently used reflection is evicted,
+    its pending ops are flushed in background and its dispatcher is stopped once it's released,
+    so evicted reflections don't keep memory and dispatcher tasks, but ones still held by callers
+    keep reflecting their changes. Evicted reflection requested again while it's alive is returned
+    instead of creating a new one.
+    """
+    def __init__(self, cls, col, key, maxsize=128, loop=None, **kwargs):
+        self.cls = cls
+        self.col = col
+        self.key = key
+        self.maxsize = maxsize
+        self.loop = loop if loop else asyncio._get_running_loop()
+        # extra arguments passed to each reflection
+        self.kwargs = kwargs
+
+        self._reflections = OrderedDict()
+        self._creating = {}
+        self._evicted = weakref.WeakValueDictionary()
+        self._flushing = set()
+
+    @staticmethod
+    def _ref_key(obj_ref):
+        return BSON.encode(obj_ref)
+
+    def __len__(self):
+        return len(self._reflections)
+
+    def __contains__(self, obj_ref):
+        return self._ref_key(obj_ref) in self._reflections
+
+    async def get(self, obj_ref):
+        ref_key = self._ref_key(obj_ref)
+
+        if ref_key in self._reflections:
+            self._reflections.move_to_end(ref_key)
+            return self._reflections[ref_key]
+
+        if ref_key not in self._creating:
+            reflection = self._evicted.pop(ref_key, None)
+            if reflection is not None:
+                self._add(ref_key, reflection)
+                return reflection
+
+            self._creating[ref_key] = asyncio.ensure_future(self._create(ref_key, obj_ref), loop=self.loop)
+
+        return await asyncio.shield(self._creating[ref_key])
+
+    async def _create(self, ref_key, obj_ref):
+        try:
+            reflection = await self.cls(col=self.col, obj_ref=obj_ref, key=self.key, loop=self.loop, **self.kwargs)
+        finally:
+            del self._creating[ref_key]
+
+        self._add(ref_key, reflection)
+        return reflection
+
+    def _add(self, ref_key, reflection):
+        self._reflections[ref_key] = reflection
+
+        while len(self._reflections) > self.maxsize:
+            self._evict(*self._reflections.popitem(last=False))
+
+    @staticmethod
+    async def _flush(reflection):
+        # keeps reflection alive until its pending ops are done, its finalizer stops dispatcher when it's released
+        await reflection.mongo_pending.join()
+
+    def _evict(self, ref_key, reflection):
+        self._evicted[ref_key] = reflection
+        task = asyncio.ensure_future(self._flush(reflection), loop=self.loop)
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def evict(self, obj_ref):
+        """
+        Evicts reflection of 'obj_ref' and waits until its pending ops are done.
+        """
+        reflection = self._reflections.pop(self._ref_key(obj_ref), None)
+        if reflection is not None:
+            self._evict(self._ref_key(obj_ref), reflection)
+            await reflection.mongo_pending.join()
+
+    async def flush(self):
+        """
+        Waits until pending ops of all cached and evicted reflections are done.
+        """
+        await asyncio.gather(*[reflection.mongo_pending.join() for reflection in self._reflections.values()],
+                             *self._flushing)
+
+    async def clear(self):
+        """
+        Evicts all reflections and waits until their pending ops are done.
+        """
+        while self._reflections:
+            self._evict(*self._reflections.popitem(last=False))
+        await self.flush()
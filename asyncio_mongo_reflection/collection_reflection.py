@@ -0,0 +1,186 @@
+import weakref
+
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne, ReplaceOne, DeleteOne, DeleteMany
+
+from .base import _SyncObjBase, MongoReflectionError
+from .deque_reflection import MongoDequeReflection
+from .dict_reflection import MongoDictReflection
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+
+class _DocumentReflection(MongoDictReflection):
+    """
+    Dict reflection of a whole document (but '_id') of MongoCollectionReflection.
+    Its ops are turned into write models which are sent with collection's batched 'bulk_write'.
+    """
+    _upsert = False
+    _remote_queries = False
+
+    def _bulk(self, ops):
+        return self._parent._bulk(ops)
+
+    def _reflection_clear(self):
+        return self._bulk([ReplaceOne(self.obj_ref, self.obj_ref)])
+
+    def _reflection_pop(self, pop_key, default=None):
+        return self._bulk([UpdateOne(self.obj_ref, {'$unset': {self._subkey(pop_key): ''}})])
+
+    def _reflection_popitem(self, popped_key):
+        return self._reflection_pop(popped_key)
+
+    def _reflection_update(self, upd_dict):
+        return self._bulk([UpdateOne(self.obj_ref, {'$set': upd_dict})])
+
+    def _reflection_setitem(self, val):
+        return self._reflection_update(val)
+
+    def _reflection_delitem(self, key):
+        return self._reflection_pop(key)
+
+
+class MongoCollectionReflection(dict, _SyncObjBase):
+    """
+    Reflection of documents of 'col' matching 'query' as dict of '_id' to dict reflection of each document.
+    Documents are loaded with one cursor and all of them share one dispatcher. Documents inserts, replaces
+    and deletes and changes of their top level fields are sent with 'bulk_write', ops made one after
+    another before dispatcher gets to them are sent with one 'bulk_write'.
+    Ops on nested lists/dicts of documents are sent one by one in the same ordered stream.
+    """
+    _collection_cls = AsyncIOMotorCollection
+    _mutators = frozenset(('insert', '__setitem__', '__delitem__', 'pop', 'popitem', 'clear', 'update', 'setdefault'))
+
+    async def __ainit__(self, *, query=None, dumps=None, loads=None, write_concern=None, **kwargs):
+
+        self._init_codec(dumps, loads)
+        # documents are matched by query and their fields are set from document root
+        kwargs.update(obj_ref=query or {}, key='')
+        self._init_col(kwargs, write_concern)
+        # ops list of 'bulk_write' waiting in dispatcher queue and its coroutine, new ops are added to it
+        self._stream = {'ops': None, 'coro': None}
+        await super().__ainit__(None, **kwargs)
+
+        enqueue = self._enqueue_coro
+
+        def enqueue_coro(coro, priority=1):
+            # ops were added to 'bulk_write' waiting in queue
+            if coro is None:
+                return
+            # ops made after other op can't be sent before it
+            if coro is not self._stream['coro']:
+                self._stream.update(ops=None, coro=None)
+            enqueue(coro, priority)
+
+        self._enqueue_coro = enqueue_coro
+
+        async for doc in self.col.find(self.obj_ref):
+            _id = doc.pop('_id')
+            document = self._new_document(_id)
+            dict.__init__(document, await document._proc_loaded(document, doc, self._loads))
+            super(MongoCollectionReflection, self).__setitem__(_id, document)
+
+    async def _reflection_get(self):
+        # documents are loaded with cursor when dispatcher is ready
+        return {}
+
+    def _new_document(self, _id):
+        document = _DocumentReflection.__cnew__(_DocumentReflection)
+        document.__dict__ = self.__dict__.copy()
+        document.obj_ref = {'_id': _id}
+        document._parent = weakref.proxy(self)
+        # document ops keep order with collection ones
+        document._tree_depth = self._tree_depth
+        document._frozen_gen = self._cow.gen
+        document._frozen = ()
+        document._dict_cls = MongoDictReflection
+        document._deque_cls = MongoDequeReflection
+        return document
+
+    def _pushed_document(self, _id, doc):
+        """
+        Creates document reflection from 'doc' and returns it with its dumped copy.
+        """
+        if not isinstance(doc, dict):
+            raise TypeError('Collection documents must be dicts!')
+
+        document = self._new_document(_id)
+        doc = {key: val for key, val in doc.items() if key != '_id'}
+        dict.__init__(document, doc)
+        dumped = self._run_now(document._proc_pushed(document, doc))
+        return document, dict(dumped, _id=_id)
+
+    def _bulk(self, ops):
+        """
+        Returns 'bulk_write' coroutine of 'ops' to enqueue or None if they are added to the one waiting in queue.
+        """
+        if self._stream['ops'] is not None:
+            self._stream['ops'].extend(ops)
+            return None
+
+        coro = self._reflection_bulk(ops)
+        # journal records op arguments when it's enqueued, so they can't be changed later
+        if not hasattr(self, '_journal'):
+            self._stream.update(ops=ops, coro=coro)
+        return coro
+
+    def insert(self, doc):
+        """
+        Inserts new document and returns its '_id'.
+        """
+        _id = doc['_id'] if '_id' in doc else ObjectId()
+        if _id in self:
+            raise MongoReflectionError(f'Document with "_id" {_id!r} is already reflected!')
+
+        document, dumped = self._pushed_document(_id, doc)
+        self._touch()
+        super(MongoCollectionReflection, self).__setitem__(_id, document)
+        self._enqueue_coro(self._bulk([InsertOne(dumped)]), self._tree_depth)
+        return _id
+
+    def __setitem__(self, _id, doc):
+        document, dumped = self._pushed_document(_id, doc)
+        self._touch()
+        super(MongoCollectionReflection, self).__setitem__(_id, document)
+        self._enqueue_coro(self._bulk([ReplaceOne({'_id': _id}, dumped, upsert=True)]), self._tree_depth)
+
+    def __delitem__(self, _id):
+        self._touch()
+        super(MongoCollectionReflection, self).__delitem__(_id)
+        self._enqueue_coro(self._bulk([DeleteOne({'_id': _id})]), self._tree_depth)
+
+    def pop(self, _id, *default):
+        if _id not in self:
+            return super(MongoCollectionReflection, self).pop(_id, *default)
+
+        self._touch()
+        document = super(MongoCollectionReflection, self).pop(_id)
+        self._enqueue_coro(self._bulk([DeleteOne({'_id': _id})]), self._tree_depth)
+        return document
+
+    def popitem(self):
+        self._touch()
+        _id, document = super(MongoCollectionReflection, self).popitem()
+        self._enqueue_coro(self._bulk([DeleteOne({'_id': _id})]), self._tree_depth)
+        return _id, document
+
+    def clear(self):
+        ids = list(self)
+        self._touch()
+        super(MongoCollectionReflection, self).clear()
+        if ids:
+            self._enqueue_coro(self._bulk([DeleteMany({'_id': {'$in': ids}})]), self._tree_depth)
+
+    def update(self, *args, **kwargs):
+        for _id, doc in dict(*args, **kwargs).items():
+            self[_id] = doc
+
+    def setdefault(self, _id, doc=None):
+        if _id not in self:
+            self[_id] = doc if doc is not None else {}
+        return self[_id]
+
+    async def _reflection_bulk(self, ops):
+        # ops made after 'bulk_write' is started are sent with the next one
+        if self._stream['ops'] is ops:
+            self._stream.update(ops=None, coro=None)
+        return await self.col.bulk_write(ops)
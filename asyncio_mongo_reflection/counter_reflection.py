@@ -0,0 +1,84 @@
+from numbers import Number
+
+from .dict_reflection import MongoDictReflection, DictReflection
+
+
+class MongoCounterReflection(MongoDictReflection):
+    """
+    Dict of numbers that works like collections.Counter: missing keys are 0, 'update' adds counts
+    and assigning a value changes it by its difference with the old one. Changes are reflected with '$inc',
+    so concurrent increments from other processes aren't lost. Increments made before dispatcher gets to them
+    are summed up locally and sent with one '$inc'.
+    """
+    _mutators = MongoDictReflection._mutators | {'inc', 'subtract'}
+
+    async def __ainit__(self, d=None, **kwargs):
+        # deltas of '$inc' op waiting in dispatcher queue, new increments are added to it
+        self._deltas = None
+        await super().__ainit__(d, **kwargs)
+
+        self._enqueue_inc = self._enqueue_coro
+
+        def enqueue_coro(coro, priority=1):
+            # increments after other op must be sent after it too
+            self._deltas = None
+            self._enqueue_inc(coro, priority)
+
+        self._enqueue_coro = enqueue_coro
+
+    def __missing__(self, key):
+        return 0
+
+    @staticmethod
+    def _check_count(val):
+        if not isinstance(val, Number) or isinstance(val, bool):
+            raise TypeError(f'Counter values must be numbers, got {type(val).__name__}!')
+
+    def _inc(self, counts):
+        deltas = self._deltas if self._deltas is not None else {}
+
+        for key, delta in counts.items():
+            path = self._subkey(key)
+            deltas[path] = deltas.get(path, 0) + delta
+
+        if deltas is not self._deltas:
+            self._enqueue_inc(self._reflection_inc(deltas), self._tree_depth)
+            # journal records op arguments when it's enqueued, so they can't be changed later
+            if not hasattr(self, '_journal'):
+                self._deltas = deltas
+
+    def __setitem__(self, key, value):
+        self._check_count(value)
+        delta = value - self[key]
+        self._touch()
+        super(DictReflection, self).__setitem__(key, value)
+        self._inc({key: delta})
+
+    def inc(self, key, delta=1):
+        self[key] = self[key] + delta
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        counts = dict(*args, **kwargs)
+        # counter isn't changed at all if any delta is invalid
+        for delta in counts.values():
+            self._check_count(delta)
+        if not counts:
+            return
+
+        self._touch()
+        for key, delta in counts.items():
+            super(DictReflection, self).__setitem__(key, self[key] + delta)
+        self._inc(counts)
+
+    def subtract(self, *args, **kwargs):
+        counts = dict(*args, **kwargs)
+        for delta in counts.values():
+            self._check_count(delta)
+        self.update({key: -delta for key, delta in counts.items()})
+
+    async def _reflection_inc(self, deltas):
+        # increments made after op is started are sent with the next one
+        if self._deltas is deltas:
+            self._deltas = None
+        return await self.col.update_one(self.obj_ref, {'$inc': deltas}, upsert=self._upsert)
@@ -1,6 +1,6 @@
 import asyncio
+import functools
 import inspect
-import random
 from abc import ABC, abstractmethod
 
 try:
@@ -9,13 +9,13 @@ except ImportError:
     from collections import deque
     from collections.abc import Iterable
     
-from weakref import proxy
-from hashlib import sha256
-from itertools import zip_longest, islice
+from itertools import zip_longest, islice, count
 
 from .base import _SyncObjBase, MongoReflectionError
+from .indexes import ReflectionIndexes
+from . import remote
 from motor.motor_asyncio import AsyncIOMotorCollection
-from pymongo import ReturnDocument
+from pymongo import ReturnDocument, WriteConcern, UpdateOne
 
 
 class MongoDequeSimple(deque, ABC):  # pragma: no cover
@@ -90,7 +90,25 @@ class MongoDequeSimple(deque, ABC):  # pragma: no cover
         return res
 
 
+def _reflected(method):
+    """
+    Wraps deque method so its '_reflection_<name>' counterpart is enqueued after each call.
+    """
+    @functools.wraps(method)
+    def inner(self, *args):
+        self._touch()
+        res = method(self, *args)
+        self._enqueue_coro(getattr(self, f'_reflection_{method.__name__}')(*args), self._tree_depth)
+        self._move_nested_ixs(self)
+        return res
+
+    return inner
+
+
 class DequeReflection(deque, _SyncObjBase):
+    _mutators = frozenset(('append', 'appendleft', 'extend', 'extendleft', 'insert', 'rotate', 'clear', 'pop',
+                           'popleft', 'remove', 'reverse', '__setitem__', '__delitem__', '__add__', '__iadd__',
+                           '__mul__', '__imul__', '__rmul__', 'create_index', 'drop_index', 'lookup', 'lookup_range'))
 
     @abstractmethod
     async def _reflection_get(self):
@@ -148,6 +166,10 @@ class DequeReflection(deque, _SyncObjBase):
     async def _reflection_delitem(self):
         raise NotImplementedError
 
+    @abstractmethod
+    async def _reflection_setslice(self):
+        raise NotImplementedError
+
     def __add__(self, other):
         other = self._flattern(list(other))
         arr = list(other)
@@ -190,6 +212,7 @@ class DequeReflection(deque, _SyncObjBase):
         return super(DequeReflection, self).__getitem__(index)
 
     def __setitem__(self, key, value):
+        self._touch()
         set_kvs = []
         ins_vs = []
         ins_ix = None
@@ -202,9 +225,6 @@ class DequeReflection(deque, _SyncObjBase):
 
         else:
             # slices assigned iterable support
-            if self[key] is []:
-                return
-
             value = [i for i in value.__iter__()]
             start = key.start
             stop = key.stop
@@ -232,6 +252,10 @@ class DequeReflection(deque, _SyncObjBase):
                         ins_vs.append(val)
 
             ins_val_at = ins_ix = (stop if stop else len(self)) if not from_left else 0
+            if ins_ix < 0:
+                ins_val_at = ins_ix = max(len(self) + ins_ix, 0)
+            # slice stop past the end inserts at the end
+            ins_val_at = ins_ix = min(ins_ix, len(self))
             for val in ins_vs:
                 super(DequeReflection, self).insert(ins_val_at, val)
                 if not from_left:
@@ -239,50 +263,34 @@ class DequeReflection(deque, _SyncObjBase):
 
         self._move_nested_ixs(self)
 
-        # separate db operations for replacements
-        for key, value in set_kvs:
-            if self._check_nested_type(value):
-                value = self._run_now(self._proc_pushed(self, [value]))
-
-            elif DictReflection._check_nested_type(value):
-                nested = self._run_now(self._dict_cls._create_nested(self, key, value))
-                super(DequeReflection, self).__setitem__(key, nested)
-                value = [self._run_now(DictReflection._proc_pushed(nested, dict(value), recursive_call=True))]
+        if from_left:
+            ins_vs.reverse()
 
-            else:
-                value = [self._dumps(value)]
-
-            self._enqueue_coro(self._reflection_setitem(key, value), self._tree_depth)
-
-        # insert with one reflection extend db operation
-        if ins_vs:
-            if from_left:
-                ins_vs.reverse()
+        # replaced elements placed after insertion point are shifted locally
+        set_ixs = [ix for ix, _ in set_kvs]
+        local_ixs = [ix + len(ins_vs) if ins_vs and ix >= ins_ix else ix for ix in set_ixs]
+        local_ixs.extend(range(ins_ix, ins_ix + len(ins_vs)) if ins_vs else [])
+        values = [val for _, val in set_kvs] + ins_vs
 
-            if ins_ix < 0:
-                ins_ix = len(self) + ins_ix - 1
+        if any(self._check_nested_type(val) or DictReflection._check_nested_type(val) for val in values):
+            values = self._run_now(self._proc_assigned(zip(local_ixs, values)))
+        else:
+            values = [self._dumps(val) for val in values]
 
-            self._run_now(self._proc_pushed(self, ins_vs))
-            self._enqueue_coro(self._reflection_extend(ins_vs, position=ins_ix), self._tree_depth)
+        if type(key) is int:
+            self._enqueue_coro(self._reflection_setitem(key, values), self._tree_depth)
+        elif values:
+            # replacements and insertion are reflected with one ordered db operation
+            self._enqueue_coro(self._reflection_setslice(list(zip(set_ixs, values)),
+                                                         values[len(set_ixs):], ins_ix), self._tree_depth)
+        # assigned elements are nested reflections now
+        self._reindex()
 
     def __delitem__(self,  key):
+        self._touch()
         super(DequeReflection, self).__delitem__(key)
         self._move_nested_ixs(self)
-        self._enqueue_coro(self._reflection_delitem(key), self._tree_depth)
-
-    @classmethod
-    def _flattern(cls, nlist, dumps=None):
-        fdumps = lambda arg: dumps(arg) if callable(dumps) else arg
-
-        for ix, el in enumerate(nlist):
-            if isinstance(el, DequeReflection) or isinstance(el, deque):
-                nlist[ix] = cls._flattern(list(el), dumps)
-            elif DictReflection._check_nested_type(el):
-                nlist[ix] = DictReflection._flattern(dict(el), dumps)
-            else:
-                nlist[ix] = fdumps(el)
-
-        return nlist
+        self._enqueue_coro(self._reflection_delitem(key, self._sentinel()), self._tree_depth)
 
     @classmethod
     def _move_nested_ixs(cls, self):
@@ -295,163 +303,218 @@ class DequeReflection(deque, _SyncObjBase):
                 if el.key != exp_key:
                     el.key = exp_key
                     type(el)._move_nested_ixs(el)
+        self._reindex()
 
-    @classmethod
-    async def _create_nested(cls, parent, ix, val):
-        self = cls.__cnew__(cls)
-        self.__dict__ = parent.__dict__.copy()
-        maxlen = getattr(val, 'maxlen', getattr(parent, 'maxlen', None))
-        return await cls.init(self, list(val), key=f'{self.key}.{ix}',
-                              maxlen=maxlen, _parent=proxy(parent))
+    def _reindex(self):
+        if self._indexes is not None:
+            self._indexes.reconcile(self)
 
-    @classmethod
-    async def _proc_loaded(cls, parent, arr, loads, parent_ix=None):
+    def create_index(self, field, kind='hash'):
         """
-        Creates nested classes after data is loaded from db.
+        Creates local index of dict elements by value of 'field' path (i.e. 'job.id'), 'hash' index can be
+        used by 'lookup' and 'sorted' index by 'lookup_range' too. Index is kept up to date on each change
+        of deque or its elements. Elements without field or with unhashable value aren't indexed.
         """
-        for ix, el in enumerate(arr):
+        if self._indexes is None:
+            self._indexes = ReflectionIndexes()
+        self._indexes.create(self, field, kind)
 
-            if isinstance(el, list):
-                set_ix = f'{parent_ix}.{ix}' if parent_ix else ix
-                el = await cls._proc_loaded(parent, el, loads, set_ix)
-                nested_cls = parent.__class__ if isinstance(parent, DequeReflection) else parent._deque_cls
-                arr[ix] = await nested_cls._create_nested(parent, set_ix, el)
+    def drop_index(self, field):
+        if self._indexes is None or field not in self._indexes.fields:
+            raise MongoReflectionError(f'There is no index on "{field}" field!')
+        self._indexes.drop(field)
 
-            elif isinstance(el, dict):
-                set_ix = f'{parent_ix}.{ix}' if parent_ix else ix
-                el = await DictReflection._proc_loaded(parent, el, loads, set_ix)
-                nested_cls = parent.__class__ if isinstance(parent, DictReflection) else parent._dict_cls
-                arr[ix] = await nested_cls._create_nested(parent, set_ix, el)
+    def lookup(self, field, value):
+        """
+        Returns list of live nested reflections of elements with 'field' equal to 'value' using index.
+        """
+        if self._indexes is None:
+            raise MongoReflectionError(f'There is no index on "{field}" field!')
+        return self._indexes.find(field, value)
 
-            else:
+    def lookup_range(self, field, start=None, stop=None):
+        """
+        Returns list of elements with 'start' <= 'field' < 'stop' ordered by field using sorted index.
+        """
+        if self._indexes is None:
+            raise MongoReflectionError(f'There is no index on "{field}" field!')
+        return self._indexes.range(field, start, stop)
+
+    @classmethod
+    async def _proc_loaded(cls, parent, arr, loads):
+        """
+        Creates nested classes after data is loaded from db.
+        """
+        offload = parent._offloads_codec(arr, getattr(parent, '_loads_fn', None))
+
+        for ix, el in enumerate(arr):
+            if isinstance(el, list) or isinstance(el, dict):
+                arr[ix], _ = parent._build_nested(ix, el, loads=None if offload else loads)
+            elif not offload:
                 arr[ix] = loads(el)
 
+        if offload:
+            # elements are loaded after nested reflections are created, so loaded lists/dicts stay plain
+            await parent._offload_codec(arr, parent._loads_fn)
         return arr
 
-    def _find_el(self, el):
+    async def _proc_assigned(self, items):
         """
-        Support same elements in list
+        Check elements assigned to given deque indexes and create nested classes.
         """
-        found_mod_at = []
-        found_flat_at = []
-        for ix, val in enumerate(self):
-            if val == el:
-                if isinstance(val, DictReflection) or isinstance(val, DequeReflection):
-                    found_mod_at.append(ix)
-                else:
-                    found_flat_at.append(ix)
-
-        if not found_flat_at and not found_mod_at:
-            raise ValueError
-
-        if not found_flat_at:
-            return found_mod_at[0]
-        else:
-            return found_flat_at[0]
+        return [(await self._proc_pushed(self, [el], at=ix))[0] for ix, el in items]
 
     @staticmethod
     def _check_nested_type(el):
         return isinstance(el, list) or isinstance(el, deque) or isinstance(el, DequeReflection)
 
     @staticmethod
-    async def _proc_pushed(self, arg, from_left=False):
+    async def _proc_pushed(self, arg, at=None, from_left=False):
         """
         Check elements pushed to deque and create nested classes.
+        Pushed elements are expected to be placed in deque already starting from 'at' index
+        (backwards if 'from_left' is set), by default they are the last ones.
         """
         push_arr = []
 
         if not isinstance(arg, Iterable):
             return arg
 
-        for el in arg:
-            if DictReflection._check_nested_type(el):
-                try:
-                    ix = self._find_el(el)
-                except ValueError:  # trimmed by maxlen
-                    el = await DictReflection._proc_pushed(self, dict(el), recursive_call=True)
-                else:
-                    nested = await self._dict_cls._create_nested(self, ix, el)
-                    super(DequeReflection, self).__setitem__(ix, nested)
-                    el = await DictReflection._proc_pushed(self[ix], dict(el), recursive_call=True)
+        if at is None:
+            at = len(self) - len(arg)
 
-            elif self._check_nested_type(el):
-                try:
-                    ix = self._find_el(el)
-                except ValueError:   # trimmed by maxlen
-                    el = await self._proc_pushed(self, list(el))
-                else:
-                    nested = await self._create_nested(self, ix, el)
+        dumps = self._dumps
+        # large pushes are dumped in executor
+        flat = self._flattern(list(arg)) if self._offloads_push() else None
+        if flat is not None and self._offloads_codec(flat, getattr(self, '_dumps_fn', None)):
+            await self._offload_codec(flat, self._dumps_fn)
+            dumps = None
+
+        for ix, el in zip(count(at, -1 if from_left else 1), arg):
+            if DictReflection._check_nested_type(el) or self._check_nested_type(el):
+                if 0 <= ix < len(self):
+                    nested, el = self._build_nested(ix, el, dumps=dumps)
                     super(DequeReflection, self).__setitem__(ix, nested)
-                    el = await self._proc_pushed(self[ix], list(el))
+                elif dumps:  # trimmed by maxlen
+                    el = self._flattern([el], dumps)[0]
 
-            else:
-                el = self._dumps(el)
+            elif dumps:
+                el = dumps(el)
 
             if from_left:
                 push_arr.insert(0, el)
             else:
                 push_arr.append(el)
 
+        if not dumps:
+            return flat[::-1] if from_left else flat
         return push_arr
 
-    def __getattribute__(self, name):
-        def cb(func, deque_method):
-            def inner(*args, **kwargs):
-                func_res = func(*args, **kwargs)
+    def _reflect_pushed(self, reflection, arr, **kwargs):
+        arr = self._run_now(self._proc_pushed(self, arr, **kwargs))
+        self._enqueue_coro(reflection(arr), self._tree_depth)
+        self._move_nested_ixs(self)
 
-                if name in {'append', 'appendleft', 'extend', 'extendleft', 'insert'}:
-                    args = list(args)
-                    p_ix = 0 if name != 'insert' else 1
-                    if name in {'append', 'appendleft', 'insert'}:
-                        args[p_ix] = [args[p_ix]]
+    def append(self, el):
+        self._touch()
+        super(DequeReflection, self).append(el)
+        self._reflect_pushed(self._reflection_append, [el], at=len(self) - 1)
+
+    def appendleft(self, el):
+        self._touch()
+        super(DequeReflection, self).appendleft(el)
+        self._reflect_pushed(self._reflection_appendleft, [el], at=0)
+
+    def extend(self, iterable):
+        arr = list(iterable)
+        self._touch()
+        super(DequeReflection, self).extend(arr)
+        self._reflect_pushed(self._reflection_extend, arr)
+
+    def extendleft(self, iterable):
+        arr = list(iterable)
+        self._touch()
+        super(DequeReflection, self).extendleft(arr)
+        self._reflect_pushed(self._reflection_extendleft, arr, at=len(arr) - 1, from_left=True)
+
+    def insert(self, ix, el):
+        at = min(max(len(self) + ix if ix < 0 else ix, 0), len(self))
+        self._touch()
+        super(DequeReflection, self).insert(ix, el)
+        self._reflect_pushed(functools.partial(self._reflection_insert, ix), [el], at=at)
+
+    def rotate(self, num=1):
+        self._touch()
+        super(DequeReflection, self).rotate(num)
+        self._enqueue_coro(self._reflection_rotate(num), self._tree_depth)
+        self._move_nested_ixs(self)
 
-                    args[p_ix] = self._run_now(self._proc_pushed(
-                        self, args[p_ix], from_left=True if name != 'extendleft' else False))
+    clear = _reflected(deque.clear)
+    pop = _reflected(deque.pop)
+    popleft = _reflected(deque.popleft)
+    remove = _reflected(deque.remove)
+    reverse = _reflected(deque.reverse)
 
-                self._enqueue_coro(getattr(self, f'_reflection_{deque_method}')(*args), self._tree_depth)
-                self._move_nested_ixs(self)
-                return func_res
 
-            return inner
+class MongoDequeReflection(DequeReflection):
+    # creates reflected document if it doesn't exist yet
+    _upsert = True
+    _collection_cls = AsyncIOMotorCollection
+    _idempotent_ops = frozenset(('_reflection_clear', '_reflection_setitem'))
 
-        res = super().__getattribute__(name)
-        if name in {'append', 'appendleft', 'clear', 'extend', 'extendleft', 'insert',
-                    'pop', 'popleft', 'remove', 'reverse', 'rotate'}:
-            res = cb(res, name)
-        return res
+    async def __ainit__(self, lst=list(), *, dumps=None, loads=None, write_concern=None, indexes=None, **kwargs):
+        self._init_codec(dumps, loads)
+        self._init_col(kwargs, write_concern)
 
+        if not hasattr(self, '_dict_cls'):
+            self._dict_cls = MongoDictReflection
+        await super().__ainit__(lst, **kwargs)
+        for field, kind in (indexes or {}).items():
+            self.create_index(field, kind)
 
-class MongoDequeReflection(DequeReflection):
+    @classmethod
+    async def stream(cls, col, obj_ref, key, page=1000, loads=None):
+        """
+        Read-only async iterator over reflected array that isn't loaded into memory: array is fetched
+        by 'page' elements with aggregation '$slice' (so 'key' can have array indexes too) and 'loads'
+        is applied to elements of each page only.
+        Pages are fetched separately, so concurrent changes of array may be seen partially.
+        """
+        if not isinstance(col, cls._collection_cls):
+            raise TypeError(f'"col" argument must be a {cls._collection_cls.__name__} instance!')
 
-    async def __ainit__(self, lst=list(), *, dumps=None, loads=None, **kwargs):
+        skip = 0
+        while True:
+            res = await remote.remote_slice(col, obj_ref, key, skip, skip + page, loads)
+            for el in res:
+                yield el
 
-        if not hasattr(self, '_dumps'):
-            self._dumps = lambda arg: dumps(arg) if callable(dumps) else arg
-        if not hasattr(self, '_loads'):
-            self._loads = lambda arg: loads(arg) if callable(loads) else arg
+            if len(res) < page:
+                return
+            skip += page
 
-        if 'col' in kwargs:
-            self.col = kwargs.pop('col')
-        if 'obj_ref' in kwargs:
-            self.obj_ref = kwargs.pop('obj_ref')
-        if 'key' in kwargs:
-            self.key = kwargs.pop('key')
+    async def remote_filter(self, expr):
+        """
+        Returns elements matching aggregation expression 'expr' ('$$el' is element) filtered in db.
+        Ops that are still pending aren't seen by remote queries.
+        """
+        return await remote.remote_filter(*self._remote_args(), expr, self._loads_fn)
 
-        if not hasattr(self, 'col') or not hasattr(self, 'obj_ref') or not hasattr(self, 'key'):
-            raise MongoReflectionError('You need to provide "col", "obj_ref" and "key" named arguments!')
-        elif not isinstance(self.col, AsyncIOMotorCollection):
-            raise TypeError('"col" argument must be a AsyncIOMotorCollection instance!')
+    async def remote_count(self, expr=None):
+        return await remote.remote_count(*self._remote_args(), expr)
 
-        self._dict_cls = MongoDictReflection
-        await super().__ainit__(lst, **kwargs)
+    async def remote_slice(self, start=None, stop=None):
+        return await remote.remote_slice(*self._remote_args(), start, stop, self._loads_fn)
 
     async def _reflection_get(self):
         mongo_arr = await self.col.find_one(self.obj_ref, projection={self.key: 1})
 
         if not mongo_arr:
-            mongo_arr = await self.col.find_one_and_update(self.obj_ref, {'$set': {self.key: []}},
-                                                           upsert=True, projection={self.key: 1},
-                                                           return_document=ReturnDocument.AFTER)
+            # document is created with acknowledged write even if reflection's write concern is w=0
+            col = self.col.with_options(write_concern=WriteConcern())
+            mongo_arr = await col.find_one_and_update(self.obj_ref, {'$set': {self.key: []}},
+                                                      upsert=True, projection={self.key: 1},
+                                                      return_document=ReturnDocument.AFTER)
 
         nested = self.key.split(sep='.')
         for key in nested:
@@ -473,7 +536,7 @@ class MongoDequeReflection(DequeReflection):
     async def _reflection_clear(self):
         return await self.col.update_one(self.obj_ref, {'$set': {f'{self.key}': []}})
 
-    async def _reflection_extend(self, arr, maxlen=None, position=None):
+    def _push_update(self, arr, maxlen=None, position=None):
         maxlen = maxlen or self.maxlen
         mongo_slice = {'$slice': -maxlen} if maxlen else {}
         mongo_position = {'$position': position} if position is not None else {}
@@ -482,8 +545,11 @@ class MongoDequeReflection(DequeReflection):
         push_val.update(mongo_slice)
         push_val.update(mongo_position)
 
-        return await self.col.update_one(self.obj_ref,
-                                         {'$push': {f'{self.key}': push_val}}, upsert=True)
+        return {'$push': {f'{self.key}': push_val}}
+
+    async def _reflection_extend(self, arr, maxlen=None, position=None):
+        return await self.col.update_one(self.obj_ref, self._push_update(arr, maxlen, position),
+                                         upsert=self._upsert)
 
     async def _reflection_extendleft(self, arr):
         maxlen = -self.maxlen if self.maxlen is not None else None
@@ -498,9 +564,7 @@ class MongoDequeReflection(DequeReflection):
     async def _reflection_popleft(self):
         return await self.col.update_one(self.obj_ref, {'$pop': {f'{self.key}': -1}})
 
-    async def _reflection_remove(self, el):
-        h = sha256(str(random.getrandbits(256)).encode('utf-8')).hexdigest()
-
+    def _reflection_remove(self, el):
         if self._check_nested_type(el):
             el = self._flattern(list(el), self._dumps)
         if DictReflection._check_nested_type(el):
@@ -509,11 +573,7 @@ class MongoDequeReflection(DequeReflection):
         if type(el) not in (list, dict):
             el = self._dumps(el)
 
-        ref = self.obj_ref.copy()
-        ref.update({f'{self.key}': el})
-        await self.col.update_one(ref, {'$set': {f'{self.key}.$': h}})
-
-        await self.col.update_one(self.obj_ref, {'$pull': {f'{self.key}': h}})
+        return self._reflection_remove_marked(el, self._sentinel())
 
     async def _reflection_reverse(self):
 
@@ -544,17 +604,24 @@ class MongoDequeReflection(DequeReflection):
         return await self.col.update_one(self.obj_ref, {'$set': {f'{self.key}': rotate(obj, num)}})
 
     async def _reflection_setitem(self, ix, el):
-        el = el[0]
-        if isinstance(self[ix], DequeReflection) and getattr(el, 'nested_ix', None) == ix:
-            return
-
-        return await self.col.update_one(self.obj_ref, {'$set': {f'{self.key}.{ix}': el}})
-
-    async def _reflection_delitem(self, ix):
-        h = random.getrandbits(32)
-
-        await self.col.update_one(self.obj_ref, {'$set': {f'{self.key}.{ix}': h}})
-        return await self.col.update_one(self.obj_ref, {'$pull': {f'{self.key}': h}})
+        # op doesn't depend on local state, so it can be replayed by journal or workload replayer
+        return await self.col.update_one(self.obj_ref, {'$set': {f'{self.key}.{ix}': el[0]}})
+
+    async def _reflection_setslice(self, set_arr, ins_arr, position):
+        ops = []
+        if set_arr:
+            ops.append(UpdateOne(self.obj_ref, {'$set': {f'{self.key}.{ix}': el for ix, el in set_arr}}))
+        if ins_arr:
+            ops.append(UpdateOne(self.obj_ref, self._push_update(ins_arr, position=position),
+                                 upsert=self._upsert))
+
+        return await self.col.bulk_write(ops, ordered=True)
+
+    async def _reflection_delitem(self, ix, sentinel):
+        # sentinel is chosen when op is enqueued, so retried or replayed op writes the same updates
+        return await self.col.bulk_write([UpdateOne(self.obj_ref, {'$set': {f'{self.key}.{ix}': sentinel}}),
+                                          UpdateOne(self.obj_ref, {'$pull': {f'{self.key}': sentinel}})],
+                                         ordered=True)
 
 
 from .dict_reflection import MongoDictReflection, DictReflection
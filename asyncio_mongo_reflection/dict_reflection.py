@@ -1,13 +1,15 @@
 import inspect
 from abc import ABC, abstractmethod
-from weakref import proxy
 
-from .base import _SyncObjBase, MongoReflectionError
+from .base import _SyncObjBase
+from . import remote
 from motor.motor_asyncio import AsyncIOMotorCollection
-from pymongo import ReturnDocument
+from pymongo import ReturnDocument, WriteConcern
 
 
 class DictReflection(dict, _SyncObjBase):
+    _mutators = frozenset(('__setitem__', '__delitem__', 'clear', 'pop', 'popitem', 'update'))
+
     @abstractmethod
     async def _reflection_get(self):
         raise NotImplementedError
@@ -37,42 +39,22 @@ class DictReflection(dict, _SyncObjBase):
         raise NotImplementedError
 
     def __setitem__(self, key, value):
+        self._touch()
         super(DictReflection, self).__setitem__(key, value)
 
-        if self._check_nested_type(value):
+        if self._check_nested_type(value) or DequeReflection._check_nested_type(value):
             value = self._run_now(self._proc_pushed(self, {key: value}))
 
-        elif DequeReflection._check_nested_type(value):
-            nested = self._run_now(self._deque_cls._create_nested(self, key, value))
-            super(DictReflection, self).__setitem__(key, nested)
-            value = {f'{self.key}.{key}': self._run_now(DequeReflection._proc_pushed(nested, value))}
-
         else:
-            value = {f'{self.key}.{key}': self._dumps(value)}
+            value = {self._subkey(key): self._dumps(value)}
 
         self._enqueue_coro(self._reflection_setitem(value), self._tree_depth)
 
     def __delitem__(self, key):
+        self._touch()
         self._enqueue_coro(self._reflection_delitem(key), self._tree_depth)
         super(DictReflection, self).__delitem__(key)
 
-    @classmethod
-    def _flattern(cls, dct, dumps=None):
-        fdumps = lambda arg: dumps(arg) if callable(dumps) else arg
-
-        for key, val in dct.items():
-
-            if isinstance(val, DictReflection) or isinstance(val, dict):
-                dct[key] = cls._flattern(dict(val), dumps)
-
-            elif DequeReflection._check_nested_type(val):
-                dct[key] = DequeReflection._flattern(list(val), dumps)
-
-            else:
-                dct[key] = fdumps(val)
-
-        return dct
-
     @classmethod
     def _move_nested_ixs(cls, self):
         """
@@ -80,39 +62,27 @@ class DictReflection(dict, _SyncObjBase):
         """
         for key, val in self.items():
             if isinstance(val, DequeReflection) or isinstance(val, DictReflection):
-                exp_key = f'{self.key}.{key}'
+                exp_key = self._subkey(key)
                 if val.key != exp_key:
                     val.key = exp_key
                     type(val)._move_nested_ixs(val)
 
     @classmethod
-    async def _create_nested(cls, parent, key, val):
-        self = cls.__cnew__(cls)
-        self.__dict__ = parent.__dict__.copy()
-        return await cls.init(self, dict(val), key=f'{self.key}.{key}', _parent=proxy(parent))
-
-    @classmethod
-    async def _proc_loaded(cls, parent, dct, loads, parent_key=None):
+    async def _proc_loaded(cls, parent, dct, loads):
         """
         Creates nested classes after data is loaded from db.
         """
-        for key, val in dct.items():
-
-            if isinstance(val, dict):
-                set_key = f'{parent_key}.{key}' if parent_key else key
-                val = await cls._proc_loaded(parent, val, loads, set_key)
-                nested_cls = parent.__class__ if isinstance(parent, DictReflection) else parent._dict_cls
-                dct[key] = await nested_cls._create_nested(parent, set_key, val)
+        offload = parent._offloads_codec(dct, getattr(parent, '_loads_fn', None))
 
-            elif isinstance(val, list):
-                set_key = f'{parent_key}.{key}' if parent_key else key
-                val = await DequeReflection._proc_loaded(parent, val, loads, set_key)
-                nested_cls = parent.__class__ if isinstance(parent, DequeReflection) else parent._deque_cls
-                dct[key] = await nested_cls._create_nested(parent, set_key, val)
-
-            else:
+        for key, val in dct.items():
+            if isinstance(val, dict) or isinstance(val, list):
+                dct[key], _ = parent._build_nested(key, val, loads=None if offload else loads)
+            elif not offload:
                 dct[key] = loads(val)
 
+        if offload:
+            # elements are loaded after nested reflections are created, so loaded lists/dicts stay plain
+            await parent._offload_codec(dct, parent._loads_fn)
         return dct
 
     @staticmethod
@@ -120,95 +90,92 @@ class DictReflection(dict, _SyncObjBase):
         return isinstance(val, dict) or isinstance(val, DictReflection)
 
     @staticmethod
-    async def _proc_pushed(self, pdict, recursive_call=False):
+    async def _proc_pushed(self, pdict):
         """
         Check elements pushed to dict and create nested classes.
         """
         proc_dict = {}
+        dumps = self._dumps
 
-        for key, val in pdict.items():
+        # large dicts are dumped in executor
+        flat = self._flattern(dict(pdict)) if self._offloads_push() else None
+        if flat is not None and self._offloads_codec(flat, getattr(self, '_dumps_fn', None)):
+            await self._offload_codec(flat, self._dumps_fn)
+            dumps = None
 
-            if DequeReflection._check_nested_type(val):
-                nested = await self._deque_cls._create_nested(self, key, val)
-                super(DictReflection, self).__setitem__(key, nested)
-                val = await DequeReflection._proc_pushed(nested, val)
+        for key, val in pdict.items():
 
-            elif self._check_nested_type(val):
-                nested = await self._create_nested(self, key, dict(val))
+            if DequeReflection._check_nested_type(val) or self._check_nested_type(val):
+                nested, val = self._build_nested(key, val, dumps=dumps)
                 super(DictReflection, self).__setitem__(key, nested)
-                val = await self._proc_pushed(nested, dict(val), recursive_call=True)
 
-            else:
-                val = self._dumps(val)
+            elif dumps:
+                val = dumps(val)
 
-            if recursive_call:
-                proc_dict[key] = val
-            else:
-                proc_dict[f'{self.key}.{key}'] = val
+            proc_dict[self._subkey(key)] = val if dumps else flat[key]
 
         return proc_dict
 
-    def __getattribute__(self, name):
-        def cb(func, deque_method):
-
-            def inner(*args, **kwargs):
-                func_res = func(*args, **kwargs)
-
-                if name == 'popitem':
-                    args = list()
-                    args.append(func_res[0])
+    def clear(self):
+        self._touch()
+        super(DictReflection, self).clear()
+        self._enqueue_coro(self._reflection_clear(), self._tree_depth)
 
-                elif name == 'update':
-                    args = list(args)
-                    upd_dict = args.pop() if len(args) else None
-                    merged_dict = dict(upd_dict, **kwargs) if upd_dict else dict(**kwargs)
-                    args.append(self._run_now(self._proc_pushed(self, merged_dict)))
-                    kwargs = {}
-
-                coro = getattr(self, f'_reflection_{deque_method}')(*args, **kwargs)
-                self._enqueue_coro(coro, self._tree_depth)
-
-                return func_res
-            return inner
-
-        res = super().__getattribute__(name)
-        if name in ('clear', 'pop', 'popitem', 'remove', 'update'):
-            res = cb(res, name)
+    def pop(self, key, *default):
+        self._touch()
+        res = super(DictReflection, self).pop(key, *default)
+        self._enqueue_coro(self._reflection_pop(key), self._tree_depth)
         return res
 
+    def popitem(self):
+        self._touch()
+        res = super(DictReflection, self).popitem()
+        self._enqueue_coro(self._reflection_popitem(res[0]), self._tree_depth)
+        return res
 
-class MongoDictReflection(DictReflection):
-
-    async def __ainit__(self, d=None, *, dumps=None, loads=None, **kwargs):
-
-        if not hasattr(self, '_dumps'):
-            self._dumps = lambda arg: dumps(arg) if callable(dumps) else arg
-        if not hasattr(self, '_loads'):
-            self._loads = lambda arg: loads(arg) if callable(loads) else arg
+    def update(self, *args, **kwargs):
+        upd_dict = dict(*args, **kwargs)
+        self._touch()
+        super(DictReflection, self).update(upd_dict)
+        upd_dict = self._run_now(self._proc_pushed(self, upd_dict))
+        self._enqueue_coro(self._reflection_update(upd_dict), self._tree_depth)
 
-        if 'col' in kwargs:
-            self.col = kwargs.pop('col')
-        if 'obj_ref' in kwargs:
-            self.obj_ref = kwargs.pop('obj_ref')
-        if 'key' in kwargs:
-            self.key = kwargs.pop('key')
 
-        if not hasattr(self, 'col') or not hasattr(self, 'obj_ref') or not hasattr(self, 'key'):
-            raise MongoReflectionError('You need to provide "col", "obj_ref" and "key" named arguments!')
+class MongoDictReflection(DictReflection):
+    # creates reflected document if it doesn't exist yet
+    _upsert = True
+    _collection_cls = AsyncIOMotorCollection
+    # dict ops are reflected with '$set'/'$unset' only
+    _idempotent_ops = frozenset(('_reflection_clear', '_reflection_pop', '_reflection_popitem',
+                                 '_reflection_update', '_reflection_setitem', '_reflection_delitem'))
+
+    async def __ainit__(self, d=None, *, dumps=None, loads=None, write_concern=None, **kwargs):
+        self._init_codec(dumps, loads)
+        self._init_col(kwargs, write_concern)
+
+        if not hasattr(self, '_deque_cls'):
+            self._deque_cls = MongoDequeReflection
+        await super().__ainit__(d, **kwargs)
 
-        elif not isinstance(self.col, AsyncIOMotorCollection):
-            raise TypeError('"col" argument must be a AsyncIOMotorCollection instance!')
+    async def remote_filter(self, expr):
+        """
+        Returns dict of items matching aggregation expression 'expr' ('$$el.k' is key, '$$el.v' is value)
+        filtered in db. Ops that are still pending aren't seen by remote queries.
+        """
+        return await remote.remote_dict_filter(*self._remote_args(), expr, self._loads_fn)
 
-        self._deque_cls = MongoDequeReflection
-        await super().__ainit__(d, **kwargs)
+    async def remote_count(self, expr=None):
+        return await remote.remote_count(*self._remote_args(), expr, is_dict=True)
 
     async def _reflection_get(self):
         mongo_dict = await self.col.find_one(self.obj_ref, projection={self.key: 1})
 
         if not mongo_dict:
-            mongo_dict = await self.col.find_one_and_update(self.obj_ref, {'$set': {self.key: {}}},
-                                                            upsert=True, projection={self.key: 1},
-                                                            return_document=ReturnDocument.AFTER)
+            # document is created with acknowledged write even if reflection's write concern is w=0
+            col = self.col.with_options(write_concern=WriteConcern())
+            mongo_dict = await col.find_one_and_update(self.obj_ref, {'$set': {self.key: {}}},
+                                                       upsert=True, projection={self.key: 1},
+                                                       return_document=ReturnDocument.AFTER)
         nested = self.key.split(sep='.')
         for key in nested:
             mongo_dict = mongo_dict.get(key, None)
@@ -224,13 +191,13 @@ class MongoDictReflection(DictReflection):
         return await self.col.update_one(self.obj_ref, {'$set': {self.key: {}}})
 
     async def _reflection_pop(self, pop_key, default=None):
-        return await self.col.update_one(self.obj_ref, {'$unset': {f'{self.key}.{pop_key}': ''}})
+        return await self.col.update_one(self.obj_ref, {'$unset': {self._subkey(pop_key): ''}})
 
     async def _reflection_popitem(self, popped_key):
         return await self._reflection_pop(popped_key)
 
     async def _reflection_update(self, upd_dict):
-        return await self.col.update_one(self.obj_ref, {'$set': upd_dict}, upsert=True)
+        return await self.col.update_one(self.obj_ref, {'$set': upd_dict}, upsert=self._upsert)
 
     async def _reflection_setitem(self, val):
         return await self._reflection_update(val)
@@ -0,0 +1,222 @@
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, InsertOne, UpdateOne, UpdateMany, DeleteOne, DeleteMany
+
+from .base import MongoReflectionError
+from .deque_reflection import MongoDequeReflection, DequeReflection
+from .dict_reflection import DictReflection
+
+
+class MongoDocsDequeReflection(MongoDequeReflection):
+    """
+    Deque reflection that stores each element as separate document instead of one array field.
+    Element documents look like {**obj_ref, 'key': key, 'seq': seq, 'val': element} where 'seq' numbers
+    are contiguous and follow deque order, so append/popleft are reflected with a single insert/delete
+    and deque size isn't limited by mongo document size.
+    Nested lists/dicts of an element are reflected inside its document ('val' field) found by its '_id'.
+    """
+    _remote_queries = False
+
+    async def __ainit__(self, lst=list(), **kwargs):
+        if '_id' in kwargs.get('obj_ref', {}):
+            raise MongoReflectionError('"obj_ref" can\'t contain "_id" as it\'s shared by all element documents!')
+
+        # 'seq' of the leftmost element, i-th element is stored with 'seq' equal to '_head + i'
+        self._head = 0
+        self._maxlen = kwargs.get('maxlen', None)
+        self._deque_cls = MongoDequeReflection
+        await super().__ainit__(lst, **kwargs)
+
+    def _reflection_ref(self, **query):
+        ref = dict(self.obj_ref, key=self.key)
+        ref.update(query)
+        return ref
+
+    def _element_ref(self, seq):
+        return self._reflection_ref(seq=seq)
+
+    def _element_doc(self, ix, el):
+        doc = self._reflection_ref(seq=self._head + ix, val=el)
+        local_el = self[ix]
+        if isinstance(local_el, DequeReflection) or isinstance(local_el, DictReflection):
+            doc['_id'] = local_el.obj_ref['_id']
+        return doc
+
+    def _new_nested(self, ix, val):
+        """
+        Nested reflections of an element refer to its document by '_id', so they don't depend on 'seq' shifts
+        and their pending operations do nothing once the element is removed.
+        """
+        nested = super()._new_nested(ix, val)
+        nested.obj_ref = {'_id': ObjectId()}
+        nested.key = 'val'
+        nested._upsert = False
+        return nested
+
+    @classmethod
+    def _move_nested_ixs(cls, self):
+        # element refs don't depend on element positions
+        pass
+
+    def _trimmed_num(self, pushed_num):
+        if self.maxlen is None:
+            return 0
+        return max(len(self) + pushed_num - self.maxlen, 0)
+
+    def append(self, el):
+        self._head += self._trimmed_num(1)
+        super().append(el)
+
+    def appendleft(self, el):
+        self._head -= 1
+        super().appendleft(el)
+
+    def extend(self, iterable):
+        arr = list(iterable)
+        self._head += self._trimmed_num(len(arr))
+        super().extend(arr)
+
+    def extendleft(self, iterable):
+        arr = list(iterable)
+        self._head -= len(arr)
+        super().extendleft(arr)
+
+    def insert(self, ix, el):
+        if self.maxlen is not None and len(self) >= self.maxlen:
+            raise IndexError('deque already at its maximum size')
+        super().insert(ix, el)
+
+    def remove(self, el):
+        del self[self.index(el)]
+
+    async def _bulk_write(self, ops):
+        if ops:
+            return await self.col.bulk_write(ops, ordered=True)
+
+    async def _reflection_get(self):
+        await self.col.create_index([(key, ASCENDING) for key in self.obj_ref] +
+                                    [('key', ASCENDING), ('seq', ASCENDING)])
+
+        cursor = self.col.find(self._reflection_ref(), projection={'seq': 1, 'val': 1})
+        if self._maxlen:
+            docs = await cursor.sort('seq', DESCENDING).limit(self._maxlen).to_list(None)
+            docs.reverse()
+        else:
+            docs = await cursor.sort('seq', ASCENDING).to_list(None)
+
+        if not docs:
+            return []
+
+        self._head = docs[0]['seq']
+        ops = [DeleteMany(self._reflection_ref(seq={'$lt': self._head}))] if self._maxlen else []
+        # keep 'seq' numbers contiguous if they aren't for some reason
+        if docs[-1]['seq'] - self._head + 1 != len(docs):
+            ops.extend(UpdateOne({'_id': doc['_id']}, {'$set': {'seq': self._head + ix}})
+                       for ix, doc in enumerate(docs) if doc['seq'] != self._head + ix)
+        await self._bulk_write(ops)
+
+        arr = await self._proc_loaded(self, [doc['val'] for doc in docs], self._loads)
+        for el, doc in zip(arr, docs):
+            if isinstance(el, DequeReflection) or isinstance(el, DictReflection):
+                # element ref dict is shared with the whole nested subtree
+                el.obj_ref['_id'] = doc['_id']
+
+        return arr
+
+    # Methods below are called synchronously right after local deque is changed,
+    # so 'seq' numbers are taken from actual local state and only db operations are deferred.
+
+    def _reflection_append(self, arr):
+        return self._reflection_extend(arr)
+
+    def _reflection_appendleft(self, arr):
+        return self._reflection_extendleft(arr)
+
+    def _reflection_clear(self):
+        self._head = 0
+        return self._bulk_write([DeleteMany(self._reflection_ref())])
+
+    def _reflection_extend(self, arr, **kwargs):
+        first_ix = len(self) - len(arr)
+        ops = [InsertOne(self._element_doc(ix, el)) for ix, el in enumerate(arr, first_ix) if ix >= 0]
+        if self.maxlen is not None:
+            ops.append(DeleteMany(self._reflection_ref(seq={'$lt': self._head})))
+
+        return self._bulk_write(ops)
+
+    def _reflection_extendleft(self, arr):
+        ops = [InsertOne(self._element_doc(ix, el)) for ix, el in enumerate(arr) if ix < len(self)]
+        if self.maxlen is not None:
+            ops.append(DeleteMany(self._reflection_ref(seq={'$gt': self._head + len(self) - 1})))
+
+        return self._bulk_write(ops)
+
+    def _reflection_insert(self, ix, arr):
+        ix = len(self) - 1 + ix if ix < 0 else ix
+        ix = min(max(ix, 0), len(self) - 1)
+
+        return self._bulk_write([UpdateMany(self._reflection_ref(seq={'$gte': self._head + ix}), {'$inc': {'seq': 1}}),
+                                 InsertOne(self._element_doc(ix, arr[0]))])
+
+    def _reflection_pop(self):
+        return self._bulk_write([DeleteOne(self._element_ref(self._head + len(self)))])
+
+    def _reflection_popleft(self):
+        self._head += 1
+        return self._bulk_write([DeleteOne(self._element_ref(self._head - 1))])
+
+    async def _reflection_remove(self, el):  # pragma: no cover
+        # remove is reflected as __delitem__
+        raise NotImplementedError
+
+    def _reflection_reverse(self):
+        return self._bulk_write([UpdateMany(self._reflection_ref(), {'$mul': {'seq': -1}}),
+                                 UpdateMany(self._reflection_ref(),
+                                            {'$inc': {'seq': 2 * self._head + len(self) - 1}})])
+
+    def _reflection_rotate(self, num):
+        length = len(self)
+        num = num % length if length else 0
+        if not num:
+            return self._bulk_write([])
+
+        # move the smaller part of elements to the other side
+        if num <= length - num:
+            ref = self._reflection_ref(seq={'$gte': self._head + length - num})
+            inc = -length
+            self._head -= num
+        else:
+            ref = self._reflection_ref(seq={'$lt': self._head + length - num})
+            inc = length
+            self._head += length - num
+
+        return self._bulk_write([UpdateMany(ref, {'$inc': {'seq': inc}})])
+
+    def _replace_ops(self, ix, el):
+        # replaced element gets new document, so pending operations of its nested reflections do nothing
+        return [DeleteOne(self._element_ref(self._head + ix)), InsertOne(self._element_doc(ix, el))]
+
+    def _reflection_setitem(self, ix, el):
+        return self._bulk_write(self._replace_ops(ix, el[0]))
+
+    def _reflection_setslice(self, set_arr, ins_arr, position):
+        ops = []
+        if ins_arr:
+            # inserted elements are placed locally already, position past them means insertion at the end
+            position = min(position, len(self) - len(ins_arr))
+            seq = self._head + position
+            ops.append(UpdateMany(self._reflection_ref(seq={'$gte': seq}), {'$inc': {'seq': len(ins_arr)}}))
+            ops.extend(InsertOne(self._element_doc(position + ix, el)) for ix, el in enumerate(ins_arr))
+
+        # replaced indexes are given before insertion, so ones after insertion point are shifted
+        for ix, el in set_arr:
+            ops.extend(self._replace_ops(ix + len(ins_arr) if ins_arr and ix >= position else ix, el))
+
+        return self._bulk_write(ops)
+
+    def _reflection_delitem(self, ix, sentinel):
+        # documents are deleted by sequence number, sentinel isn't needed
+        ix = len(self) + 1 + ix if ix < 0 else ix
+        seq = self._head + ix
+
+        return self._bulk_write([DeleteOne(self._element_ref(seq)),
+                                 UpdateMany(self._reflection_ref(seq={'$gt': seq}), {'$inc': {'seq': -1}})])
@@ -0,0 +1,165 @@
+import weakref
+from bisect import bisect_left, insort
+
+from .base import MongoReflectionError, _SyncObjBase
+
+
+_missing = object()
+
+
+class _HashIndex:
+    """
+    Maps field value to elements having it.
+    """
+    __slots__ = ('_entries',)
+
+    def __init__(self):
+        self._entries = {}
+
+    def add(self, value, el):
+        self._entries.setdefault(value, {})[id(el)] = el
+
+    def discard(self, value, el):
+        els = self._entries.get(value)
+        if els is not None:
+            els.pop(id(el), None)
+            if not els:
+                del self._entries[value]
+                return True
+        return False
+
+    def find(self, value):
+        return list(self._entries.get(value, {}).values())
+
+    def range(self, start=None, stop=None):
+        raise MongoReflectionError('Range lookups need sorted index!')
+
+
+class _SortedIndex(_HashIndex):
+    """
+    Hash index with sorted list of its values for range lookups.
+    """
+    __slots__ = ('_values',)
+
+    def __init__(self):
+        super().__init__()
+        self._values = []
+
+    def add(self, value, el):
+        if value not in self._entries:
+            insort(self._values, value)
+        super().add(value, el)
+
+    def discard(self, value, el):
+        if super().discard(value, el):
+            del self._values[bisect_left(self._values, value)]
+            return True
+        return False
+
+    def range(self, start=None, stop=None):
+        lo = 0 if start is None else bisect_left(self._values, start)
+        hi = len(self._values) if stop is None else bisect_left(self._values, stop)
+        return [el for value in self._values[lo:hi] for el in self._entries[value].values()]
+
+
+class ReflectionIndexes:
+    """
+    Local indexes of deque reflection's dict elements by field paths. Elements added or removed are found
+    after each change of deque (with '_move_nested_ixs'), element changed (or any of its nested reflections)
+    is marked on the change and reindexed on the next lookup. Indexes keep live elements, so they
+    don't depend on elements positions.
+    """
+    _kinds = {'hash': _HashIndex, 'sorted': _SortedIndex}
+
+    __slots__ = ('fields', '_members', '_indexed', '_dirty', '__weakref__')
+
+    def __init__(self):
+        self.fields = {}
+        # id of element to element and to its indexed values
+        self._members = {}
+        self._indexed = {}
+        self._dirty = {}
+
+    @staticmethod
+    def _value(el, field):
+        for key in field.split('.'):
+            el = dict.get(el, key, _missing) if isinstance(el, dict) else _missing
+        return el
+
+    def _add(self, el, fields):
+        values = self._indexed.setdefault(id(el), {})
+        for field in fields:
+            value = self._value(el, field)
+            if value is _missing:
+                continue
+            try:
+                self.fields[field].add(value, el)
+            except TypeError:
+                # unhashable or not comparable with other values
+                continue
+            values[field] = value
+
+    def _discard(self, el):
+        for field, value in self._indexed.pop(id(el), {}).items():
+            self.fields[field].discard(value, el)
+
+    def create(self, deque_ref, field, kind):
+        if kind not in self._kinds:
+            raise MongoReflectionError(f'Unknown index kind "{kind}", use one of: {", ".join(self._kinds)}!')
+        self.fields[field] = self._kinds[kind]()
+        if not self._members:
+            self.reconcile(deque_ref)
+        else:
+            for el in self._members.values():
+                self._add(el, (field,))
+
+    def drop(self, field):
+        self.fields.pop(field)
+        for values in self._indexed.values():
+            values.pop(field, None)
+
+    def touched(self, el):
+        self._dirty[id(el)] = el
+
+    def reconcile(self, deque_ref):
+        """
+        Indexes elements added to deque and drops removed ones.
+        """
+        current = {id(el): el for el in deque_ref if isinstance(el, dict) and isinstance(el, _SyncObjBase)}
+        for el_id in self._members.keys() - current.keys():
+            self._discard(self._members.pop(el_id))
+
+        for el_id in current.keys() - self._members.keys():
+            el = self._members[el_id] = current[el_id]
+            self._watch(el)
+            self._add(el, self.fields)
+
+    def _watch(self, el):
+        # element and all its nested reflections mark element as changed
+        indexed_by = (weakref.ref(self), weakref.ref(el))
+        stack = [el]
+        while stack:
+            node = stack.pop()
+            node._indexed_by = indexed_by
+            stack.extend(val for val in (node.values() if isinstance(node, dict) else node)
+                         if isinstance(val, _SyncObjBase))
+
+    def _refresh(self):
+        dirty, self._dirty = self._dirty, {}
+        for el_id, el in dirty.items():
+            self._discard(el)
+            if el_id in self._members:
+                self._add(el, self.fields)
+
+    def _index(self, field):
+        self._refresh()
+        try:
+            return self.fields[field]
+        except KeyError:
+            raise MongoReflectionError(f'There is no index on "{field}" field!') from None
+
+    def find(self, field, value):
+        return self._index(field).find(value)
+
+    def range(self, field, start=None, stop=None):
+        return self._index(field).range(start, stop)
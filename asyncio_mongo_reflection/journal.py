@@ -0,0 +1,246 @@
+import os
+import mmap
+import struct
+import hashlib
+import logging
+import importlib
+from collections import deque
+
+from bson import BSON
+from pymongo import InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany
+from pymongo.errors import PyMongoError, ConnectionFailure
+
+
+log = logging.getLogger(__name__)
+
+
+_write_models = {model.__name__: model for model in (InsertOne, UpdateOne, UpdateMany,
+                                                     ReplaceOne, DeleteOne, DeleteMany)}
+
+
+def _file_name(col, obj_ref, key):
+    """
+    Returns local file name of reflection with given collection, 'obj_ref' and 'key'.
+    """
+    return hashlib.sha1(BSON.encode({'col': col.full_name, 'obj_ref': obj_ref, 'key': key})).hexdigest()
+
+
+def _unavailable(exc):
+    # mongo wasn't reachable, so operation is kept to be replayed
+    return isinstance(exc, ConnectionFailure) or \
+           isinstance(exc, PyMongoError) and exc.has_error_label('RetryableWriteError')
+
+
+class ReflectionJournal:
+    """
+    Append-only local journal of reflection operations which aren't acknowledged by mongo yet.
+    Operations are written to memory-mapped file when they are enqueued and marked as acknowledged in place,
+    so ones lost with the process (or failed while mongo was down) are replayed on the next creation
+    of the same reflection. File is flushed once per loop iteration and reset when nothing is pending.
+    Replay is at-least-once: operation acknowledged right before the crash could be applied again.
+    Operations failed while mongo was unavailable are kept in file when it's reset, ones rejected by mongo
+    (or failed with any other error) are moved to '.rejected' file next to journal as BSON documents.
+    """
+    # acknowledged flag and length of each record
+    _header = struct.Struct('<BI')
+
+    __slots__ = ('loop', 'path', 'rejected_path', '_fd', '_mmap', '_offset', '_pending', '_kept', '_flush_handle')
+
+    def __init__(self, path, col, obj_ref, key, loop, size=1 << 20):
+        os.makedirs(path, exist_ok=True)
+        self.loop = loop
+        name = _file_name(col, obj_ref, key)
+        self.path = os.path.join(path, f'{name}.journal')
+        self.rejected_path = os.path.join(path, f'{name}.rejected')
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._mmap = mmap.mmap(self._fd, 0)
+        self._offset = 0
+        self._pending = set()
+        # encoded records of failed operations which are rewritten to file on reset
+        self._kept = []
+        self._flush_handle = None
+
+    def _records(self):
+        """
+        Reads offsets of not acknowledged records left in file and moves write offset after the last one.
+        """
+        records = []
+        offset = 0
+
+        while offset + self._header.size <= len(self._mmap):
+            acked, length = self._header.unpack_from(self._mmap, offset)
+            if not length:
+                break
+
+            if not acked:
+                records.append(offset)
+            offset += self._header.size + length
+
+        self._offset = offset
+        return records
+
+    def _data(self, rec):
+        start = rec + self._header.size
+        return self._mmap[start:start + self._header.unpack_from(self._mmap, rec)[1]]
+
+    def _grow(self, min_size):
+        self._mmap.flush()
+        self._mmap.close()
+        os.ftruncate(self._fd, max(os.fstat(self._fd).st_size * 2, min_size))
+        self._mmap = mmap.mmap(self._fd, 0)
+
+    def _schedule_flush(self):
+        if self._flush_handle is None:
+            self._flush_handle = self.loop.call_soon(self.flush)
+
+    def flush(self):
+        self._flush_handle = None
+        self._mmap.flush()
+
+    def append(self, record):
+        rec = self._write(BSON.encode(record))
+        self._pending.add(rec)
+        self._schedule_flush()
+        return rec
+
+    def _write(self, data):
+        start = self._offset + self._header.size
+        end = start + len(data)
+        if end + self._header.size > len(self._mmap):
+            self._grow(end + self._header.size)
+
+        self._mmap[start:end] = data
+        # zero header after the record marks journal end, header of the record itself is written last
+        self._header.pack_into(self._mmap, end, 0, 0)
+        self._header.pack_into(self._mmap, self._offset, 0, len(data))
+
+        rec, self._offset = self._offset, end
+        return rec
+
+    def ack(self, rec):
+        self._mmap[rec] = 1
+        self._release(rec)
+
+    def _release(self, rec):
+        self._pending.discard(rec)
+        if not self._pending:
+            self._reset()
+        self._schedule_flush()
+
+    def _fail(self, rec, exc):
+        """
+        Keeps record of operation failed while mongo was unavailable and moves rejected one to '.rejected' file.
+        """
+        if _unavailable(exc):
+            log.warning(f'Journaled operation failed with {exc!r}, it is kept to be replayed.')
+            self._kept.append(self._data(rec))
+            self._release(rec)
+        else:
+            self._reject(self._data(rec), exc)
+            self.ack(rec)
+
+    def _reject(self, data, exc):
+        log.error(f'Journaled operation failed with {exc!r}, it is moved to "{self.rejected_path}".')
+        with open(self.rejected_path, 'ab') as f:
+            f.write(data)
+
+    def _reset(self):
+        self._header.pack_into(self._mmap, 0, 0, 0)
+        self._offset = 0
+        for data in self._kept:
+            self._write(data)
+
+    @staticmethod
+    def _encode(val):
+        if isinstance(val, tuple(_write_models.values())):
+            attrs = {slot: getattr(val, slot) for cls in type(val).__mro__ for slot in getattr(cls, '__slots__', ())}
+            return {'$model': type(val).__name__, 'attrs': attrs}
+        elif isinstance(val, (list, tuple)):
+            return [ReflectionJournal._encode(el) for el in val]
+        return val
+
+    @staticmethod
+    def _decode(val):
+        if isinstance(val, list):
+            return [ReflectionJournal._decode(el) for el in val]
+        elif isinstance(val, dict) and '$model' in val:
+            model = _write_models[val['$model']]
+            op = model.__new__(model)
+            for slot, attr in val['attrs'].items():
+                setattr(op, slot, attr)
+            return op
+        return val
+
+    @staticmethod
+    def _coro_record(coro):
+        args = dict(coro.cr_frame.f_locals)
+        node = args.pop('self')
+
+        return {'cls': f'{type(node).__module__}:{type(node).__qualname__}',
+                'method': coro.cr_code.co_name,
+                'obj_ref': node.obj_ref,
+                'key': node.key,
+                'maxlen': getattr(node, 'maxlen', None),
+                'upsert': getattr(node, '_upsert', True),
+                'args': {name: ReflectionJournal._encode(arg) for name, arg in args.items()}}
+
+    @staticmethod
+    def _record_coro(record, root):
+        """
+        Recreates reflection op coroutine from its record using 'root' reflection settings.
+        """
+        module, qualname = record['cls'].split(':')
+        cls = getattr(importlib.import_module(module), qualname)
+
+        node = cls.__cnew__(cls)
+        if isinstance(node, deque):
+            deque.__init__(node, maxlen=record['maxlen'])
+        node.__dict__.update(root.__dict__)
+        node.obj_ref = record['obj_ref']
+        node.key = record['key']
+        node._upsert = record['upsert']
+
+        return getattr(node, record['method'])(**{name: ReflectionJournal._decode(arg)
+                                                  for name, arg in record['args'].items()})
+
+    def journaled(self, enqueue_coro):
+        """
+        Wraps dispatcher's 'enqueue_coro' so each operation is journaled until mongo acknowledges it.
+        """
+        def done_cb(rec):
+            def inner(res, exc):
+                if exc is None:
+                    self.ack(rec)
+                else:
+                    self._fail(rec, exc)
+            return inner
+
+        def inner(coro, priority=1):
+            rec = self.append(self._coro_record(coro))
+            enqueue_coro(coro, priority, done_cb=done_cb(rec))
+
+        return inner
+
+    async def replay(self, root):
+        """
+        Applies journaled operations to db in order they were made using 'root' reflection settings.
+        Replay stops if mongo is unavailable, operations left are kept in journal.
+        """
+        records = self._records()
+
+        for ix, rec in enumerate(records):
+            data = self._data(rec)
+            try:
+                await self._record_coro(BSON(data).decode(), root)
+            except Exception as e:
+                if _unavailable(e):
+                    log.warning(f'Journal replay failed with {e!r}, {len(records) - ix} operations are kept.')
+                    self._kept.extend(self._data(rec) for rec in records[ix:])
+                    break
+                self._reject(data, e)
+
+        if not self._pending:
+            self._reset()
+            self.flush()
@@ -0,0 +1,116 @@
+"""
+Queries on reflected arrays and dicts run in db with aggregation pipelines, so they don't need
+reflection to be loaded. Pass 'col', 'obj_ref' and 'key' of reflected document or use 'remote_*' methods
+of reflections. Filter expressions refer to array elements as '$$el' (dict items as '$$el.k' and '$$el.v').
+"""
+from .base import _SyncObjBase
+
+
+_max_slice = 2 ** 31 - 1
+
+
+def _path_expr(key):
+    """
+    Returns aggregation expression of value at dotted 'key', numeric parts are array indexes.
+    """
+    expr = None
+    fields = []
+    for part in key.split('.'):
+        if not part.isdecimal():
+            fields.append(part)
+            continue
+
+        expr = _fields_expr(expr, fields)
+        fields = []
+        expr = {'$arrayElemAt': [expr, int(part)]}
+
+    return _fields_expr(expr, fields)
+
+
+def _fields_expr(expr, fields):
+    if not fields:
+        return expr
+    elif expr is None:
+        return '$' + '.'.join(fields)
+    return {'$let': {'vars': {'val': expr}, 'in': '$$val.' + '.'.join(fields)}}
+
+
+def _loaded(el, loads):
+    if not callable(loads):
+        return el
+    elif isinstance(el, (dict, list)):
+        for container, key in _SyncObjBase._leaves(el):
+            container[key] = loads(container[key])
+        return el
+    return loads(el)
+
+
+async def _aggregate(col, obj_ref, expr, default):
+    pipeline = [{'$match': obj_ref}, {'$limit': 1}, {'$project': {'_id': 0, 'res': expr}}]
+    docs = await col.aggregate(pipeline).to_list(1)
+    return docs[0]['res'] if docs else default
+
+
+def _filtered(key, expr, is_dict=False):
+    val = {'$ifNull': [_path_expr(key), {} if is_dict else []]}
+    if is_dict:
+        val = {'$objectToArray': val}
+    if expr is not None:
+        val = {'$filter': {'input': val, 'as': 'el', 'cond': expr}}
+    return val
+
+
+async def remote_filter(col, obj_ref, key, expr, loads=None):
+    """
+    Returns elements of array at 'key' matching 'expr'.
+    """
+    res = await _aggregate(col, obj_ref, _filtered(key, expr), [])
+    return [_loaded(el, loads) for el in res]
+
+
+async def remote_dict_filter(col, obj_ref, key, expr, loads=None):
+    """
+    Returns items of dict at 'key' matching 'expr' as dict.
+    """
+    res = await _aggregate(col, obj_ref, {'$arrayToObject': _filtered(key, expr, is_dict=True)}, {})
+    return {k: _loaded(v, loads) for k, v in res.items()}
+
+
+async def remote_count(col, obj_ref, key, expr=None, is_dict=False):
+    """
+    Returns number of elements of array (or items of dict) at 'key' matching 'expr' (all by default).
+    """
+    return await _aggregate(col, obj_ref, {'$size': _filtered(key, expr, is_dict)}, 0)
+
+
+def _ix_expr(ix, size, default):
+    if ix is None:
+        return default
+    elif ix < 0:
+        return {'$max': [{'$add': [size, ix]}, 0]}
+    return {'$min': [ix, size]}
+
+
+def _slice_expr(arr, start, stop):
+    start = start or 0
+    if stop is None and start < 0:
+        return {'$slice': [arr, start]}
+    elif stop is None or start >= 0 and stop >= 0:
+        # '$slice' needs positive number of elements
+        num = _max_slice if stop is None else stop - start
+        return {'$slice': [arr, start, num]} if num > 0 else []
+
+    # bounds depend on array size
+    size = {'$size': '$$arr'}
+    start, stop = _ix_expr(start, size, 0), _ix_expr(stop, size, size)
+    num = {'$subtract': [stop, start]}
+    return {'$let': {'vars': {'arr': arr},
+                     'in': {'$cond': [{'$gt': [num, 0]}, {'$slice': ['$$arr', start, num]}, []]}}}
+
+
+async def remote_slice(col, obj_ref, key, start=None, stop=None, loads=None):
+    """
+    Returns elements of array at 'key' like arr[start:stop] does.
+    """
+    res = await _aggregate(col, obj_ref, _slice_expr({'$ifNull': [_path_expr(key), []]}, start, stop), [])
+    return [_loaded(el, loads) for el in res]
@@ -0,0 +1,197 @@
+from abc import abstractmethod
+
+from .base import _SyncObjBase
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument, WriteConcern
+
+
+class SetReflection(set, _SyncObjBase):
+    """
+    Set reflected as array of unique elements. Added elements are reflected with '$addToSet'
+    and removed ones with '$pullAll'. Adds (or removals) made one after another before dispatcher
+    gets to them are sent with one op.
+    """
+    _mutators = frozenset(('add', 'update', 'discard', 'remove', 'pop', 'clear', 'difference_update',
+                           'intersection_update', 'symmetric_difference_update', '__ior__', '__isub__', '__iand__',
+                           '__ixor__'))
+    # op waiting in dispatcher queue and elements list it sends, new elements of the same op are added to it
+    _pending = None
+
+    @abstractmethod
+    async def _reflection_get(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _reflection_clear(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _reflection_add(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _reflection_pull(self):
+        raise NotImplementedError
+
+    @staticmethod
+    def _same_base(new_base, cached_base):
+        return set(new_base) == set(cached_base)
+
+    @staticmethod
+    async def _proc_pushed(self, arr):
+        return [self._dumps(el) for el in arr]
+
+    @classmethod
+    async def _proc_loaded(cls, parent, arr, loads):
+        return [loads(el) for el in arr]
+
+    def _reflect(self, op, els):
+        if not els:
+            return
+
+        els = [self._dumps(el) for el in els]
+        if self._pending is not None and self._pending[0] == op:
+            self._pending[1].extend(els)
+            return
+
+        coro = self._reflection_add(els) if op == 'add' else self._reflection_pull(els)
+        self._enqueue_coro(coro, self._tree_depth)
+        # journal records op arguments when it's enqueued, so they can't be changed later
+        self._pending = (op, els) if not hasattr(self, '_journal') else None
+
+    def add(self, el):
+        if el not in self:
+            self._touch()
+            super(SetReflection, self).add(el)
+            self._reflect('add', [el])
+
+    def update(self, *others):
+        self._touch()
+        added = []
+        for other in others:
+            for el in other:
+                if el not in self:
+                    super(SetReflection, self).add(el)
+                    added.append(el)
+
+        self._reflect('add', added)
+
+    def discard(self, el):
+        if el in self:
+            self._touch()
+            super(SetReflection, self).discard(el)
+            self._reflect('pull', [el])
+
+    def remove(self, el):
+        if el not in self:
+            raise KeyError(el)
+        self.discard(el)
+
+    def pop(self):
+        self._touch()
+        el = super(SetReflection, self).pop()
+        self._reflect('pull', [el])
+        return el
+
+    def clear(self):
+        self._touch()
+        super(SetReflection, self).clear()
+        self._pending = None
+        self._enqueue_coro(self._reflection_clear(), self._tree_depth)
+
+    def difference_update(self, *others):
+        self._touch()
+        removed = []
+        for other in others:
+            for el in other:
+                if el in self:
+                    super(SetReflection, self).discard(el)
+                    removed.append(el)
+
+        self._reflect('pull', removed)
+
+    def intersection_update(self, *others):
+        kept = set(self).intersection(*others)
+        self._touch()
+        removed = [el for el in self if el not in kept]
+        super(SetReflection, self).difference_update(removed)
+
+        self._reflect('pull', removed)
+
+    def symmetric_difference_update(self, other):
+        other = set(other)
+        self._touch()
+        removed = [el for el in other if el in self]
+        added = [el for el in other if el not in self]
+        super(SetReflection, self).symmetric_difference_update(other)
+
+        self._reflect('pull', removed)
+        self._reflect('add', added)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
+
+class MongoSetReflection(SetReflection):
+    # creates reflected document if it doesn't exist yet
+    _upsert = True
+    _collection_cls = AsyncIOMotorCollection
+    # '$addToSet' and '$pullAll' give the same result when applied twice
+    _idempotent_ops = frozenset(('_reflection_clear', '_reflection_extend', '_reflection_add', '_reflection_pull'))
+
+    async def __ainit__(self, s=None, *, dumps=None, loads=None, write_concern=None, **kwargs):
+        self._init_codec(dumps, loads)
+        self._init_col(kwargs, write_concern)
+
+        await super().__ainit__(list(s) if s else [], **kwargs)
+
+    async def _reflection_get(self):
+        mongo_arr = await self.col.find_one(self.obj_ref, projection={self.key: 1})
+
+        if not mongo_arr:
+            # document is created with acknowledged write even if reflection's write concern is w=0
+            col = self.col.with_options(write_concern=WriteConcern())
+            mongo_arr = await col.find_one_and_update(self.obj_ref, {'$set': {self.key: []}},
+                                                      upsert=True, projection={self.key: 1},
+                                                      return_document=ReturnDocument.AFTER)
+
+        for key in self.key.split(sep='.'):
+            mongo_arr = mongo_arr.get(key, None)
+            if not mongo_arr:
+                break
+
+        if not isinstance(mongo_arr, list) or not mongo_arr:
+            return []
+
+        return await self._proc_loaded(self, mongo_arr, self._loads)
+
+    async def _reflection_clear(self):
+        return await self.col.update_one(self.obj_ref, {'$set': {self.key: []}})
+
+    async def _reflection_extend(self, arr, maxlen=None):
+        return await self._reflection_add(arr)
+
+    async def _reflection_add(self, els):
+        # elements added after op is started are sent with the next one
+        if self._pending is not None and self._pending[1] is els:
+            self._pending = None
+        return await self.col.update_one(self.obj_ref, {'$addToSet': {self.key: {'$each': els}}},
+                                         upsert=self._upsert)
+
+    async def _reflection_pull(self, els):
+        if self._pending is not None and self._pending[1] is els:
+            self._pending = None
+        return await self.col.update_one(self.obj_ref, {'$pullAll': {self.key: els}})
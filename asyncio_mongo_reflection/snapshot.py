@@ -0,0 +1,186 @@
+import weakref
+import functools
+from collections import deque
+from collections.abc import Sequence, Mapping, Set
+
+
+class _Generation:
+    """
+    Generation of reflection tree snapshot, it's alive while any view of the snapshot is.
+    """
+    __slots__ = ('gen', '__weakref__')
+
+    def __init__(self, gen):
+        self.gen = gen
+
+
+class _CopyOnWrite:
+    """
+    Snapshots state shared by all nodes of reflection tree. Each 'snapshot()' starts new generation,
+    node changed for the first time since then keeps copy of its previous contents for alive generations.
+    Generation is started when snapshot is dropped too, so nodes drop copies on their next change.
+    """
+    __slots__ = ('gen', '_alive', '__weakref__')
+
+    def __init__(self):
+        self.gen = 0
+        self._alive = {}
+
+    def take(self):
+        self.gen += 1
+        generation = _Generation(self.gen)
+        self._alive[self.gen] = weakref.ref(generation, functools.partial(_dropped, weakref.ref(self), self.gen))
+        return generation
+
+    def freeze(self, node):
+        """
+        Called before 'node' is changed. Node contents are copied only if snapshot taken since its
+        previous change is still alive, copies no alive snapshot refers to are dropped.
+        """
+        if node._frozen_gen == self.gen:
+            return
+
+        prev, node._frozen_gen = node._frozen_gen, self.gen
+        alive = list(self._alive)
+        if not alive:
+            node._frozen = ()
+            return
+
+        frozen = [entry for entry in node._frozen if entry[0] >= min(alive)]
+        if max(alive) > prev:
+            contents = dict(node) if isinstance(node, dict) else set(node) if isinstance(node, set) else list(node)
+            frozen.append((self.gen, contents))
+        node._frozen = frozen
+
+
+def _dropped(cow_ref, gen, _):
+    cow = cow_ref()
+    if cow is not None:
+        cow._alive.pop(gen, None)
+        cow.gen += 1
+
+
+def _contents(node, gen):
+    """
+    Returns 'node' contents as they were at snapshot 'gen': its copy made on later change or node itself.
+    """
+    for frozen_gen, contents in node._frozen:
+        if frozen_gen >= gen:
+            return contents
+    return node
+
+
+def _view(el, generation):
+    if not hasattr(el, '_frozen'):
+        return el
+    elif isinstance(el, dict):
+        return DictSnapshot(el, generation)
+    elif isinstance(el, set):
+        return SetSnapshot(el, generation)
+    return DequeSnapshot(el, generation)
+
+
+class _SnapshotBase:
+    __slots__ = ('_node', '_generation')
+
+    def __init__(self, node, generation):
+        self._node = node
+        self._generation = generation
+
+    def _contents(self):
+        return _contents(self._node, self._generation.gen)
+
+    def plain(self):
+        """
+        Returns copy of snapshot made of plain lists, dicts and sets (i.e. for serialization).
+        """
+        contents = self._contents()
+        plain = _empty(contents)
+        stack = [(contents, plain)]
+        while stack:
+            contents, node = stack.pop()
+            items = contents.items() if isinstance(contents, dict) else enumerate(contents)
+
+            for key, el in items:
+                if hasattr(el, '_frozen'):
+                    el_contents = _contents(el, self._generation.gen)
+                    el = _empty(el_contents)
+                    stack.append((el_contents, el))
+
+                if isinstance(node, dict):
+                    node[key] = el
+                elif isinstance(node, set):
+                    node.add(el)
+                else:
+                    node.append(el)
+
+        return plain
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.plain()!r})'
+
+
+def _empty(contents):
+    return {} if isinstance(contents, dict) else set() if isinstance(contents, set) else []
+
+
+class DequeSnapshot(_SnapshotBase, Sequence):
+    """
+    Immutable view of deque (or list) reflection at the moment 'snapshot()' was called.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, ix):
+        contents = self._contents()
+        if isinstance(ix, slice):
+            return [_view(el, self._generation) for el in list(contents)[ix]]
+        return _view(contents[ix], self._generation)
+
+    def __len__(self):
+        return len(self._contents())
+
+    def __eq__(self, other):
+        if not isinstance(other, (Sequence, deque)) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(el == other_el for el, other_el in zip(self, other))
+
+    __hash__ = None
+
+
+class DictSnapshot(_SnapshotBase, Mapping):
+    """
+    Immutable view of dict reflection at the moment 'snapshot()' was called.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        return _view(dict.__getitem__(self._contents(), key), self._generation)
+
+    def __iter__(self):
+        return iter(list(self._contents()))
+
+    def __len__(self):
+        return len(self._contents())
+
+    def __contains__(self, key):
+        return dict.__contains__(self._contents(), key)
+
+    __hash__ = None
+
+
+class SetSnapshot(_SnapshotBase, Set):
+    """
+    Immutable view of set reflection at the moment 'snapshot()' was called.
+    """
+    __slots__ = ()
+
+    def __iter__(self):
+        return iter(list(self._contents()))
+
+    def __len__(self):
+        return len(self._contents())
+
+    def __contains__(self, el):
+        return set.__contains__(self._contents(), el)
+
+    __hash__ = None
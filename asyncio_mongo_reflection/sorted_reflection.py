@@ -0,0 +1,223 @@
+import functools
+from bisect import bisect_left, bisect_right
+
+from .base import _SyncObjBase, MongoReflectionError
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument, WriteConcern
+
+
+@functools.total_ordering
+class _Desc:
+    """
+    Sort key wrapper with reversed order.
+    """
+    __slots__ = ('val',)
+
+    def __init__(self, val):
+        self.val = val
+
+    def __lt__(self, other):
+        return other.val < self.val
+
+    def __eq__(self, other):
+        return self.val == other.val
+
+
+class MongoSortedListReflection(list, _SyncObjBase):
+    """
+    List kept sorted both locally and in db. Elements are inserted locally with bisect and reflected
+    with '$push' with '$sort' (and '$slice' if 'maxlen' is set), so server keeps the same order and size.
+    Elements are plain values or documents sorted by 'sort_by' field, 'reverse=True' sorts them descending.
+    Rank queries are O(log n) as sort keys of elements are kept in separate list.
+    Elements with equal sort keys could be ordered differently in db, so use unique sort keys if it matters.
+    """
+    # creates reflected document if it doesn't exist yet
+    _upsert = True
+    _collection_cls = AsyncIOMotorCollection
+    _idempotent_ops = frozenset(('_reflection_clear',))
+    _mutators = frozenset(('add', 'update', 'remove', 'pop', 'clear', '__delitem__'))
+    # '$push' waiting in dispatcher queue and elements list it sends, new elements are added to it
+    _pending = None
+
+    async def __ainit__(self, lst=list(), *, sort_by=None, reverse=False, maxlen=None, write_concern=None,
+                        **kwargs):
+        self._init_codec(None, None)
+        self._init_col(kwargs, write_concern)
+
+        self.sort_by = sort_by
+        self._reverse = reverse
+        self.maxlen = maxlen
+        self._keys = []
+        await super().__ainit__(list(lst), **kwargs)
+        self._resort()
+
+    def _sort_key(self, el):
+        if self.sort_by is not None:
+            for field in self.sort_by.split('.'):
+                el = el[field]
+        return _Desc(el) if self._reverse else el
+
+    def _sorted(self, arr):
+        arr = sorted(arr, key=self._sort_key)
+        return arr[:self.maxlen] if self.maxlen is not None else arr
+
+    def _same_base(self, new_base, cached_base):
+        return self._sorted(new_base) == cached_base
+
+    def _resort(self):
+        super(MongoSortedListReflection, self).__init__(self._sorted(self))
+        self._keys = [self._sort_key(el) for el in self]
+
+    @staticmethod
+    async def _proc_pushed(self, arr):
+        return self._flattern(list(arr))
+
+    @classmethod
+    async def _proc_loaded(cls, parent, arr, loads):
+        return arr
+
+    def _push_update(self, arr):
+        sort = 1 if not self._reverse else -1
+        push_val = {'$each': arr, '$sort': {self.sort_by: sort} if self.sort_by is not None else sort}
+        if self.maxlen is not None:
+            push_val['$slice'] = self.maxlen
+
+        return {'$push': {self.key: push_val}}
+
+    def rank(self, el):
+        """
+        Returns number of elements placed before 'el' (or before elements equal to it).
+        """
+        return bisect_left(self._keys, self._sort_key(el))
+
+    def __contains__(self, el):
+        key = self._sort_key(el)
+        ix = bisect_left(self._keys, key)
+        while ix < len(self) and self._keys[ix] == key:
+            if list.__getitem__(self, ix) == el:
+                return True
+            ix += 1
+        return False
+
+    def index(self, el, *args):
+        key = self._sort_key(el)
+        ix = bisect_left(self._keys, key)
+        while ix < len(self) and self._keys[ix] == key:
+            if list.__getitem__(self, ix) == el:
+                return ix
+            ix += 1
+        raise ValueError(f'{el!r} is not in list')
+
+    def add(self, el):
+        self.update([el])
+
+    def update(self, els):
+        els = self._flattern(list(els))
+        if not els:
+            return
+
+        self._touch()
+        for el in els:
+            key = self._sort_key(el)
+            ix = bisect_right(self._keys, key)
+            if self.maxlen is not None and ix >= self.maxlen:
+                continue
+            super(MongoSortedListReflection, self).insert(ix, el)
+            self._keys.insert(ix, key)
+            if self.maxlen is not None and len(self) > self.maxlen:
+                super(MongoSortedListReflection, self).pop()
+                self._keys.pop()
+
+        if self._pending is not None:
+            self._pending.extend(els)
+            return
+
+        self._enqueue_coro(self._reflection_extend(els), self._tree_depth)
+        # journal records op arguments when it's enqueued, so they can't be changed later
+        self._pending = els if not hasattr(self, '_journal') else None
+
+    def _enqueue_op(self, coro):
+        # elements added after other op must be sent after it too
+        self._pending = None
+        self._enqueue_coro(coro, self._tree_depth)
+
+    def remove(self, el):
+        ix = self.index(el)
+        self._touch()
+        super(MongoSortedListReflection, self).pop(ix)
+        self._keys.pop(ix)
+        self._enqueue_op(self._reflection_remove(el))
+
+    def pop(self, ix=-1):
+        ix = range(len(self))[ix]
+        self._touch()
+        el = super(MongoSortedListReflection, self).pop(ix)
+        self._keys.pop(ix)
+
+        if ix == len(self):
+            self._enqueue_op(self._reflection_pop())
+        elif ix == 0:
+            self._enqueue_op(self._reflection_popleft())
+        else:
+            # first equal element is removed in db, result is the same
+            self._enqueue_op(self._reflection_remove(el))
+        return el
+
+    def __delitem__(self, ix):
+        if not isinstance(ix, int):
+            raise MongoReflectionError('Only single elements can be deleted from sorted list!')
+        self.pop(ix)
+
+    def clear(self):
+        self._touch()
+        super(MongoSortedListReflection, self).clear()
+        self._keys.clear()
+        self._enqueue_op(self._reflection_clear())
+
+    def _unsorted(self, *args, **kwargs):
+        raise MongoReflectionError('Sorted list elements can only be added with "add" or "update"!')
+
+    append = extend = insert = sort = reverse = __setitem__ = __iadd__ = __imul__ = _unsorted
+
+    async def _reflection_get(self):
+        mongo_arr = await self.col.find_one(self.obj_ref, projection={self.key: 1})
+
+        if not mongo_arr:
+            # document is created with acknowledged write even if reflection's write concern is w=0
+            col = self.col.with_options(write_concern=WriteConcern())
+            mongo_arr = await col.find_one_and_update(self.obj_ref, {'$set': {self.key: []}},
+                                                      upsert=True, projection={self.key: 1},
+                                                      return_document=ReturnDocument.AFTER)
+
+        for key in self.key.split(sep='.'):
+            mongo_arr = mongo_arr.get(key, None)
+            if not mongo_arr:
+                break
+
+        if not isinstance(mongo_arr, list) or not mongo_arr:
+            return []
+
+        if self._sorted(mongo_arr) != mongo_arr:
+            # array wasn't written by sorted reflection, it's sorted in place with empty '$push'
+            await self.col.update_one(self.obj_ref, self._push_update([]))
+            mongo_arr = self._sorted(mongo_arr)
+
+        return await self._proc_loaded(self, mongo_arr, self._loads)
+
+    async def _reflection_clear(self):
+        return await self.col.update_one(self.obj_ref, {'$set': {self.key: []}})
+
+    async def _reflection_extend(self, arr, maxlen=None):
+        # elements added after op is started are sent with the next one
+        if self._pending is arr:
+            self._pending = None
+        return await self.col.update_one(self.obj_ref, self._push_update(arr), upsert=self._upsert)
+
+    async def _reflection_pop(self):
+        return await self.col.update_one(self.obj_ref, {'$pop': {self.key: 1}})
+
+    async def _reflection_popleft(self):
+        return await self.col.update_one(self.obj_ref, {'$pop': {self.key: -1}})
+
+    def _reflection_remove(self, el):
+        return self._reflection_remove_marked(el, self._sentinel())
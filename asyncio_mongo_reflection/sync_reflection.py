@@ -0,0 +1,330 @@
+import time
+import queue
+import inspect
+import logging
+import weakref
+import functools
+from itertools import repeat
+from threading import Thread, RLock, current_thread
+
+from pymongo import InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany
+from pymongo.collection import Collection
+
+from .base import AsyncCoroQueueDispatcher, MongoReflectionError, _SyncObjBase, _map_chunk, _run_sync
+from .deque_reflection import MongoDequeReflection
+from .dict_reflection import MongoDictReflection
+
+
+log = logging.getLogger(__name__)
+
+
+class _Done:
+    """
+    Awaitable of already known result.
+    """
+    __slots__ = ('res',)
+
+    def __init__(self, res):
+        self.res = res
+
+    def __await__(self):
+        return self.res
+        yield
+
+
+class _AwaitableCursor:
+    __slots__ = ('_cursor',)
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        return list(self._cursor)
+
+
+class _AwaitableCollection:
+    """
+    Wraps pymongo collection so reflection coroutines can await its calls (they never suspend).
+    Writes made in dispatcher's writer thread are collected by dispatcher as write models,
+    other calls made there send collected writes first.
+    """
+    _models = {'insert_one': InsertOne, 'update_one': UpdateOne, 'update_many': UpdateMany,
+               'replace_one': ReplaceOne, 'delete_one': DeleteOne, 'delete_many': DeleteMany}
+
+    __slots__ = ('_col', '_dispatcher')
+
+    def __init__(self, col, dispatcher):
+        self._col = col
+        self._dispatcher = dispatcher
+
+    def with_options(self, **kwargs):
+        return _AwaitableCollection(self._col.with_options(**kwargs), self._dispatcher)
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        if self._dispatcher.batching():
+            return _Done(self._dispatcher.add(*requests))
+        return _Done(self._col.bulk_write(requests, ordered=ordered, **kwargs))
+
+    def __getattr__(self, name):
+        attr = getattr(self._col, name)
+        if not inspect.ismethod(attr):
+            return attr
+
+        batching = self._dispatcher.batching()
+        if batching and name in self._models:
+            return lambda *args, **kwargs: _Done(self._dispatcher.add(self._models[name](*args, **kwargs)))
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            if batching:
+                self._dispatcher.flush()
+            res = attr(*args, **kwargs)
+            return _AwaitableCursor(res) if name in ('find', 'aggregate') else _Done(res)
+        return call
+
+
+class ThreadQueueDispatcher(AsyncCoroQueueDispatcher):
+    """
+    Dispatcher of sync reflections. Its writer thread takes all tasks waiting in queue (up to 'batch_size')
+    at once, runs them and sends writes they make with one ordered 'bulk_write' (tasks that read from db send
+    writes collected before them first). Each task is done with result of 'bulk_write' that sent its writes.
+    """
+
+    class Task(AsyncCoroQueueDispatcher.Task):
+
+        __slots__ = ('done_cb', 'record', 'op')
+
+    __slots__ = ('col', 'batch_size', '_models', '_unsent', '_running', '_running_from', '_running_exc', '_thread',
+                 '_lock')
+
+    def __init__(self, col, external_cb=None, retry_policy=None, recorder=None, batch_size=1000):
+        self.loop = None
+        self.col = col
+        self.tasks_queue = queue.PriorityQueue()
+        self.results_queue = queue.Queue(maxsize=10)
+        self._external_cb = external_cb if callable(external_cb) else None
+        self.retry_policy = retry_policy
+        self.unacknowledged = not col.write_concern.acknowledged
+        self.recorder = recorder
+        self.stats = {'backlog': 0, 'retries': 0, 'ambiguous': 0, 'failed': 0}
+        self.batch_size = batch_size
+        # write models collected in current batch and tasks that made them
+        self._models = None
+        self._unsent = []
+        # running task, index of its first model and error of its writes sent by earlier flush
+        self._running = None
+        self._running_from = 0
+        self._running_exc = None
+        self._thread = Thread(daemon=True, target=self._consume, name=f'sync reflection writer {id(self)}')
+        self._lock = RLock()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """
+        Stops writer thread after queued tasks are done.
+        """
+        self.tasks_queue.put_nowait(self.Task(None, float('inf'), None, time.perf_counter()))
+
+    def threadsafe(self, fn):
+        """
+        Sync reflections have no loop to hand calls off to, 'fn' is called in calling thread under lock,
+        so calls made with 'call_threadsafe' from several threads enqueue their tasks in order.
+        """
+        @functools.wraps(fn)
+        def inner(*args):
+            with self._lock:
+                return fn(*args)
+        return inner
+
+    def batching(self):
+        return current_thread() is self._thread and self._models is not None
+
+    def add(self, *models):
+        self._models.extend(models)
+        if not self._unsent or self._unsent[-1] is not self._running:
+            self._unsent.append(self._running)
+
+    def _bulk_write(self, models, tasks):
+        # models can be retried only if each task that made them can
+        owner, name = next((task.op for task in tasks
+                            if task.op[1] not in getattr(task.op[0], '_idempotent_ops', ())), tasks[0].op)
+        attempt = 0
+        while True:
+            try:
+                return self.col.bulk_write(models)
+            except Exception as e:
+                if not self._should_retry(e, attempt, owner, name):
+                    raise
+
+            time.sleep(self.retry_policy.delay(attempt))
+            attempt += 1
+            self.stats['retries'] += 1
+
+    def flush(self):
+        """
+        Sends collected write models and finishes tasks that made them, running task is finished when it returns.
+        """
+        models, tasks = self._models, self._unsent
+        self._models, self._unsent = [], []
+        self._running_from = 0
+        if not models:
+            return
+
+        try:
+            res = self._bulk_write(models, tasks)
+        except Exception as e:
+            res, exc = None, e
+        else:
+            exc = None
+            if self.results_queue.full():
+                self.results_queue.get_nowait()
+            self.results_queue.put_nowait(res)
+
+        if tasks[-1] is self._running:
+            self._running_exc = exc
+            tasks.pop()
+        for task in tasks:
+            self._task_done(task, res, exc)
+
+    def _consume(self):
+        while True:
+            # waits for a task, but takes it back with the rest of batch under lock
+            self.tasks_queue.put_nowait(self.tasks_queue.get())
+            self.tasks_queue.task_done()
+            tasks = []
+
+            # reflection isn't mutated while batch is taken and its tasks are run, so tasks of nested reflections
+            # see keys that match db after tasks of their parents enqueued before them
+            with self._lock:
+                while len(tasks) < self.batch_size:
+                    try:
+                        tasks.append(self.tasks_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self.stats['backlog'] = self.tasks_queue.qsize()
+                self._run_batch([task for task in tasks if task.coro is not None])
+
+            self._flush_batch()
+            for _ in tasks:
+                self.tasks_queue.task_done()
+            if any(task.coro is None for task in tasks):
+                return
+
+    def _run_batch(self, tasks):
+        self._models = []
+        for task in tasks:
+            if task.record:
+                self.recorder.started(task.record)
+            task.op = (task.coro.cr_frame.f_locals.get('self'), task.coro.cr_code.co_name)
+
+            self._running, self._running_from, self._running_exc = task, len(self._models), None
+            try:
+                _run_sync(task.coro)
+            except Exception as e:
+                # writes of failed task aren't sent
+                del self._models[self._running_from:]
+                if self._unsent and self._unsent[-1] is task:
+                    self._unsent.pop()
+                self._task_done(task, None, e)
+                continue
+            finally:
+                self._running = None
+
+            if not self._unsent or self._unsent[-1] is not task:
+                # task has no writes left to send
+                self._task_done(task, None, self._running_exc)
+
+    def _flush_batch(self):
+        try:
+            self.flush()
+        finally:
+            self._models = None
+
+    def _task_done(self, task, res, exc):
+        if exc:
+            self.stats['failed'] += 1
+        if task.record:
+            self.recorder.done(task.record, exc)
+
+        if isinstance(self._external_cb, weakref.ReferenceType):
+            external_cb = self._external_cb()
+        else:
+            external_cb = self._external_cb
+
+        # writer thread keeps running if callbacks fail
+        try:
+            if task.done_cb:
+                task.done_cb(res, exc)
+            if external_cb:
+                external_cb(res, exc)
+            elif exc:
+                raise exc
+        except Exception:
+            log.exception(f'Sync reflection task {task!r} failed')
+
+    def enqueue_coro(self, coro, priority=1, done_cb=None):
+        # 'done_cb' takes the same arguments as external cb and is called for this task only
+        coro_locals = {key: repr(val) for key, val in coro.cr_frame.f_locals.items()}
+        task = self.Task(coro, priority, coro_locals, time.perf_counter())
+        task.done_cb = done_cb
+        task.record = self.recorder.enqueued(coro, priority) if self.recorder else None
+
+        self.tasks_queue.put_nowait(task)
+        self.stats['backlog'] = self.tasks_queue.qsize()
+
+
+class _SyncReflection(_SyncObjBase):
+    """
+    Base of reflections backed by blocking pymongo collection. They are created and mutated without
+    event loop, their ops are sent by dispatcher's writer thread in batches of up to 'batch_size' ops.
+    """
+    _sync_init = True
+    batch_size = 1000
+
+    def _new_dispatcher(self):
+        if getattr(self, 'journal', None):
+            raise MongoReflectionError('Journal is not supported by sync reflections!')
+
+        dispatcher = ThreadQueueDispatcher(self.col, weakref.ref(self._dispatcher_cb), self.retry_policy,
+                                           getattr(self, 'recorder', None), self.batch_size)
+        # nested reflections get wrapped collection and mutation lock with the rest of root's attributes
+        self.col = _AwaitableCollection(self.col, dispatcher)
+        self._mutation_lock = dispatcher._lock
+        return dispatcher
+
+    def _run_now(self, coro):
+        return _run_sync(coro)
+
+    async def _map_codec(self, fn, chunks):
+        # chunks are waited for in calling thread
+        return list(self.codec_executor.map(_map_chunk, repeat(fn), chunks))
+
+
+class SyncMongoDequeReflection(MongoDequeReflection, _SyncReflection):
+    """
+    MongoDequeReflection backed by pymongo collection, created without await: SyncMongoDequeReflection(col=...).
+    """
+    _collection_cls = Collection
+
+
+class SyncMongoDictReflection(MongoDictReflection, _SyncReflection):
+    """
+    MongoDictReflection backed by pymongo collection, created without await: SyncMongoDictReflection(col=...).
+    """
+    _collection_cls = Collection
+
+
+SyncMongoDequeReflection._dict_cls = SyncMongoDictReflection
+SyncMongoDictReflection._deque_cls = SyncMongoDequeReflection
@@ -0,0 +1,121 @@
+import gc
+import os
+import mmap
+from contextlib import contextmanager
+
+from bson import BSON
+from pymongo import ReturnDocument, WriteConcern
+
+from .journal import _file_name
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Pauses cyclic gc, so it doesn't walk the whole heap again and again while large tree is built.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class ReflectionWarmStart:
+    """
+    Local snapshot of reflection tree (as it's stored in db) with marker of db document state.
+    Snapshot is saved with '$currentDate' timestamp set to '_warm_start.<key>' field of reflected document
+    once all pending ops are done. Next creation of the same reflection reads snapshot from memory-mapped file
+    and skips db fetch if marker is still there. Marker is removed from db by the first op made after saving
+    and when reflection is created, so snapshot isn't used after document was changed by reflection
+    or if process stopped without saving it. Writers that don't use warm start must remove marker too.
+    """
+    _idempotent_ops = frozenset(('_reflection_mark', '_reflection_unmark'))
+
+    __slots__ = ('path', 'col', 'obj_ref', 'field', '_enqueue', '_marked', '_marker')
+
+    def __init__(self, path, col, obj_ref, key):
+        os.makedirs(path, exist_ok=True)
+        self.col = col
+        self.obj_ref = obj_ref
+        self.path = os.path.join(path, f'{_file_name(col, obj_ref, key)}.snapshot')
+        self.field = f'_warm_start.{key.replace(".", "_")}'
+        self._enqueue = None
+        self._marked = False
+        self._marker = None
+
+    def _get_marker(self, doc):
+        for key in self.field.split('.'):
+            doc = doc.get(key) if isinstance(doc, dict) else None
+        return doc
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return BSON(mm).decode()
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, snapshot):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(BSON.encode(snapshot))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def invalidating(self, enqueue_coro):
+        """
+        Wraps dispatcher's 'enqueue_coro' so marker of saved snapshot is removed before the next op.
+        """
+        self._enqueue = enqueue_coro
+
+        def inner(coro, priority=1, **kwargs):
+            if self._marked:
+                self._marked = False
+                enqueue_coro(self._reflection_unmark())
+            enqueue_coro(coro, priority, **kwargs)
+
+        return inner
+
+    async def load(self, root):
+        """
+        Returns 'root' reflection base from snapshot if db document has the same marker, None otherwise.
+        """
+        doc = await self.col.find_one(self.obj_ref, projection={self.field: 1})
+        marker = self._get_marker(doc)
+        if marker is None:
+            return None
+
+        # reflection changes document from now on, marker is removed with acknowledged write even if w=0 is used
+        col = self.col.with_options(write_concern=WriteConcern())
+        await col.update_one(self.obj_ref, {'$unset': {self.field: ''}})
+
+        with _gc_paused():
+            snapshot = self._read()
+            if snapshot is None or snapshot['marker'] != marker:
+                return None
+            return await root._proc_loaded(root, snapshot['data'], root._loads)
+
+    async def save(self, root):
+        await root.mongo_pending.join()
+
+        data = root._flattern(dict(root) if isinstance(root, dict) else list(root), root._dumps)
+        self._marker = None
+        self._enqueue(self._reflection_mark())
+        self._marked = True
+        await root.mongo_pending.join()
+
+        # marker isn't set if op failed
+        if self._marker is not None:
+            self._write({'marker': self._marker, 'data': data})
+
+    async def _reflection_mark(self):
+        doc = await self.col.find_one_and_update(self.obj_ref, {'$currentDate': {self.field: {'$type': 'timestamp'}}},
+                                                 projection={self.field: 1}, return_document=ReturnDocument.AFTER)
+        self._marker = self._get_marker(doc)
+
+    async def _reflection_unmark(self):
+        return await self.col.update_one(self.obj_ref, {'$unset': {self.field: ''}})
@@ -0,0 +1,142 @@
+import asyncio
+import struct
+from time import perf_counter
+
+from bson import BSON, Binary
+from bson.errors import InvalidDocument
+
+from .journal import ReflectionJournal
+
+
+class WorkloadRecorder:
+    """
+    Opt-in recorder of ops done by reflection dispatchers. Each op is written to a binary file
+    as length prefixed BSON record with reflection key, op name, priority, BSON size of op arguments
+    and times (since recorder creation) when op was enqueued, started and done.
+    With 'capture_args=True' op arguments are recorded too, so ops can be replayed exactly.
+    One recorder can be shared by several reflections with 'recorder' argument.
+    """
+    _length = struct.Struct('<I')
+
+    __slots__ = ('path', 'capture_args', '_file', '_start')
+
+    def __init__(self, path, capture_args=False):
+        self.path = path
+        self.capture_args = capture_args
+        self._file = open(path, 'ab')
+        self._start = perf_counter()
+
+    def now(self):
+        return perf_counter() - self._start
+
+    def enqueued(self, coro, priority):
+        """
+        Creates record of enqueued op coroutine, it's written when op is done.
+        """
+        args = {name: ReflectionJournal._encode(arg) for name, arg in coro.cr_frame.f_locals.items()
+                if name != 'self'}
+        try:
+            size = len(BSON.encode(args))
+        except InvalidDocument:
+            size = None
+
+        record = {'key': None, 'op': coro.cr_code.co_name, 'priority': priority, 'size': size,
+                  'enqueued': self.now(), 'node': coro.cr_frame.f_locals.get('self')}
+        if self.capture_args and size is not None:
+            record['coro'] = ReflectionJournal._coro_record(coro)
+        return record
+
+    def started(self, record):
+        record['started'] = self.now()
+        # nested reflection key could be moved while op was in queue, op uses the one it has when it's started
+        node = record.pop('node')
+        record['key'] = getattr(node, 'key', None)
+        if 'coro' in record:
+            record['coro'].update(obj_ref=node.obj_ref, key=node.key)
+
+    def done(self, record, exc=None):
+        record['done'] = self.now()
+        record['ok'] = exc is None
+
+        data = BSON.encode(record)
+        self._file.write(self._length.pack(len(data)))
+        self._file.write(data)
+
+    def close(self):
+        self._file.close()
+
+    @classmethod
+    def records(cls, path):
+        """
+        Reads records from file in order ops were started.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        records = []
+        offset = 0
+        while offset + cls._length.size <= len(data):
+            length, = cls._length.unpack_from(data, offset)
+            offset += cls._length.size
+            records.append(BSON(data[offset:offset + length]).decode())
+            offset += length
+
+        return sorted(records, key=lambda record: record['started'])
+
+    @classmethod
+    def summary(cls, path):
+        """
+        Returns per op count, total arguments size, mean time spent in queue and mean execution time.
+        """
+        summary = {}
+        for record in cls.records(path):
+            op = summary.setdefault(record['op'], {'count': 0, 'failed': 0, 'size': 0, 'wait': 0., 'run': 0.})
+            op['count'] += 1
+            op['failed'] += not record['ok']
+            op['size'] += record['size'] or 0
+            op['wait'] += record['started'] - record['enqueued']
+            op['run'] += record['done'] - record['started']
+
+        for op in summary.values():
+            op['wait'] /= op['count']
+            op['run'] /= op['count']
+        return summary
+
+
+class WorkloadReplayer:
+    """
+    Replays recorded workload through 'root' reflection's dispatcher (so its collection, write concern,
+    retry policy, etc. are used) at original speed multiplied by 'speed' or as fast as possible if it's None.
+    Ops are enqueued at their original enqueue times but in order they were started,
+    as keys of nested reflections recorded with them depend on it.
+    Ops recorded with arguments are recreated exactly (they are applied to the same 'obj_ref'
+    in root's collection), others are replaced with '$set' of binary value of recorded size to root's document
+    field named after recorded 'key' (with dots replaced by underscores, so fields don't overlap).
+    Record replayed workload with another recorder to compare dispatcher configurations.
+    """
+    __slots__ = ('records',)
+
+    def __init__(self, path):
+        self.records = WorkloadRecorder.records(path)
+
+    @staticmethod
+    async def _reflection_synthetic(col, obj_ref, key, size):
+        return await col.update_one(obj_ref, {'$set': {key: Binary(bytes(size))}}, upsert=True)
+
+    async def replay(self, root, speed=1.0):
+        start = perf_counter()
+
+        for record in self.records:
+            if speed:
+                delay = record['enqueued'] / speed - (perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            if 'coro' in record:
+                coro = ReflectionJournal._record_coro(record['coro'], root)
+            else:
+                coro = self._reflection_synthetic(root.col, root.obj_ref, (record['key'] or root.key).replace('.', '_'),
+                                                  record['size'] or 0)
+            root._enqueue_coro(coro)
+
+        await root.mongo_pending.join()
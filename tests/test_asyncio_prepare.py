@@ -104,3 +104,9 @@ async def mongo_compare(ex, m):
         obj = obj[k]
 
     assert obj == ex
+
+
+async def mongo_field(m, key, obj_ref=None):
+    # field of document reflected by 'm' (or of 'obj_ref' document in m's collection)
+    obj = await db[m.col.name].find_one(obj_ref or m.obj_ref)
+    return obj[key]
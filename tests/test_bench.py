@@ -0,0 +1,41 @@
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection import bench
+
+counter = bench._CommandCounter()
+# commands are counted by listener of client the scenarios run with
+bench_db = motor.motor_asyncio.AsyncIOMotorClient(event_listeners=[counter]).test_db
+
+
+@async_test
+async def test_bench_scenarios():
+    args = bench.parse_args(['--ops', '50', '--scenarios', 'deque_mixed,sync_deque_mixed,maxlen_trim'])
+    assert args.scenarios == ['deque_mixed', 'sync_deque_mixed', 'maxlen_trim']
+
+    for name in args.scenarios:
+        res = await bench.run_scenario(bench_db, name, args.ops, counter)
+
+        assert res['dispatched'] == 50 and res['failed'] == 0
+        assert res['latency']['p50'] <= res['latency']['p99'] <= res['latency']['p100']
+        assert res['ops_per_second'] > 0
+        assert res['round_trips'] > 0
+
+
+def test_bench_unknown_scenario():
+    with pytest.raises(SystemExit):
+        bench.parse_args(['--scenarios', 'unknown'])
+
+
+def fake_client(url, event_listeners):
+    return motor.motor_asyncio.AsyncIOMotorClient(url, event_listeners=event_listeners)
+
+
+@async_test
+async def test_bench_client():
+    args = bench.parse_args(['--client', 'tests.test_bench:fake_client', '--ops', '20', '--scenarios', 'dict_churn'])
+    res = await bench.main(args)
+
+    assert res['client'] == 'tests.test_bench:fake_client'
+    assert res['scenarios']['dict_churn']['ops'] == 20 and res['scenarios']['dict_churn']['failed'] == 0
+
+    with pytest.raises(SystemExit):
+        bench.parse_args(['--client', 'tests.test_bench:unknown'])
@@ -0,0 +1,182 @@
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection.bucket_reflection import MongoBucketDequeReflection, MongoBucketDictReflection
+
+lrun_uc(db['test_bucket'].remove())
+
+BUCKET_SIZE = 3
+
+mongo_bucket_deque = lrun_uc(MongoBucketDequeReflection([0, 4, 3, 33, 5, [1, 2, 3], {'a': 1}, 53],
+                                                        col=db['test_bucket'],
+                                                        obj_ref={'array_id': 'test_bucket'},
+                                                        key='arr', bucket_size=BUCKET_SIZE))
+
+mongo_bucket_dict = lrun_uc(MongoBucketDictReflection({'a': 1, 'b': [1, 2], 'c': {'d': 2}},
+                                                      col=db['test_bucket'],
+                                                      obj_ref={'dict_id': 'test_bucket'},
+                                                      key='dct', shards=4))
+
+
+async def deque_compare(m, o):
+    docs = await db[m.col.name].find(dict(m.obj_ref, key=m.key)).sort('bucket', 1).to_list(None)
+
+    assert all(0 < len(doc['arr']) <= m._bucket_size for doc in docs)
+    assert [el for doc in docs for el in doc['arr']] == flattern_list_nested(list(o), lists_to_deque=False)
+
+
+async def dict_compare(m, o):
+    docs = await db[m.col.name].find(dict(m.obj_ref, key=m.key)).to_list(None)
+
+    dct = {}
+    for doc in docs:
+        assert all(m._shard(key) == doc['shard'] for key in doc['dict'])
+        dct.update(doc['dict'])
+
+    assert dct == flattern_dict_nested(dict(o))
+
+
+@pytest.fixture(scope="function",
+                params=[mongo_bucket_deque],
+                ids=['bucket_deque'])
+def _l(request):
+    return request.param, flattern_list_nested(deque(list(request.param)))
+
+
+@pytest.fixture(scope="function",
+                params=[mongo_bucket_dict],
+                ids=['bucket_dict'])
+def _d(request):
+    return request.param, flattern_dict_nested(dict(request.param), lists_to_deque=True)
+
+
+@async_test
+async def test_deque_push_pop(_l):
+    m, o = _l[0], _l[1]
+
+    m.append(1)
+    m.appendleft(2)
+    m.extend([3, [4], 5, 6])
+    m.extendleft([7, {'b': 8}])
+    m.pop()
+    m.popleft()
+
+    o.append(1)
+    o.appendleft(2)
+    o.extend([3, deque([4]), 5, 6])
+    o.extendleft([7, {'b': 8}])
+    o.pop()
+    o.popleft()
+
+    await m.mongo_pending.join()
+    assert m == o
+    await deque_compare(m, o)
+
+
+@async_test
+async def test_deque_middle(_l):
+    m, o = _l[0], _l[1]
+
+    m.insert(4, 9)
+    m.insert(4, [10])
+    del m[2]
+    m.remove(33)
+    m[1] = 11
+
+    o.insert(4, 9)
+    o.insert(4, deque([10]))
+    del o[2]
+    o.remove(33)
+    o[1] = 11
+
+    await m.mongo_pending.join()
+    assert m == o
+    await deque_compare(m, o)
+
+
+@async_test
+async def test_deque_nested(_l):
+    m, o = _l[0], _l[1]
+
+    ix = [i for i, el in enumerate(o) if isinstance(el, deque)][0]
+    m[ix].append(12)
+    await m.mongo_pending.join()
+    m.appendleft(13)
+    m.insert(1, 14)
+    m.rotate(2)
+    m[ix + 4].appendleft(15)
+    await m.mongo_pending.join()
+    m.reverse()
+
+    o[ix].append(12)
+    o.appendleft(13)
+    o.insert(1, 14)
+    o.rotate(2)
+    o[ix + 4].appendleft(15)
+    o.reverse()
+
+    await m.mongo_pending.join()
+    assert m == o
+    await deque_compare(m, o)
+
+
+@async_test
+async def test_deque_loaded(_l):
+    m, o = _l[0], _l[1]
+
+    m_loaded = await MongoBucketDequeReflection(col=m.col, obj_ref=m.obj_ref, key=m.key,
+                                                bucket_size=BUCKET_SIZE)
+
+    compare_nested_list(m, m_loaded)
+
+    assert m_loaded == o
+    assert m_loaded._buckets == m._buckets
+
+
+@async_test
+async def test_dict_set_pop(_d):
+    m, o = _d[0], _d[1]
+
+    m['e'] = 3
+    m['f'] = {'g': [4]}
+    m.update({'h': 5, 'i': [6]})
+    m.pop('a')
+    del m['e']
+
+    o['e'] = 3
+    o['f'] = {'g': deque([4])}
+    o.update({'h': 5, 'i': deque([6])})
+    o.pop('a')
+    del o['e']
+
+    await m.mongo_pending.join()
+    assert m == o
+    await dict_compare(m, o)
+
+
+@async_test
+async def test_dict_nested(_d):
+    m, o = _d[0], _d[1]
+
+    m['b'].append(3)
+    m['c']['j'] = [7]
+    m['f']['g'].appendleft(8)
+
+    o['b'].append(3)
+    o['c']['j'] = deque([7])
+    o['f']['g'].appendleft(8)
+
+    await m.mongo_pending.join()
+    assert m == o
+    await dict_compare(m, o)
+
+
+@async_test
+async def test_dict_loaded(_d):
+    m, o = _d[0], _d[1]
+
+    # keys are moved between shards when shards number is changed
+    m_loaded = await MongoBucketDictReflection(col=m.col, obj_ref=m.obj_ref, key=m.key, shards=7)
+
+    compare_nested_dict(m, m_loaded)
+
+    assert m_loaded == o
+    await dict_compare(m_loaded, o)
@@ -0,0 +1,88 @@
+import gc
+import weakref
+
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection import ReflectionCache
+
+lrun_uc(db['test_cache'].remove())
+
+col = db['test_cache']
+
+
+@async_test
+async def test_cache_lru():
+    cache = ReflectionCache(MongoDictReflection, col, 'dct', maxsize=2)
+
+    # concurrent requests of the same obj_ref share one reflection
+    m1, m1_same = await asyncio.gather(cache.get({'id': 1}), cache.get({'id': 1}))
+    assert m1 is m1_same
+    m1['a'] = 1
+
+    m2 = await cache.get({'id': 2})
+    m2['b'] = 2
+    assert await cache.get({'id': 1}) is m1
+
+    # {'id': 2} is least recently used one
+    m3 = await cache.get({'id': 3})
+    m3['c'] = {'d': 3}
+    assert len(cache) == 2
+    assert {'id': 2} not in cache and {'id': 1} in cache and {'id': 3} in cache
+
+    # evicted reflection still held by caller is returned back
+    assert await cache.get({'id': 2}) is m2
+    assert m2 == {'b': 2}
+    assert {'id': 1} not in cache
+
+    m1_ref = weakref.ref(m1)
+    del m1, m1_same
+    await cache.flush()
+    gc.collect()
+
+    # evicted reflection isn't kept alive by cache or its dispatcher
+    assert m1_ref() is None
+    assert await mongo_field(cache, 'dct', {'id': 1}) == {'a': 1}
+
+    # evicted and released reflection is loaded from db again
+    m1 = await cache.get({'id': 1})
+    assert m1 == {'a': 1}
+
+    # evicted reflection requested again before it's flushed is returned back and kept running
+    m2['b'] = 3
+    _, m2_same = await asyncio.gather(cache.evict({'id': 2}), cache.get({'id': 2}))
+    assert m2_same is m2
+    m2['b'] = 4
+    await cache.flush()
+    assert await mongo_field(cache, 'dct', {'id': 2}) == {'b': 4}
+
+    await cache.clear()
+    assert len(cache) == 0
+    assert await mongo_field(cache, 'dct', {'id': 2}) == {'b': 4}
+    assert await mongo_field(cache, 'dct', {'id': 3}) == {'c': {'d': 3}}
+
+
+@async_test
+async def test_cache_evict():
+    cache = ReflectionCache(MongoDequeReflection, col, 'arr', maxlen=3)
+
+    m = await cache.get({'id': 'deque'})
+    m.extend([1, 2, 3, 4])
+    assert m.maxlen == 3
+
+    await cache.evict({'id': 'deque'})
+    assert len(cache) == 0
+    assert await mongo_field(cache, 'arr', {'id': 'deque'}) == [2, 3, 4]
+
+
+@async_test
+async def test_cache_stale_handle():
+    cache = ReflectionCache(MongoDictReflection, col, 'dct', maxsize=1)
+
+    m = await cache.get({'id': 'stale'})
+    m['a'] = 1
+    await cache.get({'id': 'other'})
+    await cache.flush()
+
+    # evicted reflection held by caller keeps reflecting its changes
+    m['a'] = 2
+    await asyncio.wait_for(m.mongo_pending.join(), 1)
+    assert await mongo_field(cache, 'dct', {'id': 'stale'}) == {'a': 2}
@@ -0,0 +1,71 @@
+import pickle
+from threading import current_thread
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.test_asyncio_prepare import *
+
+lrun_uc(db['test_codec_executor'].remove())
+
+col = db['test_codec_executor']
+executor = ThreadPoolExecutor(4, thread_name_prefix='codec')
+threads = set()
+
+
+def dumps(el):
+    threads.add(current_thread().name)
+    return pickle.dumps(el)
+
+
+def loads(el):
+    threads.add(current_thread().name)
+    return pickle.loads(el)
+
+
+def codec_threads():
+    return {name for name in threads if name.startswith('codec')}
+
+
+@async_test
+async def test_codec_executor_deque():
+    lst = [i if i % 3 else {'i': i, 'arr': [i, str(i)]} for i in range(100)]
+    m = await MongoDequeReflection(lst, col=col, obj_ref={'array_id': 'codec'}, key='arr', dumps=dumps, loads=loads,
+                                   codec_executor=executor, codec_threshold=10)
+    assert codec_threads()
+
+    # pushes of sync methods are dumped inline, loop's thread waits for them anyway
+    threads.clear()
+    m.append(100)
+    m.extendleft([-1, [-2]])
+    m.extend(range(101, 150))
+    m.extendleft([[i] for i in range(20)])
+    assert not codec_threads()
+    await m.mongo_pending.join()
+
+    threads.clear()
+    loaded = await MongoDequeReflection(col=col, obj_ref={'array_id': 'codec'}, key='arr', loads=loads,
+                                        codec_executor=executor, codec_threshold=10)
+    assert codec_threads()
+    assert flattern_list_nested(list(loaded)) == flattern_list_nested(list(m))
+
+    obj = await col.find_one(m.obj_ref)
+    assert obj['arr'] == flattern_list_nested(list(m), dumps=pickle.dumps, lists_to_deque=False)
+
+
+@async_test
+async def test_codec_executor_dict():
+    threads.clear()
+    m = await MongoDictReflection({str(i): {'i': i, 'arr': [i]} for i in range(20)}, col=col,
+                                  obj_ref={'dict_id': 'codec'}, key='dct', dumps=dumps, loads=loads,
+                                  codec_executor=executor, codec_threshold=10)
+    assert codec_threads()
+
+    threads.clear()
+    m.update({str(i): {'i': i, 'arr': [i]} for i in range(20, 40)})
+    assert not codec_threads()
+    await m.mongo_pending.join()
+
+    threads.clear()
+    loaded = await MongoDictReflection(col=col, obj_ref={'dict_id': 'codec'}, key='dct', loads=loads,
+                                       codec_executor=executor, codec_threshold=10)
+    assert codec_threads()
+    assert flattern_dict_nested(dict(loaded)) == flattern_dict_nested(dict(m))
@@ -0,0 +1,60 @@
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection import MongoCollectionReflection
+
+lrun_uc(db['test_collection_reflection'].remove())
+
+col = db['test_collection_reflection']
+
+
+async def mongo_docs(query=None):
+    return {doc.pop('_id'): doc async for doc in col.find(query or {})}
+
+
+@async_test
+async def test_collection_ops():
+    await col.insert_many([{'_id': 'flag_a', 'group': 'flags', 'on': True},
+                           {'_id': 'flag_b', 'group': 'flags', 'on': False, 'users': [1, 2]},
+                           {'_id': 'other', 'group': 'other'}])
+
+    m = await MongoCollectionReflection(col=col, query={'group': 'flags'})
+    assert set(m) == {'flag_a', 'flag_b'}
+    assert flattern_dict_nested(dict(m['flag_b'])) == {'group': 'flags', 'on': False, 'users': [1, 2]}
+
+    m['flag_a']['on'] = False
+    m['flag_b'].update(on=True, limits={'rps': 10})
+    _id = m.insert({'group': 'flags', 'on': True})
+    m['flag_c'] = {'group': 'flags', 'on': False}
+    del m['flag_a']
+    m['flag_c'].pop('on')
+
+    # all ops above are sent with one 'bulk_write'
+    assert m.mongo_pending.qsize() == 1
+
+    m['flag_b']['users'].append(3)
+    m['flag_b']['limits']['rps'] = 20
+    await m.mongo_pending.join()
+
+    assert await mongo_docs({'group': 'flags'}) == flattern_dict_nested(dict(m))
+
+    with pytest.raises(MongoReflectionError):
+        m.insert({'_id': _id})
+
+    loaded = await MongoCollectionReflection(col=col, query={'group': 'flags'})
+    assert flattern_dict_nested(dict(loaded)) == flattern_dict_nested(dict(m))
+
+    m.pop('flag_b')
+    m.clear()
+    await m.mongo_pending.join()
+    assert await mongo_docs() == {'other': {'group': 'other'}}
+
+
+@async_test
+async def test_collection_args():
+    with pytest.raises(MongoReflectionError):
+        await MongoCollectionReflection(query={'group': 'flags'})
+
+    with pytest.raises(TypeError):
+        await MongoCollectionReflection(col=col.delegate, query={'group': 'flags'})
+
+    m = await MongoCollectionReflection(col=col, query={'group': 'flags'}, write_concern={'w': 0})
+    assert m.col.write_concern.document == {'w': 0}
@@ -0,0 +1,57 @@
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection import MongoCounterReflection
+
+lrun_uc(db['test_counter_reflection'].remove())
+
+col = db['test_counter_reflection']
+
+
+@async_test
+async def test_counter_accumulation():
+    m = await MongoCounterReflection({'hits': 1}, col=col, obj_ref={'counter_id': 'acc'}, key='cnt')
+
+    for i in range(1000):
+        m['hits'] += 1
+        m.inc('misses', 2)
+
+    # all increments are summed up into one '$inc'
+    assert m.mongo_pending.qsize() == 1
+    await m.mongo_pending.join()
+    assert await mongo_field(m, 'cnt') == {'hits': 1001, 'misses': 2000}
+
+    m.update(hits=5, other=1)
+    m.subtract({'misses': 1000})
+    m.pop('other')
+    m['hits'] -= 6
+    assert m.mongo_pending.qsize() == 3
+    await m.mongo_pending.join()
+
+    assert dict(m) == {'hits': 1000, 'misses': 1000}
+    assert await mongo_field(m, 'cnt') == dict(m)
+
+    with pytest.raises(TypeError):
+        m['hits'] = 'a lot'
+
+    # invalid delta fails whole update before any count is changed
+    with pytest.raises(TypeError):
+        m.update({'hits': 1, 'misses': 'a lot'})
+    with pytest.raises(TypeError):
+        m.subtract(hits=1, misses=None)
+    assert dict(m) == {'hits': 1000, 'misses': 1000}
+    assert m.mongo_pending.qsize() == 0
+
+
+@async_test
+async def test_counter_concurrent():
+    m1 = await MongoCounterReflection(col=col, obj_ref={'counter_id': 'concurrent'}, key='cnt')
+    m2 = await MongoCounterReflection(col=col, obj_ref={'counter_id': 'concurrent'}, key='cnt')
+
+    # increments from both reflections are kept
+    m1['hits'] += 3
+    m2['hits'] += 4
+    await m1.mongo_pending.join()
+    await m2.mongo_pending.join()
+
+    assert await mongo_field(m1, 'cnt') == {'hits': 7}
+    m3 = await MongoCounterReflection(col=col, obj_ref={'counter_id': 'concurrent'}, key='cnt')
+    assert m3 == {'hits': 7}
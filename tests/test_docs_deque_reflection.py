@@ -0,0 +1,207 @@
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection.docs_deque_reflection import MongoDocsDequeReflection
+
+lrun_uc(db['test_docs_deque'].remove())
+
+MAX_LEN = 9
+
+mongo_docs = lrun_uc(MongoDocsDequeReflection([0, 4, 3, 33, 5, [1, 2, 3], {'a': 1}, 53],
+                                              col=db['test_docs_deque'],
+                                              obj_ref={'array_id': 'test_docs_deque'},
+                                              key='arr', maxlen=MAX_LEN))
+
+
+async def db_compare(m, o):
+    docs = await db[m.col.name].find(dict(m.obj_ref, key=m.key)).sort('seq', 1).to_list(None)
+
+    assert [doc['seq'] for doc in docs] == list(range(m._head, m._head + len(docs)))
+    assert [doc['val'] for doc in docs] == flattern_list_nested(list(o), lists_to_deque=False)
+
+
+@pytest.fixture(scope="function",
+                params=[mongo_docs],
+                ids=['docs'])
+def _(request):
+    return request.param, flattern_list_nested(deque(list(request.param), maxlen=request.param.maxlen))
+
+
+@async_test
+async def test_default_loaded(_):
+    m, o = _[0], _[1]
+
+    m_loaded = await MongoDocsDequeReflection(col=m.col, obj_ref=m.obj_ref, key=m.key, maxlen=m.maxlen)
+
+    compare_nested_list(m, m_loaded)
+
+    assert m_loaded == o
+    await db_compare(m, o)
+
+
+@async_test
+async def test_push(_):
+    m, o = _[0], _[1]
+
+    m.insert(3, 55)
+    m.append(m[-1])
+    m.appendleft(8)
+    m.extend([{'b': 2}, 7])
+    m.extendleft([[5, 6], 9])
+
+    o.insert(3, 55)
+    o.append(o[-1])
+    o.appendleft(8)
+    o.extend([{'b': 2}, 7])
+    o.extendleft([deque([5, 6]), 9])
+
+    await m.mongo_pending.join()
+    assert m == o
+    await db_compare(m, o)
+
+
+@async_test
+async def test_pop(_):
+    m, o = _[0], _[1]
+
+    m.pop()
+    m.popleft()
+    o.pop()
+    o.popleft()
+
+    await m.mongo_pending.join()
+    assert m == o
+    await db_compare(m, o)
+
+
+@async_test
+async def test_remove(_):
+    m, o = _[0], _[1]
+
+    m.remove(m[2])
+    o.remove(o[2])
+    del m[-2]
+    del o[-2]
+
+    await m.mongo_pending.join()
+    assert m == o
+    await db_compare(m, o)
+
+
+@async_test
+async def test_reverse_rotate(_):
+    m, o = _[0], _[1]
+
+    m.reverse()
+    m.rotate(2)
+    m.rotate(-3)
+    o.reverse()
+    o.rotate(2)
+    o.rotate(-3)
+
+    await m.mongo_pending.join()
+    assert m == o
+    await db_compare(m, o)
+
+
+@async_test
+async def test_setitem(_):
+    m, o = _[0], _[1]
+
+    m[0] = {'c': 3}
+    m[1:3] = [1, [2], 3]
+    o[0] = {'c': 3}
+    o[1], o[2] = 1, deque([2])
+    o.insert(3, 3)
+
+    await m.mongo_pending.join()
+    assert m == o
+    await db_compare(m, o)
+
+
+@async_test
+async def test_setslice_past_end(_):
+    m, o = _[0], _[1]
+
+    m[len(m) - 2:len(m) + 10] = ['a', 'b', [3]]
+    o.pop()
+    o.pop()
+    o.extend(['a', 'b', deque([3])])
+    m[-1].append(4)
+    o[-1].append(4)
+    # deque length is kept for other tests
+    m.popleft()
+    o.popleft()
+
+    await m.mongo_pending.join()
+    assert m == o
+    await db_compare(m, o)
+
+
+@async_test
+async def test_nested(_):
+    m, o = _[0], _[1]
+
+    m.appendleft([1, 2])
+    m[0].append({'d': 4})
+    m[0][-1]['e'] = [5]
+    await m.mongo_pending.join()
+    m.insert(0, 0)
+    m[1][-1]['e'].append(6)
+    m.reverse()
+    m[-2].appendleft(0)
+
+    o.appendleft(deque([1, 2]))
+    o[0].append({'d': 4})
+    o[0][-1]['e'] = deque([5])
+    o.insert(0, 0)
+    o[1][-1]['e'].append(6)
+    o.reverse()
+    o[-2].appendleft(0)
+
+    await m.mongo_pending.join()
+    assert m == o
+    await db_compare(m, o)
+
+
+@async_test
+async def test_loaded(_):
+    m, o = _[0], _[1]
+
+    m_loaded = await MongoDocsDequeReflection(col=m.col, obj_ref=m.obj_ref, key=m.key, maxlen=m.maxlen)
+
+    compare_nested_list(m, m_loaded)
+
+    assert m_loaded == o
+    assert m_loaded._head == m._head
+
+
+@async_test
+async def test_clear(_):
+    m, o = _[0], _[1]
+
+    m.clear()
+    o.clear()
+
+    await m.mongo_pending.join()
+    assert m == o
+    await db_compare(m, o)
+
+
+@async_test
+async def test_nested_removed(_):
+    m, o = _[0], _[1]
+
+    m.append([1])
+    m.appendleft({'a': 1})
+    m[-1].append(2)
+    m[0]['b'] = 2
+    m.pop()
+    m[0] = 3
+
+    o.append(deque([1]))
+    o.appendleft({'a': 1})
+    o.pop()
+    o[0] = 3
+
+    await m.mongo_pending.join()
+    assert m == o
+    await db_compare(m, o)
@@ -0,0 +1,56 @@
+from tests.test_asyncio_prepare import *
+
+lrun_uc(db['test_indexes'].remove())
+
+col = db['test_indexes']
+
+
+@async_test
+async def test_hash_index():
+    m = await MongoDequeReflection([{'job_id': i, 'meta': {'owner': f'u{i % 2}'}} for i in range(5)] + [1, [2]],
+                                   col=col, obj_ref={'array_id': 'hash'}, key='arr',
+                                   indexes={'job_id': 'hash', 'meta.owner': 'hash'})
+
+    job = m.lookup('job_id', 3)[0]
+    assert job is m[3] and isinstance(job, MongoDictReflection)
+    assert {el['job_id'] for el in m.lookup('meta.owner', 'u0')} == {0, 2, 4}
+
+    m.popleft()
+    m.appendleft({'job_id': 10, 'meta': {'owner': 'u1'}})
+    m.insert(2, {'job_id': 11})
+    assert m.lookup('job_id', 0) == []
+    assert m.lookup('job_id', 10) == [m[0]] and m.lookup('job_id', 11) == [m[2]]
+
+    # element changes are reindexed, positions shifted by insertion don't matter
+    job['job_id'] = 30
+    m[1]['meta']['owner'] = 'u2'
+    assert m.lookup('job_id', 3) == [] and m.lookup('job_id', 30) == [job]
+    assert m.lookup('meta.owner', 'u2') == [m[1]]
+
+    job['meta']['owner'] = 'u3'
+    m.lookup('job_id', 30)[0]['meta']['tag'] = 'x'
+    m[-3] = {'job_id': 40}
+    assert m.lookup('job_id', 40) == [m[-3]] and m.lookup('job_id', 4) == []
+
+    await m.mongo_pending.join()
+    assert await mongo_field(m, 'arr') == flattern_list_nested(list(m), lists_to_deque=False)
+
+
+@async_test
+async def test_sorted_index():
+    m = await MongoDequeReflection([{'t': t} for t in (5, 1, 3)], col=col, obj_ref={'array_id': 'sorted'},
+                                   key='arr', maxlen=4)
+    m.create_index('t', 'sorted')
+
+    assert [el['t'] for el in m.lookup_range('t', 2)] == [3, 5]
+    m.append({'t': 2})
+    m.append({'t': 4})
+    assert [el['t'] for el in m.lookup_range('t')] == [1, 2, 3, 4]
+    assert [el['t'] for el in m.lookup_range('t', 2, 4)] == [2, 3]
+
+    m.drop_index('t')
+    with pytest.raises(MongoReflectionError):
+        m.lookup('t', 1)
+    with pytest.raises(MongoReflectionError):
+        m.create_index('t', 'btree')
+    await m.mongo_pending.join()
@@ -0,0 +1,134 @@
+import os
+import tempfile
+
+from bson import decode_all
+from pymongo.errors import OperationFailure
+
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection.docs_deque_reflection import MongoDocsDequeReflection
+
+lrun_uc(db['test_journal'].remove())
+
+JOURNAL = tempfile.mkdtemp()
+
+col = db['test_journal']
+
+mongo_journaled_list = lrun_uc(MongoDequeReflection([1, [2, 3], {'a': 4}], col=col,
+                                                    obj_ref={'array_id': 'test_journal'},
+                                                    key='arr', journal=JOURNAL))
+
+mongo_journaled_dict = lrun_uc(MongoDictReflection({'a': 1, 'b': [2]}, col=col,
+                                                   obj_ref={'dict_id': 'test_journal'},
+                                                   key='dct', journal=JOURNAL))
+
+
+class RejectedDequeReflection(MongoDequeReflection):
+    errors = []
+
+    async def _reflection_extend(self, arr, maxlen=None, position=None):
+        if self.errors:
+            raise self.errors.pop(0)
+        # super() would add '__class__' to journaled op args
+        return await MongoDequeReflection._reflection_extend(self, arr, maxlen, position)
+
+
+def lost(m, coro):
+    # operation is journaled but never reaches mongo like if process died
+    m._journal.append(m._journal._coro_record(coro))
+    coro.close()
+
+
+@async_test
+async def test_journal_truncated():
+    m = mongo_journaled_list
+
+    m.append(5)
+    m[1].appendleft(6)
+    assert m._journal._pending
+
+    await m.mongo_pending.join()
+    await asyncio.sleep(0)
+
+    assert not m._journal._pending
+    assert m._journal._offset == 0
+    assert os.path.getsize(m._journal.path) > 0
+
+
+@async_test
+async def test_journal_list_replayed():
+    m = mongo_journaled_list
+
+    lost(m, m._reflection_extend([7]))
+    lost(m, m[1]._reflection_extend([8]))
+    lost(m, m[2]._reflection_setitem({f'{m[2].key}.c': 9}))
+    lost(m, m._reflection_setitem(0, [10]))
+    lost(m, m[1]._reflection_setitem(1, [[11]]))
+    m._journal.flush()
+
+    m_replayed = await MongoDequeReflection(col=col, obj_ref=m.obj_ref, key=m.key, journal=JOURNAL)
+
+    assert flattern_list_nested(list(m_replayed), lists_to_deque=False) == \
+        [10, [6, [11], 3, 8], {'a': 4, 'c': 9}, 5, 7]
+    assert not os.path.exists(m_replayed._journal.rejected_path)
+    assert m_replayed._journal._offset == 0
+
+
+@async_test
+async def test_journal_dict_replayed():
+    m = mongo_journaled_dict
+
+    lost(m, m._reflection_pop('a'))
+    lost(m, m['b']._reflection_extend([3]))
+
+    m_replayed = await MongoDictReflection(col=col, obj_ref=m.obj_ref, key=m.key, journal=JOURNAL)
+
+    assert flattern_dict_nested(dict(m_replayed)) == {'b': [2, 3]}
+
+
+@async_test
+async def test_journal_bulk_replayed():
+    m = await MongoDocsDequeReflection([1, 2], col=col, obj_ref={'array_id': 'test_journal_docs'},
+                                       key='arr', journal=JOURNAL)
+    await m.mongo_pending.join()
+
+    # sync reflection methods of documents mode return bulk writes
+    deque.append(m, 3)
+    lost(m, m._reflection_append([3]))
+
+    m_replayed = await MongoDocsDequeReflection(col=col, obj_ref=m.obj_ref, key=m.key, journal=JOURNAL)
+
+    assert list(m_replayed) == [1, 2, 3]
+
+
+def rejected(m):
+    # pushed elements of each rejected op
+    with open(m._journal.rejected_path, 'rb') as f:
+        return [next(iter(rec['args'].values())) for rec in decode_all(f.read())]
+
+
+@async_test
+async def test_journal_rejected():
+    m = await RejectedDequeReflection([1], col=col, obj_ref={'array_id': 'test_journal_rejected'},
+                                      key='arr', journal=JOURNAL)
+
+    RejectedDequeReflection.errors[:] = [OperationFailure('rejected')]
+    m.append(2)
+    m.append(3)
+    await m.mongo_pending.join()
+    await asyncio.sleep(0)
+
+    # rejected op doesn't keep journal from reset
+    assert not m._journal._pending
+    assert m._journal._offset == 0
+    assert rejected(m) == [[2]]
+
+    RejectedDequeReflection.errors[:] = [OperationFailure('rejected')]
+    lost(m, m._reflection_extend([4]))
+    lost(m, m._reflection_extend([5]))
+
+    # failed op doesn't fail replay
+    m_replayed = await RejectedDequeReflection(col=col, obj_ref=m.obj_ref, key=m.key, journal=JOURNAL)
+
+    assert list(m_replayed) == [1, 3, 5]
+    assert m_replayed._journal._offset == 0
+    assert rejected(m) == [[2], [4]]
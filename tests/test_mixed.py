@@ -195,6 +195,48 @@ async def test_list_slice(_l):
     await mongo_compare(flattern_list_nested(list(m), m._dumps, lists_to_deque=False), m)
 
 
+@async_test
+async def test_list_push_equal_nested(_l):
+    m, o = _l[0], _l[1]
+
+    # pushed nested elements equal to existing ones
+    m.extend([[5, 6], [5, 6]])
+    m[-1].append(4)
+    o.extend([deque([5, 6]), deque([5, 6])])
+    o[-1].append(4)
+
+    m.extendleft([{'q': 1}, {'q': 1}])
+    m[0]['q'] = 2
+    o.extendleft([{'q': 1}, {'q': 1}])
+    o[0]['q'] = 2
+
+    await m.mongo_pending.join()
+
+    assert m == o
+    await mongo_compare(flattern_list_nested(list(m), m._dumps, lists_to_deque=False), m)
+
+
+@async_test
+async def test_list_slice_past_end(_l):
+    m, o = _l[0], _l[1]
+
+    # slice stop past the end replaces the tail and appends the rest
+    m[len(m) - 1:len(m) + 10] = ['a', [1], {'n': [2]}]
+    o.pop()
+    o.extend(['a', deque([1]), {'n': deque([2])}])
+    assert isinstance(m[-2], MongoDequeReflection) and isinstance(m[-1], MongoDictReflection)
+
+    m[-2].append(3)
+    m[-1]['n'].append(4)
+    o[-2].append(3)
+    o[-1]['n'].append(4)
+
+    await m.mongo_pending.join()
+
+    assert m == deque(o)
+    await mongo_compare(flattern_list_nested(list(m), m._dumps, lists_to_deque=False), m)
+
+
 @async_test
 async def test_final_list_loaded(_l):
     m, o = _l[0], _l[1]
@@ -217,3 +259,21 @@ async def test_final_dict_loaded(_d):
     compare_nested_dict(m, m_loaded)
 
     assert m_loaded == o
+
+
+@async_test
+async def test_deep_nested_loaded():
+    deep = [0]
+    for i in range(1, 60):
+        deep = [i, {'n': deep}] if i % 2 else [i, deep]
+
+    m = await MongoDequeReflection(deep, col=col, obj_ref=obj_ref, key=key + '_deep', dumps=None)
+    await m.mongo_pending.join()
+
+    m_loaded = await MongoDequeReflection(col=m.col, obj_ref=m.obj_ref, key=m.key,
+                                          dumps=m._dumps, loads=m._loads)
+
+    compare_nested_list(m, m_loaded)
+
+    assert m_loaded == m
+    await mongo_compare(flattern_list_nested(list(m), m._dumps, lists_to_deque=False), m)
@@ -0,0 +1,42 @@
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection import MongoBucketDequeReflection
+
+lrun_uc(db['test_remote'].remove())
+
+col = db['test_remote']
+
+
+@async_test
+async def test_remote_deque():
+    m = await MongoDequeReflection(list(range(10)) + [{'n': [1, 2, 3]}], col=col, obj_ref={'array_id': 'remote'},
+                                   key='arr', dumps=str, loads=int)
+    await m.mongo_pending.join()
+
+    assert await m.remote_count() == 11
+    assert await m.remote_count({'$eq': ['$$el', '3']}) == 1
+    assert await m.remote_filter({'$in': ['$$el', ['1', '2']]}) == [1, 2]
+    assert await m.remote_slice(2, 5) == [2, 3, 4]
+    assert await m.remote_slice(-2) == [9, {'n': [1, 2, 3]}]
+    assert await m.remote_slice(5, 2) == []
+    # nested reflection is queried at its own key
+    assert await m[10]['n'].remote_filter({'$ne': ['$$el', '2']}) == [1, 3]
+
+
+@async_test
+async def test_remote_dict():
+    m = await MongoDictReflection({'a': 1, 'b': 5, 'c': {'d': 7}}, col=col, obj_ref={'dict_id': 'remote'},
+                                  key='dct')
+    await m.mongo_pending.join()
+
+    assert await m.remote_count() == 3
+    assert await m.remote_filter({'$gt': ['$$el.v', 2]}) == {'b': 5, 'c': {'d': 7}}
+    assert await m['c'].remote_count({'$eq': ['$$el.k', 'd']}) == 1
+
+
+@async_test
+async def test_remote_unsupported():
+    m = await MongoBucketDequeReflection([1, 2], col=col, obj_ref={'array_id': 'remote_bucket'}, key='arr')
+
+    with pytest.raises(MongoReflectionError):
+        await m.remote_count()
+    await m.mongo_pending.join()
@@ -0,0 +1,136 @@
+from pymongo.errors import AutoReconnect, NotMasterError
+
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection import RetryPolicy
+
+lrun_uc(db['test_retry'].remove())
+
+col = db['test_retry']
+
+
+class FlakyDequeReflection(MongoDequeReflection):
+    errors = []
+
+    async def _reflection_extend(self, arr, maxlen=None, position=None):
+        if self.errors:
+            raise self.errors.pop(0)
+        return await super()._reflection_extend(arr, maxlen, position)
+
+
+class FlakyDictReflection(MongoDictReflection):
+    errors = []
+
+    async def _reflection_update(self, upd_dict):
+        if self.errors:
+            raise self.errors.pop(0)
+        return await super()._reflection_update(upd_dict)
+
+
+@async_test
+async def test_retry_not_applied():
+    m = await FlakyDequeReflection([1], col=col, obj_ref={'array_id': 'not_applied'}, key='arr',
+                                   retry_policy=RetryPolicy(base_delay=0.001))
+
+    FlakyDequeReflection.errors[:] = [NotMasterError('not master')] * 2
+    m.append(2)
+    m.append(3)
+    await m.mongo_pending.join()
+
+    # op failed with "not master" error is retried even it isn't idempotent, ops order is kept
+    assert await mongo_field(m, 'arr') == [1, 2, 3]
+    assert m.mongo_stats['retries'] == 2
+
+    FlakyDequeReflection.errors[:] = [AutoReconnect('not available')]
+    m.append(4)
+    m.append(5)
+    await m.mongo_pending.join()
+
+    # '$push' could be applied before connection was lost so it isn't retried
+    assert await mongo_field(m, 'arr') == [1, 2, 3, 5]
+    assert m.mongo_stats['retries'] == 2
+    assert m.mongo_stats['ambiguous'] == 1
+    assert m.mongo_stats['failed'] == 1
+    assert m.mongo_stats['backlog'] == 0
+
+
+@async_test
+async def test_retry_ambiguous():
+    m = await FlakyDequeReflection([1], col=col, obj_ref={'array_id': 'ambiguous'}, key='arr',
+                                   retry_policy=RetryPolicy(base_delay=0.001, retry_ambiguous=True))
+
+    FlakyDequeReflection.errors[:] = [AutoReconnect('not available')] * 3
+    m.append(2)
+    await m.mongo_pending.join()
+
+    assert await mongo_field(m, 'arr') == [1, 2]
+    assert m.mongo_stats['retries'] == 3
+
+
+@async_test
+async def test_retry_idempotent():
+    m = await FlakyDictReflection({'a': 1}, col=col, obj_ref={'dict_id': 'idempotent'}, key='dct',
+                                  retry_policy=RetryPolicy(retries=2, base_delay=0.001))
+
+    FlakyDictReflection.errors[:] = [AutoReconnect('not available')] * 2
+    m['b'] = 2
+    await m.mongo_pending.join()
+
+    FlakyDictReflection.errors[:] = [AutoReconnect('not available')] * 3
+    m['c'] = 3
+    m['d'] = 4
+    await m.mongo_pending.join()
+
+    # second op is dropped after 2 retries
+    assert await mongo_field(m, 'dct') == {'a': 1, 'b': 2, 'd': 4}
+    assert m.mongo_stats['retries'] == 4
+    assert m.mongo_stats['ambiguous'] == 0
+    assert m.mongo_stats['failed'] == 1
+
+
+class FlakyBulkCollection:
+    def __init__(self, col):
+        self.col = col
+        self.errors = []
+        self.requests = []
+
+    def __getattr__(self, name):
+        return getattr(self.col, name)
+
+    async def bulk_write(self, requests, *args, **kwargs):
+        self.requests.append(requests)
+        if self.errors:
+            # bulk fails after its first op is applied
+            await self.col.bulk_write(requests[:1], *args, **kwargs)
+            raise self.errors.pop(0)
+        return await self.col.bulk_write(requests, *args, **kwargs)
+
+
+@async_test
+async def test_retry_remove_second_step():
+    m = await MongoDequeReflection([{'a': 1}, {'b': 2}, {'a': 1}], col=col, obj_ref={'array_id': 'remove'},
+                                   key='arr', retry_policy=RetryPolicy(base_delay=0.001))
+
+    m.col = FlakyBulkCollection(m.col)
+    m.col.errors[:] = [NotMasterError('not master')]
+    m.remove({'a': 1})
+    await m.mongo_pending.join()
+
+    # retried op pulls the element already marked, it doesn't mark another one
+    assert await mongo_field(m, 'arr') == [{'b': 2}, {'a': 1}]
+    assert m.mongo_stats['retries'] == 1
+
+
+@async_test
+async def test_retry_delitem_second_step():
+    m = await MongoDequeReflection([1, 2, 3], col=col, obj_ref={'array_id': 'delitem'},
+                                   key='arr', retry_policy=RetryPolicy(base_delay=0.001))
+
+    m.col = FlakyBulkCollection(m.col)
+    m.col.errors[:] = [NotMasterError('not master')]
+    del m[1]
+    await m.mongo_pending.join()
+
+    # retried op marks element with the same sentinel it pulls
+    assert m.col.requests[0] == m.col.requests[1]
+    assert await mongo_field(m, 'arr') == [1, 3]
+    assert m.mongo_stats['retries'] == 1
@@ -0,0 +1,88 @@
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection import MongoSetReflection
+
+lrun_uc(db['test_set_reflection'].remove())
+
+col = db['test_set_reflection']
+
+
+@async_test
+async def test_set_ops():
+    m = await MongoSetReflection({'a', 'b'}, col=col, obj_ref={'set_id': 'ops'}, key='tags')
+
+    for i in range(100):
+        m.add(f'tag{i % 10}')
+    m.update(['c', 'd'], {'a', 'e'})
+
+    # adds are sent with one '$addToSet'
+    assert m.mongo_pending.qsize() == 1
+
+    m.discard('a')
+    m.remove('tag0')
+    m -= {'tag1', 'missing'}
+    with pytest.raises(KeyError):
+        m.remove('missing')
+    assert m.mongo_pending.qsize() == 2
+
+    m &= {'b', 'c', 'd', 'e', 'tag2', 'tag3'}
+    m ^= {'tag3', 'f'}
+    m |= {'g'}
+    popped = m.pop()
+    await m.mongo_pending.join()
+
+    assert m == {'b', 'c', 'd', 'e', 'tag2', 'f', 'g'} - {popped}
+    assert set(await mongo_field(m, 'tags')) == m
+
+    m.clear()
+    m.add('h')
+    await m.mongo_pending.join()
+    assert await mongo_field(m, 'tags') == ['h']
+
+
+@async_test
+async def test_set_load():
+    m = await MongoSetReflection({1, 2, 3}, col=col, obj_ref={'set_id': 'load'}, key='nested.ids',
+                                 dumps=str, loads=int)
+    m.add(4)
+    await m.mongo_pending.join()
+    obj = await col.find_one(m.obj_ref)
+    assert obj['nested']['ids'] == ['1', '2', '3', '4']
+
+    loaded = await MongoSetReflection(col=col, obj_ref={'set_id': 'load'}, key='nested.ids', loads=int)
+    assert loaded == {1, 2, 3, 4}
+
+    # the same elements in other order don't rewrite reflection
+    same = await MongoSetReflection([4, 3, 2, 1], col=col, obj_ref={'set_id': 'load'}, key='nested.ids',
+                                    dumps=str, loads=int)
+    assert same == {1, 2, 3, 4}
+    obj = await col.find_one(m.obj_ref)
+    assert obj['nested']['ids'] == ['1', '2', '3', '4']
+
+
+class ProxyCollection:
+    def __init__(self, col):
+        self.col = col
+
+    def __getattr__(self, name):
+        return getattr(self.col, name)
+
+    def with_options(self, **kwargs):
+        return ProxyCollection(self.col.with_options(**kwargs))
+
+
+class ProxySetReflection(MongoSetReflection):
+    _collection_cls = ProxyCollection
+
+
+@async_test
+async def test_set_collection_cls():
+    with pytest.raises(TypeError):
+        await ProxySetReflection(col=col, obj_ref={'set_id': 'proxy'}, key='tags')
+
+    m = await ProxySetReflection({'a'}, col=ProxyCollection(col), obj_ref={'set_id': 'proxy'}, key='tags',
+                                 write_concern={'w': 0})
+    assert isinstance(m.col, ProxyCollection) and not m.col.write_concern.acknowledged
+
+    m.add('b')
+    await m.mongo_pending.join()
+    assert set(await mongo_field(m, 'tags')) == {'a', 'b'}
@@ -0,0 +1,61 @@
+import gc
+
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection import MongoSetReflection
+
+lrun_uc(db['test_snapshot'].remove())
+
+col = db['test_snapshot']
+
+
+@async_test
+async def test_snapshot_deque():
+    m = await MongoDequeReflection([1, [2, 3], {'a': [4]}, [5]], col=col, obj_ref={'array_id': 'snapshot'},
+                                   key='arr')
+    snap = m.snapshot()
+
+    m.append(6)
+    m[1].appendleft(0)
+    m[2]['a'].append(7)
+    m[2]['b'] = 1
+
+    assert snap.plain() == [1, [2, 3], {'a': [4]}, [5]]
+    assert len(snap) == 4 and snap[1] == [2, 3] and dict(snap[2]) == {'a': snap[2]['a']}
+    assert list(snap[2]['a']) == [4]
+    # untouched node is shared with snapshot, not copied
+    assert m[3]._frozen == ()
+
+    assert flattern_list_nested(list(m), lists_to_deque=False) == [1, [0, 2, 3], {'a': [4, 7], 'b': 1}, [5], 6]
+    await m.mongo_pending.join()
+
+
+@async_test
+async def test_snapshot_dict():
+    m = await MongoDictReflection({'a': {'b': [1]}, 'c': 2}, col=col, obj_ref={'dict_id': 'snapshot'}, key='dct')
+    first = m.snapshot()
+    m['a']['b'].append(2)
+    second = m.snapshot()
+    m['a']['b'].append(3)
+    del m['c']
+
+    assert first.plain() == {'a': {'b': [1]}, 'c': 2}
+    assert second.plain() == {'a': {'b': [1, 2]}, 'c': 2}
+    assert 'c' in second and 'c' not in m
+
+    # copies only dropped snapshots referred to are freed with the next change
+    del first, second
+    gc.collect()
+    m['a']['b'].append(4)
+    assert m['a']['b']._frozen == ()
+    await m.mongo_pending.join()
+
+
+@async_test
+async def test_snapshot_set():
+    m = await MongoSetReflection({1, 2}, col=col, obj_ref={'set_id': 'snapshot'}, key='set')
+    snap = m.snapshot()
+    m.add(3)
+    m.discard(1)
+
+    assert snap == {1, 2} and snap.plain() == {1, 2}
+    await m.mongo_pending.join()
@@ -0,0 +1,100 @@
+import random
+
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection import MongoSortedListReflection
+
+lrun_uc(db['test_sorted_reflection'].remove())
+
+col = db['test_sorted_reflection']
+
+
+@async_test
+async def test_sorted_values():
+    m = await MongoSortedListReflection([5, 1, 3], col=col, obj_ref={'list_id': 'values'}, key='arr')
+    assert m == [1, 3, 5]
+
+    for _ in range(100):
+        m.add(random.randint(0, 50))
+    # adds are sent with one '$push'
+    assert m.mongo_pending.qsize() == 1
+
+    m.update([2, 4])
+    m.pop()
+    m.pop(0)
+    del m[-1]
+    await m.mongo_pending.join()
+
+    assert m == sorted(m)
+    assert m.rank(25) == len([v for v in m if v < 25])
+    assert await mongo_field(m, 'arr') == list(m)
+
+    with pytest.raises(MongoReflectionError):
+        m.append(1)
+    with pytest.raises(ValueError):
+        m.remove(100)
+
+
+@async_test
+async def test_sorted_leaderboard():
+    m = await MongoSortedListReflection(col=col, obj_ref={'list_id': 'leaderboard'}, key='top',
+                                        sort_by='score', reverse=True, maxlen=5)
+    scores = random.sample(range(1000), 50)
+    for i, score in enumerate(scores):
+        m.add({'player': i, 'score': score})
+    await m.mongo_pending.join()
+
+    top = sorted(scores, reverse=True)[:5]
+    assert [el['score'] for el in m] == top
+    assert m.index(m[3]) == 3 and m[3] in m
+
+    m.remove(m[1])
+    m.pop(2)
+    await m.mongo_pending.join()
+
+    top = top[:1] + top[2:3] + top[4:]
+    assert [el['score'] for el in m] == top
+    assert m.rank({'score': top[1]}) == 1
+    assert m.rank({'score': 1000}) == 0
+    assert await mongo_field(m, 'top') == list(m)
+
+    loaded = await MongoSortedListReflection(col=col, obj_ref={'list_id': 'leaderboard'}, key='top',
+                                             sort_by='score', reverse=True, maxlen=5)
+    assert loaded == m
+
+
+@async_test
+async def test_sorted_load_unsorted():
+    await col.insert_one({'list_id': 'unsorted', 'arr': [3, 1, 2]})
+    m = await MongoSortedListReflection(col=col, obj_ref={'list_id': 'unsorted'}, key='arr')
+
+    assert m == [1, 2, 3]
+    assert await mongo_field(m, 'arr') == [1, 2, 3]
+
+
+class ProxyCollection:
+    def __init__(self, col):
+        self.col = col
+
+    def __getattr__(self, name):
+        return getattr(self.col, name)
+
+    def with_options(self, **kwargs):
+        return ProxyCollection(self.col.with_options(**kwargs))
+
+
+class ProxySortedListReflection(MongoSortedListReflection):
+    _collection_cls = ProxyCollection
+
+
+@async_test
+async def test_sorted_collection_cls():
+    with pytest.raises(TypeError):
+        await ProxySortedListReflection(col=col, obj_ref={'list_id': 'proxy'}, key='top')
+
+    m = await ProxySortedListReflection([3, 1], col=ProxyCollection(col), obj_ref={'list_id': 'proxy'}, key='top',
+                                        write_concern={'w': 0})
+    assert isinstance(m.col, ProxyCollection) and not m.col.write_concern.acknowledged
+
+    m.add(2)
+    await m.mongo_pending.join()
+    assert await mongo_field(m, 'top') == [1, 2, 3]
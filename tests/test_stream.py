@@ -0,0 +1,36 @@
+from tests.test_asyncio_prepare import *
+
+lrun_uc(db['test_stream'].remove())
+
+col = db['test_stream']
+
+
+@async_test
+async def test_stream():
+    m = await MongoDequeReflection([[i, {'v': i}] if i % 10 == 0 else i for i in range(95)], col=col,
+                                   obj_ref={'array_id': 'stream'}, key='arr', dumps=str)
+    await m.mongo_pending.join()
+
+    streamed = [el async for el in MongoDequeReflection.stream(col, {'array_id': 'stream'}, 'arr', page=10, loads=int)]
+    assert streamed == [[i, {'v': i}] if i % 10 == 0 else i for i in range(95)]
+
+    raw = [el async for el in MongoDequeReflection.stream(col, {'array_id': 'stream'}, 'arr', page=95)]
+    assert raw[1] == '1' and len(raw) == 95
+
+
+@async_test
+async def test_stream_missing():
+    assert [el async for el in MongoDequeReflection.stream(col, {'array_id': 'missing'}, 'arr')] == []
+
+    with pytest.raises(TypeError):
+        async for _ in MongoDequeReflection.stream(list(), {'array_id': 'missing'}, 'arr'):
+            pass
+
+
+@async_test
+async def test_stream_index_key():
+    m = await MongoDequeReflection([[0], list(range(25))], col=col, obj_ref={'array_id': 'nested'}, key='arr')
+    await m.mongo_pending.join()
+
+    assert [el async for el in MongoDequeReflection.stream(col, {'array_id': 'nested'}, 'arr.1', page=10)] \
+        == list(range(25))
@@ -0,0 +1,104 @@
+import time
+from threading import Thread
+import pytest
+import pymongo
+
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection import SyncCoroExecutor, SyncMongoDequeReflection, SyncMongoDictReflection
+
+col = pymongo.MongoClient().test_db['test_sync_reflection']
+col.delete_many({})
+
+
+class _CountingCol:
+    def __init__(self, col):
+        self.col = col
+        self.bulk_writes = 0
+
+    def bulk_write(self, requests, **kwargs):
+        self.bulk_writes += 1
+        # ops enqueued while writer waits here are sent with the next batch
+        time.sleep(0.01)
+        return self.col.bulk_write(requests, **kwargs)
+
+
+def test_sync_deque():
+    executor = SyncCoroExecutor()
+    m = SyncMongoDequeReflection([1, [2, 3], {'a': [4]}], col=col, obj_ref={'array_id': 'sync'}, key='arr',
+                                 sync_executor=executor)
+
+    assert isinstance(m[1], SyncMongoDequeReflection) and isinstance(m[2], SyncMongoDictReflection)
+
+    m.append(5)
+    m.appendleft([7])
+    m.mongo_pending.join()
+    m[2].appendleft(0)
+    m[3]['a'].append(9)
+    m[3]['b'] = {'c': 1}
+    m.mongo_pending.join()
+    m.rotate(1)
+    m.popleft()
+    m.mongo_pending.join()
+
+    assert lrun_uc(mongo_field(m, 'arr')) == flattern_list_nested(list(m), lists_to_deque=False)
+    # nested reflections were built without shadow loops
+    assert executor._loops is None
+
+    loaded = SyncMongoDequeReflection(col=col, obj_ref={'array_id': 'sync'}, key='arr')
+    assert flattern_list_nested(list(loaded), lists_to_deque=False) == lrun_uc(mongo_field(m, 'arr'))
+    assert isinstance(loaded[3], SyncMongoDictReflection)
+
+
+def test_sync_dict():
+    m = SyncMongoDictReflection({'a': 1, 'n': {'l': [1]}}, col=col, obj_ref={'dict_id': 'sync'}, key='dct')
+
+    m['n']['l'].append(2)
+    m.update(b=[1, {'z': 1}])
+    m.pop('a')
+    m.mongo_pending.join()
+    m['b'][1]['y'] = 2
+    m.mongo_pending.join()
+
+    assert lrun_uc(mongo_field(m, 'dct')) == flattern_dict_nested(dict(m))
+
+
+def test_sync_batches():
+    m = SyncMongoDequeReflection([], col=col, obj_ref={'array_id': 'batches'}, key='arr')
+    counting = m._mongo_dispatcher_task.col = _CountingCol(m._mongo_dispatcher_task.col)
+
+    for i in range(200):
+        m.append(i)
+    m.mongo_pending.join()
+
+    assert lrun_uc(mongo_field(m, 'arr')) == list(range(200))
+    assert counting.bulk_writes < 200
+    assert not m.mongo_stats['failed']
+
+
+def test_sync_errors():
+    with pytest.raises(TypeError):
+        SyncMongoDequeReflection([], col=db['test_sync_reflection'], obj_ref={'array_id': 'motor'}, key='arr')
+
+    with pytest.raises(MongoReflectionError):
+        SyncMongoDictReflection({}, col=col, obj_ref={'dict_id': 'journal'}, key='dct', journal='/tmp')
+
+
+def test_sync_threads():
+    m = SyncMongoDequeReflection([[i] for i in range(10)], col=col, obj_ref={'array_id': 'threads'}, key='arr')
+
+    def produce(n):
+        # writer thread runs tasks that read nested keys while appendleft moves them
+        for i in range(100):
+            m.appendleft([n])
+            m[1].append(i)
+            m[-1] = [n, i]
+
+    threads = [Thread(target=produce, args=(n,)) for n in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    m.mongo_pending.join()
+
+    assert lrun_uc(mongo_field(m, 'arr')) == flattern_list_nested(list(m), lists_to_deque=False)
+    assert not m.mongo_stats['failed']
@@ -0,0 +1,113 @@
+from threading import Event
+from concurrent.futures import ThreadPoolExecutor
+
+from asyncio_mongo_reflection import SyncCoroExecutor
+
+from tests.test_asyncio_prepare import *
+
+lrun_uc(db['test_threadsafe'].remove())
+
+col = db['test_threadsafe']
+
+
+@async_test
+async def test_threadsafe_deque():
+    m = await MongoDequeReflection([[]], col=col, obj_ref={'array_id': 'threads'}, key='arr')
+
+    def produce(n):
+        for i in range(50):
+            m.call_threadsafe(m.append, [n, i])
+            m.call_threadsafe(m[0].appendleft, n)
+        return m.call_threadsafe(m.extend, [n])
+
+    with ThreadPoolExecutor(8) as executor:
+        futures = [loop.run_in_executor(executor, produce, n) for n in range(8)]
+        for f in futures:
+            (await f).result()
+
+    await m.mongo_pending.join()
+
+    assert len(m) == 8 * 51 + 1
+    assert len(m[0]) == 8 * 50
+    assert await mongo_field(m, 'arr') == flattern_list_nested(list(m), lists_to_deque=False)
+
+
+@async_test
+async def test_threadsafe_enqueue():
+    m = await MongoDictReflection({}, col=col, obj_ref={'dict_id': 'threads'}, key='dct')
+
+    def produce(n):
+        for i in range(50):
+            m[f'{n}_{i % 5}'] = i
+
+    with ThreadPoolExecutor(8) as executor:
+        await asyncio.gather(*[loop.run_in_executor(executor, produce, n) for n in range(8)])
+
+    await m.mongo_pending.join()
+
+    assert await mongo_field(m, 'dct') == {f'{n}_{i}': 45 + i for n in range(8) for i in range(5)}
+
+
+@async_test
+async def test_threadsafe_mutators():
+    m = await MongoDequeReflection([[]], col=col, obj_ref={'array_id': 'mutators'}, key='arr')
+
+    def produce(n):
+        # mutators called from other threads run in loop's thread
+        for i in range(50):
+            m.append([n, i])
+            m[0].appendleft(n)
+        return [m.pop() for _ in range(10)]
+
+    with ThreadPoolExecutor(8) as executor:
+        popped = await asyncio.gather(*[loop.run_in_executor(executor, produce, n) for n in range(8)])
+
+    await m.mongo_pending.join()
+
+    assert len(m) == 8 * 40 + 1
+    assert len(m[0]) == 8 * 50
+    assert all(len(els) == 10 for els in popped)
+    assert await mongo_field(m, 'arr') == flattern_list_nested(list(m), lists_to_deque=False)
+
+
+@async_test
+async def test_shadow_loops():
+    stalled, other = SyncCoroExecutor(loops=1), SyncCoroExecutor(loops=2)
+    m1 = await MongoDequeReflection([], col=col, obj_ref={'array_id': 'stalled'}, key='arr', sync_executor=stalled)
+    m2 = await MongoDequeReflection([], col=col, obj_ref={'array_id': 'other'}, key='arr', sync_executor=other)
+
+    assert m1.sync_executor is stalled and m2.sync_executor is other
+
+    release = Event()
+
+    async def stall():
+        release.wait()
+
+    stalled.submit(stall())
+
+    # nested reflections of m2 are built in its own shadow loop while m1's one is blocked
+    m2.append([1, [2]])
+    m2[0][1].extend([3, 4])
+
+    release.set()
+    m1.append([5])
+    await m1.mongo_pending.join()
+    await m2.mongo_pending.join()
+
+    assert await mongo_field(m1, 'arr') == [[5]]
+    assert await mongo_field(m2, 'arr') == [[1, [2, 3, 4]]]
+
+    stalled.shutdown()
+    other.shutdown()
+
+
+@async_test
+async def test_shadow_loops_spread():
+    async def running_loop():
+        return asyncio._get_running_loop()
+
+    roots = [await MongoDequeReflection([], col=col, obj_ref={'array_id': f'spread_{i}'}, key='arr')
+             for i in range(4)]
+
+    # roots with default executor don't share one shadow loop
+    assert len({m._run_now(running_loop()) for m in roots}) > 1
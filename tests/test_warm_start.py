@@ -0,0 +1,61 @@
+import tempfile
+
+from tests.test_asyncio_prepare import *
+
+lrun_uc(db['test_warm_start'].remove())
+
+col = db['test_warm_start']
+path = tempfile.mkdtemp()
+
+
+async def warm_start_marker(m):
+    obj = await col.find_one(m.obj_ref)
+    return obj.get('_warm_start', {}).get(m.key)
+
+
+@async_test
+async def test_warm_start(monkeypatch):
+    m = await MongoDequeReflection([1, [2, 3], {'a': [4]}], col=col, obj_ref={'array_id': 'warm'}, key='arr',
+                                   warm_start=path)
+    m.append([5])
+    await m.save_warm_start()
+    assert await warm_start_marker(m)
+
+    async def no_fetch(self):
+        raise AssertionError('Reflection is fetched from db!')
+
+    with monkeypatch.context() as patched:
+        patched.setattr(MongoDequeReflection, '_reflection_get', no_fetch)
+        loaded = await MongoDequeReflection(col=col, obj_ref={'array_id': 'warm'}, key='arr', warm_start=path)
+
+    assert flattern_list_nested(list(loaded), lists_to_deque=False) == [1, [2, 3], {'a': [4]}, [5]]
+    assert isinstance(loaded[1], MongoDequeReflection) and isinstance(loaded[2], MongoDictReflection)
+    # reflection will change document, so snapshot can't be used anymore
+    assert not await warm_start_marker(loaded)
+
+    loaded[3].append(6)
+    await loaded.mongo_pending.join()
+    assert await mongo_field(loaded, 'arr') == [1, [2, 3], {'a': [4]}, [5, 6]]
+
+
+@async_test
+async def test_warm_start_invalidated():
+    m = await MongoDictReflection({'a': {'b': [1]}}, col=col, obj_ref={'dict_id': 'warm'}, key='dct',
+                                  warm_start=path)
+    await m.save_warm_start()
+    assert await warm_start_marker(m)
+
+    m['a']['b'].append(2)
+    await m.mongo_pending.join()
+    assert not await warm_start_marker(m)
+
+    loaded = await MongoDictReflection(col=col, obj_ref={'dict_id': 'warm'}, key='dct', warm_start=path)
+    assert flattern_dict_nested(dict(loaded)) == {'a': {'b': [1, 2]}}
+
+
+@async_test
+async def test_warm_start_not_saved():
+    m = await MongoDictReflection({'a': 1}, col=col, obj_ref={'dict_id': 'not_saved'}, key='dct')
+
+    with pytest.raises(MongoReflectionError):
+        await m.save_warm_start()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+
+from tests.test_asyncio_prepare import *
+from asyncio_mongo_reflection import WorkloadRecorder, WorkloadReplayer
+
+lrun_uc(db['test_workload'].remove())
+lrun_uc(db['test_workload_replay'].remove())
+
+col = db['test_workload']
+replay_col = db['test_workload_replay']
+
+
+async def record_workload(path, capture_args):
+    recorder = WorkloadRecorder(path, capture_args=capture_args)
+    m = await MongoDequeReflection([1, [2]], col=col, obj_ref={'array_id': 'workload'}, key='arr',
+                                   recorder=recorder)
+    m.append(3)
+    m[2] = 8
+    m[1].extend([4, {'a': 5}])
+    m[1][2]['b'] = 6
+    await m.mongo_pending.join()
+    m.popleft()
+    m[0].append(7)
+    await m.mongo_pending.join()
+    recorder.close()
+    return m
+
+
+@async_test
+async def test_workload_record_replay():
+    path = os.path.join(tempfile.mkdtemp(), 'workload')
+    m = await record_workload(path, capture_args=True)
+
+    records = WorkloadRecorder.records(path)
+    assert [record['op'] for record in records] == ['_reflection_append', '_reflection_setitem',
+                                                    '_reflection_extend', '_reflection_setitem',
+                                                    '_reflection_popleft', '_reflection_append']
+    # nested reflection ops use keys they had when they were started
+    assert [record['key'] for record in records] == ['arr', 'arr', 'arr.1', 'arr.1.2', 'arr', 'arr.0']
+    assert all(record['ok'] and record['enqueued'] <= record['started'] <= record['done'] for record in records)
+
+    summary = WorkloadRecorder.summary(path)
+    assert summary['_reflection_extend']['count'] == 1
+    assert summary['_reflection_append']['count'] == 2
+    assert summary['_reflection_popleft']['size'] == records[4]['size']
+
+    # ops are replayed through dispatcher of reflection in another collection
+    replay_path = path + '_replay'
+    recorder = WorkloadRecorder(replay_path)
+    root = await MongoDequeReflection([1, [2]], col=replay_col, obj_ref={'array_id': 'workload'}, key='arr',
+                                      recorder=recorder)
+    await WorkloadReplayer(path).replay(root, speed=10.0)
+    recorder.close()
+
+    obj = await replay_col.find_one({'array_id': 'workload'})
+    assert obj['arr'] == flattern_list_nested(list(m), lists_to_deque=False)
+    assert len(WorkloadRecorder.records(replay_path)) == 6
+
+
+@async_test
+async def test_workload_synthetic_replay():
+    path = os.path.join(tempfile.mkdtemp(), 'workload')
+    await record_workload(path, capture_args=False)
+
+    records = WorkloadRecorder.records(path)
+    assert all('coro' not in record for record in records)
+
+    root = await MongoDictReflection({}, col=replay_col, obj_ref={'dict_id': 'synthetic'}, key='dct')
+    await WorkloadReplayer(path).replay(root, speed=None)
+
+    # ops without arguments are replaced with writes of the same size
+    obj = await replay_col.find_one({'dict_id': 'synthetic'})
+    assert len(obj['arr']) == records[4]['size']
+    assert len(obj['arr_1']) == records[2]['size']
@@ -0,0 +1,61 @@
+from tests.test_asyncio_prepare import *
+
+lrun_uc(db['test_write_concern'].remove())
+
+col = db['test_write_concern']
+
+
+@async_test
+async def test_unacknowledged_deque():
+    m = await MongoDequeReflection([1, [2, 3]], col=col, obj_ref={'array_id': 'w0'}, key='arr',
+                                   write_concern={'w': 0})
+
+    assert not m.col.write_concern.acknowledged
+    assert not m[1].col.write_concern.acknowledged
+
+    m.append(4)
+    m[1].appendleft(1)
+    m.extendleft([0, -1])
+    await m.mongo_pending.join()
+
+    assert await mongo_field(m, 'arr') == flattern_list_nested(list(m), lists_to_deque=False)
+
+
+@async_test
+async def test_unacknowledged_remove():
+    m = await MongoDequeReflection([{'a': 1}, 2, {'a': 1}, [3], 4], col=col, obj_ref={'array_id': 'w0_remove'},
+                                   key='arr', write_concern={'w': 0})
+
+    # two step ops are sent with one ordered bulk write
+    m.remove({'a': 1})
+    del m[2]
+    m.append(5)
+    await m.mongo_pending.join()
+
+    assert await mongo_field(m, 'arr') == [2, {'a': 1}, 4, 5]
+
+
+@async_test
+async def test_unacknowledged_dict():
+    m = await MongoDictReflection({'a': 1}, col=col, obj_ref={'dict_id': 'w0'}, key='dct',
+                                  write_concern={'w': 0})
+
+    for i in range(100):
+        m[str(i % 10)] = i
+    m['n'] = {'x': 1}
+    m['n']['y'] = 2
+    await m.mongo_pending.join()
+
+    assert await mongo_field(m, 'dct') == flattern_dict_nested(dict(m))
+
+
+@async_test
+async def test_acknowledged_write_concern():
+    m = await MongoDictReflection({}, col=col, obj_ref={'dict_id': 'majority'}, key='dct',
+                                  write_concern={'w': 'majority'})
+
+    assert m.col.write_concern.document == {'w': 'majority'}
+    m['a'] = 1
+    await m.mongo_pending.join()
+
+    assert await mongo_field(m, 'dct') == {'a': 1}